@@ -36,10 +36,27 @@ from methods import *
 import constants
 from constants import *
 
+from game_log import log
+
 #Import game objects. Handles all sprites.
 import game_objects
 #Import game camera. Handles displaying screen.
 import camera
+#Import the map renderer. Draws the map in chunks as the camera needs them.
+import map_renderer
+#Import the map prefetcher. Loads the maps next door in the background.
+import map_prefetcher
+#Import input recording. Saves every update's keys so the game can be replayed.
+import input_replay
+#Import the sound manager. Loads every sound effect once and shares them.
+from sound_manager import sound_manager
+#Every sprite sheet, packed into a few big images ahead of time.
+from texture_atlas import texture_atlas
+#Streams the music. Each map can have its own track.
+from music_player import music_player
+from music_player import get_map_music
+#Import the frame timer. Times every part of the game loop.
+import frame_timer
 
 # ============================================
 # ==     I N I T I A L I Z A T I O N        ==
@@ -53,35 +70,44 @@ pygame.init()
 width, height = SCREEN_W, SCREEN_H
 screen=pygame.display.set_mode((width, height))
 
+#Sounds - Load every sound effect now, before the game starts.
+sound_manager.start()
+#Sprites - Load the texture atlas pages now that there's a display to convert them for.
+texture_atlas.load()
+
 #Input - This is an array that will hold
 # information about what keys we pressed.
 # Keys needed: Up, Down, Left, Right, Jump, Fire, Item, Pause.
 keys = [False, False, False, False, False, False, False, False, False]
 
+# Use the first joystick if there is one plugged in. The keyboard works either way.
 pygame.joystick.init()
-try joystick = pygame.joystick.Joystick(0)
-joystick.init()
+joystick = None
+if(pygame.joystick.get_count() > 0):
+    joystick = pygame.joystick.Joystick(0)
+    joystick.init()
 
 # Create a new sprite handler object.
 sprite_handler=game_objects.Sprite_Handler()
 
 # Set the starting map
-current_map = "Maps\Mapdata\Mars05.tmx"
+current_map = STARTING_MAP
 screen_transition = False # A variable to tell us if we're in the middle of transitioning screens.
 screen_transition_counter = 0
 
 # Loading a new map and associated information
-tmxdata = load_new_map(current_map, sprite_handler, RIGHT) # Load new map and ask Sprite Handler to redo sprites
-                                                           # Use "RIGHT" as default entrance tile.
+# The map is parsed once, and current_map_renderer draws its appearance a chunk at a time.
+tmxdata, current_map_renderer = prepare_map(current_map)
+enter_prepared_map(tmxdata, sprite_handler, RIGHT) # Ask Sprite Handler to redo sprites
+                                                   # Use "RIGHT" as default entrance tile.
                             
 map_width = tmxdata.width*TILESIZE # Save the size of the incoming map
 map_height = tmxdata.height*TILESIZE
-map_image = load_map_image(tmxdata) # Set up an image size for the new map
 
-loaded_map_image =  pygame.Surface((map_width, map_height)) # Save a copy of the new map's appareance
-loaded_oldmap_image = pygame.Surface((SCREEN_W, SCREEN_H)) # Used during screen transitions
-loaded_newmap_image = pygame.Surface((SCREEN_W, SCREEN_H)) # Used during screen transitions
-blit_all_tiles(loaded_map_image, tmxdata, (0, 0))
+# Start loading the maps this one's exits lead to, so they're ready when we get there.
+prefetcher = map_prefetcher.Map_Prefetcher()
+prefetcher.remember_map(current_map, (tmxdata, current_map_renderer))
+prefetcher.prefetch_exits(tmxdata)
 
 # Variables to control the state of the game.
 game_state = MAIN_MENU
@@ -89,14 +115,12 @@ control_state = SOLDIER_ACTIVE
 player_has_died = False
 player_death_counter = 0
 
-# Set up the game music track.
-current_directory = os.getcwd()
-song_to_load = current_directory + '/' + 'Assets/Music/blastermaster.wav'
-background_music = pygame.mixer.Sound(song_to_load)
-background_music.set_volume(0.25)
-
 # Create a game camera to handle rendering.
 game_camera=camera.Camera()
+# Only used if DIRTY_RECT_RENDERING is on. Redraws just what changed each frame.
+dirty_renderer=camera.Dirty_Renderer()
+# Last frame's map as drawn on the screen, without the HUD. Transitions scroll it away.
+map_screen = screen
 # Tell camera to follow the player sprite
 game_camera.change_follow(sprite_handler.get_player(control_state))
 game_camera.snap_to_target()
@@ -106,13 +130,23 @@ done = False
 
 # A clock. This will make our game run the same speed regardless of hardware.
 clock = pygame.time.Clock()
+# Times each part of every frame. F3 shows a graph of the times, F4 saves them.
+game_timer = frame_timer.Frame_Timer()
+# Milliseconds of game time that have passed but haven't been simulated yet.
+accumulator = 0.0
+
+# Record the keys for every update, if RECORD_INPUT is on. Play it back with
+# headless.py --replay. This seeds the random module.
+recorder = None
+if(RECORD_INPUT):
+    recorder = input_replay.Input_Recorder(current_map)
 
 # Set up the menus
 pygame.font.init()
 myfont = pygame.font.SysFont('Times New Roman', 30)
 
-# Start music once menu is done
-background_music.play(-1)
+# Start music once menu is done. It streams, so this doesn't wait for the track to load.
+music_player.play(get_map_music(tmxdata))
 
 # Oh boy it's the
 # =========================================
@@ -128,6 +162,10 @@ while(done == False):
     # "under the hood" information like moving sprites around, checking
     # for input, changing states, etc.
     
+    # See how much time has passed since last frame. Draw no faster than RENDER_FPS_CAP.
+    accumulator += clock.tick(RENDER_FPS_CAP)
+    game_timer.start_frame()
+    
     # Check for input in all states.
     
     for event in pygame.event.get():
@@ -155,6 +193,11 @@ while(done == False):
                 keys[ITEM]=True
             elif event.key==K_ESCAPE:
                 keys[PAUSE] = True
+            elif event.key==K_F3:
+                game_timer.toggle_overlay()
+                dirty_renderer.request_full_redraw()
+            elif event.key==K_F4:
+                log.info("Saved frame times: %s", game_timer.save_csv())
                 
         if event.type == pygame.KEYUP:
             if event.key==K_w:
@@ -174,7 +217,7 @@ while(done == False):
             elif event.key==K_ESCAPE:
                 keys[PAUSE] = False
         
-        if event.type == pygame.JOYHATMOTION:
+        if event.type == pygame.JOYHATMOTION and joystick is not None:
             hat = joystick.get_hat(0)
             if(hat[0] < 0):
                 keys[LEFT] = True
@@ -195,7 +238,7 @@ while(done == False):
                 keys[UP] = False
                 keys[DOWN] = False
                 
-        if event.type == pygame.JOYBUTTONDOWN or JOYBUTTONUP:
+        if (event.type == pygame.JOYBUTTONDOWN or event.type == pygame.JOYBUTTONUP) and joystick is not None:
             if(joystick.get_button(0)):
                 keys[JUMP] = True
             else: keys[JUMP] = False
@@ -205,137 +248,208 @@ while(done == False):
             if(joystick.get_button(6)):
                 keys[TANK_DOOR] = True
             else: keys[TANK_DOOR] = False
+    
+    game_timer.mark(PHASE_EVENT_PUMP)
                 
-    # Main menu state just displays the main menu until the state ends.
-    if(game_state == MAIN_MENU):
-#         
-#         background_music.stop()
-#         main_menu(screen, clock, myfont)
-          game_state = PLAYING
-          background_music.play(-1)
-        
-    elif(game_state == GAME_OVER):  
+    # Run the game logic in fixed steps of SIMULATION_STEP_MS. The time since the last
+    # frame piles up in the accumulator, and every full step's worth gets simulated.
+    # Slow frames just mean more steps before the next draw, so the game runs the same
+    # speed however long drawing takes.
+    simulation_steps = 0
+    while(accumulator >= SIMULATION_STEP_MS and simulation_steps < MAX_SIMULATION_STEPS):
+    
+        # Remember where everything was, so drawing can slide between steps.
+        sprite_handler.save_previous_positions()
+        game_camera.save_previous_position()
         
-        background_music.stop()
-        game_over_menu(screen, clock, myfont)
+        # Record the keys this update starts with. The main menu isn't part of the game.
+        if(recorder is not None):
+            recorder.checkpoint(sprite_handler, current_map)
+            if(game_state != MAIN_MENU): recorder.record(keys)
+    
+        # Main menu state just displays the main menu until the state ends.
+        if(game_state == MAIN_MENU):
+    #         
+    #         music_player.stop()
+    #         main_menu(screen, clock, myfont)
+              game_state = PLAYING
+              music_player.play(get_map_music(tmxdata))
         
-        # Add code to reload game from save (once save is made)        
-        player_has_died = False
-        player_death_counter = 0
-        sprite_handler.reset_player(tmxdata)
-        game_state = PLAYING
-        background_music.play(-1)      
+        elif(game_state == GAME_OVER):  
         
-    # Paused state renders the background and but doesn't update sprites
-    elif(game_state == PAUSED):
+            music_player.stop()
+            game_over_menu(screen, clock, myfont)
         
-        print("paused!")
-        if(keys[PAUSE] == True):
+            # Add code to reload game from save (once save is made)        
+            player_has_died = False
+            player_death_counter = 0
+            sprite_handler.reset_player(tmxdata)
             game_state = PLAYING
-            keys[PAUSE] = False
+            music_player.play(get_map_music(tmxdata))
+        
+        # Paused state renders the background and but doesn't update sprites
+        elif(game_state == PAUSED):
+        
+            log.debug("paused!")
+            if(keys[PAUSE] == True):
+                game_state = PLAYING
+                keys[PAUSE] = False
 
-    # Playing state gives control of character        
-    elif(game_state == PLAYING):
+        # Playing state gives control of character        
+        elif(game_state == PLAYING):
     
-        # Pause if necessary
-        if(keys[PAUSE] == True):
-            game_state = PAUSED
-            keys[PAUSE] = False
+            # Pause if necessary
+            if(keys[PAUSE] == True):
+                game_state = PAUSED
+                keys[PAUSE] = False
     
-        # Check to see if we need to load a new map.
-        checked_exit_dict = sprite_handler.check_for_map_exit(tmxdata, control_state)
+            # Check to see if we need to load a new map.
+            game_timer.mark(PHASE_UPDATE)
+            checked_exit_dict = sprite_handler.check_for_map_exit(tmxdata, control_state)
+            game_timer.mark(PHASE_MAP_EXIT)
         
-        # Save the last image of the map in case we screen transition.
-        # Important to do this before we update and redraw next frame.
-        loaded_oldmap_image = game_camera.draw(map_image)
-        
-        # If player is on an exit tile, transition to new screen and start playing there.
-        if(checked_exit_dict["dest"] != "none"):
+            # If player is on an exit tile, transition to new screen and start playing there.
+            if(checked_exit_dict["dest"] != "none"):
             
-            proposed_map = checked_exit_dict["dest"]
-            new_tmxdata = preview_new_map(proposed_map) # Load new map and ask Sprite Handler to redo sprites
-            landing_coords = get_landing_coords(new_tmxdata, checked_exit_dict["dir"])
-            landing_x = landing_coords[0]
-            landing_y = landing_coords[1]
-
-            # Convert the direction of the transition to one of the globals. The map data will be in STRING format.
-            direction = 0
-            if(checked_exit_dict["dir"] == "UP"): direction = UP
-            elif(checked_exit_dict["dir"] == "DOWN"): direction = DOWN
-            elif(checked_exit_dict["dir"] == "LEFT"): direction = LEFT
-            elif(checked_exit_dict["dir"] == "RIGHT"): direction = RIGHT
+                proposed_map = checked_exit_dict["dest"]
+                # The prefetcher has usually loaded and drawn this map already.
+                new_tmxdata, new_map_renderer = prefetcher.get_map(proposed_map)
+                landing_coords = get_landing_coords(new_tmxdata, checked_exit_dict["dir"])
+                landing_x = landing_coords[0]
+                landing_y = landing_coords[1]
+
+                # Convert the direction of the transition to one of the globals. The map data will be in STRING format.
+                direction = 0
+                if(checked_exit_dict["dir"] == "UP"): direction = UP
+                elif(checked_exit_dict["dir"] == "DOWN"): direction = DOWN
+                elif(checked_exit_dict["dir"] == "LEFT"): direction = LEFT
+                elif(checked_exit_dict["dir"] == "RIGHT"): direction = RIGHT
                              
-            # Actually carry out the transition
-            composite_screen = create_transition_screen(tmxdata, new_tmxdata,landing_x,landing_y,
-                                                        direction,game_camera, keys)
-            scroll_transition_screen(composite_screen, direction, screen, clock)
+                # Actually carry out the transition. The old map is last frame's map, without the HUD.
+                # The music fades to the new map's track while the screen scrolls.
+                old_map_screen = map_screen.copy()
+                music_player.crossfade_to(get_map_music(new_tmxdata))
+                composite_screen = create_transition_screen(old_map_screen, new_tmxdata,landing_x,landing_y,
+                                                            direction,game_camera, keys, new_map_renderer)
+                scroll_transition_screen(composite_screen, direction, screen, clock, music_player)
+                dirty_renderer.request_full_redraw()
             
-            # Load the new map and get ready to play on it.        
-            current_map = proposed_map
-            tmxdata = load_new_map(current_map, sprite_handler,direction) # Load new map and ask Sprite Handler to redo sprites
-            game_camera.snap_to_target()
-            map_width = tmxdata.width*TILESIZE # Save the size of the incoming map
-            map_height = tmxdata.height*TILESIZE
-            map_image = load_map_image(tmxdata) # Set up an image size for the new map
-            loaded_map_image =  pygame.Surface((map_width, map_height)) # Save a copy of the new map's appareance
-            blit_all_tiles(loaded_map_image, tmxdata, (0, 0))
-
-        # Update game objects
-        sprite_handler.update(tmxdata, keys, control_state)
-        if(sprite_handler.change_control_mode()):
-            if(control_state == TANK_ACTIVE):
-                control_state = SOLDIER_ACTIVE
-                print("switching to soldier")
-            elif(control_state == SOLDIER_ACTIVE):
-                control_state = TANK_ACTIVE
-                print("switching to tank")
+                # Start playing on the map we just prepared. Nothing gets loaded or drawn again.
+                current_map = proposed_map
+                tmxdata = enter_prepared_map(new_tmxdata, sprite_handler,direction) # Ask Sprite Handler to redo sprites
+                current_map_renderer = new_map_renderer
+                game_camera.snap_to_target()
+                map_width = tmxdata.width*TILESIZE # Save the size of the incoming map
+                map_height = tmxdata.height*TILESIZE
+                prefetcher.prefetch_exits(tmxdata) # Get this map's neighbours ready
+                game_timer.mark(PHASE_TRANSITION)
+
+            # Update game objects
+            sprite_handler.update(tmxdata, keys, control_state)
+            if(sprite_handler.change_control_mode()):
+                if(control_state == TANK_ACTIVE):
+                    control_state = SOLDIER_ACTIVE
+                    log.info("switching to soldier")
+                elif(control_state == SOLDIER_ACTIVE):
+                    control_state = TANK_ACTIVE
+                    log.info("switching to tank")
+                
+            game_timer.mark(PHASE_UPDATE)
                 
-        # Check for collisions
-        sprite_handler.player_enemy_collision_check(control_state)
+            # Check for collisions
+            sprite_handler.player_enemy_collision_check(control_state)
+            sprite_handler.projectile_collision_check(control_state)
+            sprite_handler.item_collision_check(control_state)
+            game_timer.mark(PHASE_COLLISION)
         
-        # Update the camera
-        game_camera.update(map_width,map_height,keys)
-        if(control_state == TANK_ACTIVE):
-            game_camera.change_follow(sprite_handler.tank)
-            game_camera.change_zoom(1)
-        elif(control_state == SOLDIER_ACTIVE):
-            game_camera.change_follow(sprite_handler.soldier)
-            game_camera.change_zoom(3)
+            # Update the camera
+            game_camera.update(map_width,map_height,keys)
+            if(control_state == TANK_ACTIVE):
+                game_camera.change_follow(sprite_handler.tank)
+                game_camera.change_zoom(1)
+            elif(control_state == SOLDIER_ACTIVE):
+                game_camera.change_follow(sprite_handler.soldier)
+                game_camera.change_zoom(3)
             
-        # Stop music if player died.
-        check_player = sprite_handler.get_player(control_state)
-        if check_player.behavior_state == DEAD:
-            background_music.stop()
-            player_has_died = True
+            # Stop music if player died.
+            check_player = sprite_handler.get_player(control_state)
+            if check_player.behavior_state == DEAD:
+                music_player.stop()
+                player_has_died = True
             
-        if(player_has_died == True):
-            player_death_counter += 1
-            if(player_death_counter >= 200): game_state = GAME_OVER
+            if(player_has_died == True):
+                player_death_counter += 1
+                if(player_death_counter >= 200): game_state = GAME_OVER
+        
+        
+        # Anything else this update did (menus, pausing, the camera) counts as updating.
+        game_timer.mark(PHASE_UPDATE)
+        accumulator -= SIMULATION_STEP_MS
+        simulation_steps += 1
+    
+    # Too far behind to catch up. Drop the steps we couldn't run; the game slows down
+    # instead of spending every frame catching up.
+    if(simulation_steps == MAX_SIMULATION_STEPS):
+        accumulator = min(accumulator, SIMULATION_STEP_MS)
         
     # ----------------------------
     # Rendering (Do this in all states)
     # ----------------------------
     # This section handles actually preparing and drawing the screen
     # based on what the currently updated state of the game is.
+    
+    # Finish any music crossfade the transition didn't.
+    music_player.update()
+    
+    # Finish the maps next door a little at a time (the worker can't draw them).
+    prefetcher.update()
+    
+    # Draw sprites and the camera however far we are between the last step and the next.
+    interpolation = accumulator/SIMULATION_STEP_MS
+    sprite_handler.set_interpolation(interpolation)
+    game_camera.set_interpolation(interpolation)
 
-    # Build the map_image
-    # Note that we're applying camera offsets because, if we draw the whole map at once
-    # first, it starts to slow down dramatically.
-    map_image.fill(0)
-    map_image.blit((loaded_map_image),(0,0))
-        
-    # Draw sprites on map
-    sprite_handler.draw(map_image)
-    map_image.convert()
-        
-    # Draw the right portion of the map to the screen    
-    screen.fill(0)
-    screen.blit(game_camera.draw(map_image),(0,0))
-    screen.blit(sprite_handler.draw_hud(),(16,16))
-
-    # No matter what state we are in, flip the screen.
-    #Update the screen
-    pygame.display.flip()
+    # The dirty rect renderer builds the map image, draws sprites and the HUD,
+    # and updates only the parts of the screen that changed.
+    if(DIRTY_RECT_RENDERING):
+        dirty_renderer.draw_frame(screen, game_camera, current_map_renderer, sprite_handler, (16,16), game_timer)
+        map_screen = dirty_renderer.map_screen
+    
+    else:
+        # Build the map_image
+        # We only build the part of the map the camera can see. The map renderer
+        # draws it from its chunks, and sprites get shifted to line up with it.
+        view_rect = game_camera.get_view_rect()
+        map_image = current_map_renderer.draw_background(view_rect)
+        game_timer.mark(PHASE_MAP_COMPOSITE)
+            
+        # Draw sprites on map, then the foreground layers over them
+        sprite_handler.draw(map_image, (-view_rect.x, -view_rect.y))
+        game_timer.mark(PHASE_SPRITE_DRAW)
+        current_map_renderer.draw_foreground(map_image, view_rect)
+        game_timer.mark(PHASE_MAP_COMPOSITE)
+            
+        # Draw the right portion of the map to the screen    
+        # The camera keeps this surface until it draws again, so a transition
+        # can copy it without the HUD on top.
+        map_screen = game_camera.draw(map_image, view_rect.topleft)
+        screen.fill(0)
+        screen.blit(map_screen,(0,0))
+        game_timer.mark(PHASE_CAMERA_SCALE)
+        screen.blit(sprite_handler.draw_hud(),(16,16))
+        overlay_image = game_timer.draw_overlay()
+        if overlay_image is not None:
+            screen.blit(overlay_image, overlay_image.get_rect(topright=(SCREEN_W,0)))
+        game_timer.mark(PHASE_HUD)
     
-    # Set the game to run at 60fps
-    clock.tick(60)
+        # No matter what state we are in, flip the screen.
+        #Update the screen
+        pygame.display.flip()
+        game_timer.mark(PHASE_FLIP)
+    
+    game_timer.end_frame()
+
+# Save the recording, now that the game is over.
+if(recorder is not None):
+    recorder.checkpoint(sprite_handler, current_map, True)
+    log.info("Saved replay: %s", recorder.save(input_replay.get_replay_path()))
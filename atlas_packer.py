@@ -0,0 +1,247 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#The packer needs a display to convert images, but never shows one.
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+#Import Pygame
+import pygame
+
+#For finding the sheets and writing the manifest.
+import glob
+import json
+
+#NumPy works out each page's colours.
+import numpy
+
+#The manifest saves a checksum of every sheet, the same way compiled maps do,
+#plus its size, and its modified time for skipping the checksum on the
+#machine that packed it.
+from map_compiler import get_file_checksum
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==           TEXTURE ATLAS PACKER         ==
+# ============================================
+# Run this whenever a sprite sheet changes:
+#
+#   python atlas_packer.py
+#
+# It cuts every PNG in ATLAS_SOURCE_FOLDERS into frames, trims the empty
+# space off each frame, and packs them all onto a few ATLAS_PAGE_SIZE
+# pages. Frames that are exactly the same (like the same icon saved
+# twice) only get packed once. The pages go in ATLAS_FOLDER, along with
+# a manifest (ATLAS_MANIFEST) that says where every frame ended up.
+#
+# Frames are squares as tall as the sheet, unless ATLAS_FRAME_SIZES says
+# otherwise. Each row of frames is one animation. So in the manifest,
+#   assets[sheet]["animations"][row][column]
+# is [page, x, y, width, height, offset x, offset y]: where the trimmed frame
+# is on the page, and where it was inside the frame before it got trimmed.
+# It's None if the frame was completely empty.
+#
+# The game (see texture_atlas.py) uses the atlas for any sheet in it, and
+# goes back to loading the sheet's own PNG if the sheet has changed
+# since the atlas was built.
+#
+# The pages and manifest are committed with the game, so commit them again
+# after repacking. Pages left over from a bigger atlas get deleted.
+
+# How big the frames on a sheet are.
+#--------------------------------
+def get_frame_size(path, sheet_size):
+
+    sheet_width, sheet_height = sheet_size
+    frame_size = ATLAS_FRAME_SIZES.get(path)
+    if frame_size is None:
+        return min(sheet_height, sheet_width), sheet_height
+    return min(int(frame_size[0]), sheet_width), min(int(frame_size[1]), sheet_height)
+
+# Every sprite sheet the atlas should have, as paths with forward slashes
+# (the same way local_path writes them).
+#--------------------------------
+def get_atlas_sources(source_folders = ATLAS_SOURCE_FOLDERS):
+
+    sources = []
+    for folder in source_folders:
+        for path in sorted(glob.glob(os.path.join(folder, "*.png"))):
+            sources.append(folder + "/" + os.path.basename(path))
+    return sources
+
+# Cut a sheet into trimmed frames. Returns the sheet's size, its frame size,
+# and its frames as rows of (image, offset) or None for empty frames.
+#--------------------------------
+def cut_frames(path):
+
+    sheet = pygame.image.load(path).convert_alpha()
+    frame_width, frame_height = get_frame_size(path, sheet.get_size())
+    rows = []
+    for y in range(0, sheet.get_height(), frame_height):
+        row = []
+        for x in range(0, sheet.get_width(), frame_width):
+            cell = sheet.subsurface(pygame.Rect(x, y, frame_width, frame_height).clip(sheet.get_rect()))
+            bounds = cell.get_bounding_rect()
+            if bounds.width == 0 or bounds.height == 0:
+                row.append(None)
+            else:
+                row.append((cell.subsurface(bounds).copy(), bounds.topleft))
+        rows.append(row)
+    return sheet.get_size(), (frame_width, frame_height), rows
+
+# Find a spot for every image, filling the pages one shelf at a time: a
+# row as tall as its first (tallest) image, filled left to right. Images
+# go in tallest first, so each shelf wastes as little space as it can.
+# Returns [page, x, y] for every image, and how much of each page got used.
+#--------------------------------
+def pack_shelves(sizes, page_size = ATLAS_PAGE_SIZE, padding = ATLAS_PADDING):
+
+    positions = [None]*len(sizes)
+    page_heights = []
+    page = -1
+    x = y = shelf_height = page_size
+    for index in sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], -sizes[index][0])):
+        width, height = sizes[index]
+        if width + padding*2 > page_size or height + padding*2 > page_size:
+            raise ValueError("A frame is bigger than an atlas page: " + str(sizes[index]))
+        # Next shelf.
+        if x + width + padding > page_size:
+            x = padding
+            y += shelf_height
+            shelf_height = height + padding
+        # Next page.
+        if y + height + padding > page_size:
+            page += 1
+            page_heights.append(0)
+            x = y = padding
+            shelf_height = height + padding
+        positions[index] = [page, x, y]
+        page_heights[page] = max(page_heights[page], y + height + padding)
+        x += width + padding
+    return positions, page_heights
+
+# The sprites only use a handful of colours, and every pixel is either
+# solid or clear, like the 8 bit sheets they came from. 8 bit PNGs load
+# several times faster than 32 bit ones, so pages get saved that way when
+# they fit: a palette of their colours, plus one colour no frame uses that
+# stands for clear. PNGs can't save which colour that is, so the manifest does.
+# Returns (8 bit page, clear colour), or None if the page won't fit in 8 bits.
+#--------------------------------
+def make_palette_page(page):
+
+    pixels = numpy.frombuffer(pygame.image.tobytes(page, "RGBA"), dtype=numpy.uint8).reshape(-1, 4)
+    alphas = pixels[:,3]
+    if numpy.any((alphas != 0) & (alphas != 255)): return None
+
+    # Each pixel's colour as one number, with -1 for clear. Clear sorts first, so it's colour 0.
+    colors = (pixels[:,0].astype(numpy.int32) << 16) | (pixels[:,1].astype(numpy.int32) << 8) | pixels[:,2]
+    colors[alphas == 0] = -1
+    palette, indexes = numpy.unique(numpy.append(colors, -1), return_inverse=True)
+    if len(palette) > 256: return None
+    indexes = indexes[:-1]
+
+    colorkey = 0xFF00FF
+    while colorkey in palette:
+        colorkey -= 1
+    palette[0] = colorkey
+
+    palette_page = pygame.Surface(page.get_size(), 0, 8)
+    palette_page.set_palette([((color >> 16) & 255, (color >> 8) & 255, color & 255) for color in palette.tolist()])
+    page_pixels = pygame.surfarray.pixels2d(palette_page)
+    page_pixels[:] = indexes.reshape(page.get_height(), page.get_width()).T
+    del page_pixels
+    return palette_page, [(colorkey >> 16) & 255, (colorkey >> 8) & 255, colorkey & 255]
+
+# Build the atlas pages and the manifest. Returns the manifest.
+#--------------------------------
+def pack_atlas(sources = None, manifest_path = ATLAS_MANIFEST, page_size = ATLAS_PAGE_SIZE, padding = ATLAS_PADDING):
+
+    if sources is None:
+        sources = get_atlas_sources()
+
+    # Cut everything up first. Identical frames share one image.
+    images = []
+    image_indexes = {}
+    assets = {}
+    frame_count = 0
+    for path in sources:
+        sheet_size, frame_size, rows = cut_frames(path)
+        animations = []
+        for row in rows:
+            frames = []
+            for frame in row:
+                if frame is None:
+                    frames.append(None)
+                    continue
+                image, offset = frame
+                key = (image.get_size(), pygame.image.tobytes(image, "RGBA"))
+                if key not in image_indexes:
+                    image_indexes[key] = len(images)
+                    images.append(image)
+                frames.append((image_indexes[key], offset))
+                frame_count += 1
+            animations.append(frames)
+        assets[path] = {"checksum": get_file_checksum(path), "bytes": os.path.getsize(path),
+                        "modified": os.path.getmtime(path), "size": list(sheet_size),
+                        "frame_size": list(frame_size), "animations": animations}
+
+    positions, page_heights = pack_shelves([image.get_size() for image in images], page_size, padding)
+
+    # Draw the pages. Each frame is copied exactly (MAX onto a clear page), not
+    # blended, so the atlas has the same pixels as the sheets.
+    atlas_folder = os.path.dirname(manifest_path)
+    if atlas_folder != "":
+        os.makedirs(atlas_folder, exist_ok=True)
+    pages = [pygame.Surface((page_size, page_height), pygame.SRCALPHA) for page_height in page_heights]
+    for image, (page, x, y) in zip(images, positions):
+        pages[page].blit(image, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+    page_files = []
+    for page_number, page in enumerate(pages):
+        page_file = "atlas_" + str(page_number) + ".png"
+        colorkey = None
+        palette_page = make_palette_page(page)
+        if palette_page is not None:
+            page, colorkey = palette_page
+        pygame.image.save(page, os.path.join(atlas_folder, page_file))
+        page_files.append({"file": page_file, "colorkey": colorkey})
+    # Pages this atlas doesn't need any more would just sit there.
+    page_names = set(page_file["file"] for page_file in page_files)
+    for old_page in glob.glob(os.path.join(atlas_folder, "atlas_*.png")):
+        if os.path.basename(old_page) not in page_names:
+            os.remove(old_page)
+
+    # Swap the image numbers for where they ended up.
+    for asset in assets.values():
+        for frames in asset["animations"]:
+            for column, frame in enumerate(frames):
+                if frame is None: continue
+                image_index, offset = frame
+                page, x, y = positions[image_index]
+                width, height = images[image_index].get_size()
+                frames[column] = [page, x, y, width, height, offset[0], offset[1]]
+
+    manifest = {
+        "version": ATLAS_VERSION,
+        "pages": page_files,
+        "assets": assets,
+        "frames": frame_count,
+        "unique_frames": len(images),
+    }
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, separators=(",", ":"))
+    return manifest
+
+if __name__ == "__main__":
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    manifest = pack_atlas()
+    print("Packed", len(manifest["assets"]), "sheets,", manifest["frames"], "frames (" + str(manifest["unique_frames"]), "different) onto",
+          len(manifest["pages"]), "pages ->", ATLAS_MANIFEST)
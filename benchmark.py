@@ -0,0 +1,365 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#SDL reads these when pygame starts up, so they have to be set before
+#anything starts pygame. Benchmarks run without a window or sound unless
+#you set SDL_VIDEODRIVER yourself (e.g. to "windows" or "x11").
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+#Import Pygame
+import pygame
+
+#For reading the command line, timing, and saving results.
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+#NumPy works out the percentiles.
+import numpy
+
+#Import global methods.
+import methods
+from methods import prepare_map
+from methods import enter_prepared_map
+from methods import get_landing_coords
+from methods import create_transition_screen
+
+#Maps come from the prefetcher, the same as in the game.
+import map_prefetcher
+#The walk scenario looks at the collision grid to climb over walls.
+from collision import get_collision_grid
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==           BENCHMARK GAME               ==
+# ============================================
+# A copy of the main game loop's PLAYING state that times every part
+# of every frame. The parts (phases) are:
+#   update         Sprite_Handler.update, map exits, and the camera update
+#   collision      the player/enemy and projectile collision checks
+#   map_composite  drawing the map and sprites for the camera's view
+#   camera_scale   Camera.draw, which scales the view up to the screen
+#   flip           putting it on the screen and pygame.display.flip
+# It always draws the whole frame (not the dirty rect renderer), so every
+# phase runs every frame. Transitions skip the scrolling animation, since
+# that waits on the clock; building the transition screen still counts.
+
+BENCHMARK_PHASES = ["update", "collision", "map_composite", "camera_scale", "flip"]
+# Change this whenever the results file changes, so old results aren't misread.
+BENCHMARK_VERSION = 1
+
+class Benchmark_Game(object):
+
+    def __init__(self, start_map = STARTING_MAP):
+
+        # No mixer: sounds aren't part of the frame cost, and CI machines don't have them.
+        pygame.display.init()
+        self.screen = pygame.display.set_mode((SCREEN_W, SCREEN_H))
+
+        # Game objects need pygame running before they load anything.
+        import game_objects
+        import camera
+        self.sprite_handler = game_objects.Sprite_Handler()
+
+        self.current_map = start_map
+        self.tmxdata, self.map_renderer = prepare_map(start_map)
+        enter_prepared_map(self.tmxdata, self.sprite_handler, RIGHT)
+        self.prefetcher = map_prefetcher.Map_Prefetcher()
+        self.prefetcher.remember_map(start_map, (self.tmxdata, self.map_renderer))
+
+        self.control_state = SOLDIER_ACTIVE
+        self.game_camera = camera.Camera()
+        self.game_camera.change_follow(self.sprite_handler.get_player(self.control_state))
+        self.game_camera.snap_to_target()
+        # If this is set, the camera zooms to it instead of the zoom for the active player.
+        self.zoom_override = None
+
+        # Milliseconds each phase took, one list entry per frame.
+        self.timings = {phase: [] for phase in BENCHMARK_PHASES}
+        # Time spent between frames (like on a transition) that counts towards the next one.
+        self.pending = {phase: 0.0 for phase in BENCHMARK_PHASES}
+
+    # Switch players, the same as main does when Sprite_Handler asks.
+    def set_control_state(self, control_state):
+
+        self.control_state = control_state
+        self.game_camera.change_follow(self.sprite_handler.get_player(control_state))
+
+    # Go to a map (the same one is fine) through an exit going this way, like main does.
+    def transition(self, map_name, direction, direction_name):
+
+        start_time = time.perf_counter()
+        new_tmxdata, new_map_renderer = self.prefetcher.get_map(map_name)
+        landing_coords = get_landing_coords(new_tmxdata, direction_name)
+        composite_screen = create_transition_screen(self.screen.copy(), new_tmxdata, landing_coords[0], landing_coords[1],
+                                                    direction, self.game_camera, [False]*9, new_map_renderer)
+        composite_time = time.perf_counter()
+
+        self.current_map = map_name
+        self.tmxdata = enter_prepared_map(new_tmxdata, self.sprite_handler, direction)
+        self.map_renderer = new_map_renderer
+        self.game_camera.snap_to_target()
+        end_time = time.perf_counter()
+
+        self.pending["map_composite"] += (composite_time - start_time)*1000
+        self.pending["update"] += (end_time - composite_time)*1000
+
+    # Run and time one frame with these keys held down.
+    def frame(self, keys):
+
+        sprite_handler = self.sprite_handler
+        game_camera = self.game_camera
+
+        # Update
+        time_0 = time.perf_counter()
+        sprite_handler.check_for_map_exit(self.tmxdata, self.control_state)
+        sprite_handler.update(self.tmxdata, keys, self.control_state)
+        if(sprite_handler.change_control_mode()):
+            if(self.control_state == TANK_ACTIVE): self.set_control_state(SOLDIER_ACTIVE)
+            elif(self.control_state == SOLDIER_ACTIVE): self.set_control_state(TANK_ACTIVE)
+
+        # Collision
+        time_1 = time.perf_counter()
+        sprite_handler.player_enemy_collision_check(self.control_state)
+        sprite_handler.projectile_collision_check(self.control_state)
+        sprite_handler.item_collision_check(self.control_state)
+
+        # Camera update goes with the rest of the updating.
+        time_2 = time.perf_counter()
+        game_camera.update(self.tmxdata.width*TILESIZE, self.tmxdata.height*TILESIZE, keys)
+        if(self.zoom_override is not None): game_camera.change_zoom(self.zoom_override)
+        elif(self.control_state == TANK_ACTIVE): game_camera.change_zoom(1)
+        elif(self.control_state == SOLDIER_ACTIVE): game_camera.change_zoom(3)
+
+        # Map composite
+        time_3 = time.perf_counter()
+        view_rect = game_camera.get_view_rect()
+        map_image = self.map_renderer.draw_background(view_rect)
+        sprite_handler.draw(map_image, (-view_rect.x, -view_rect.y))
+        self.map_renderer.draw_foreground(map_image, view_rect)
+
+        # Camera scale
+        time_4 = time.perf_counter()
+        camera_image = game_camera.draw(map_image, view_rect.topleft)
+
+        # Flip
+        time_5 = time.perf_counter()
+        self.screen.fill(0)
+        self.screen.blit(camera_image, (0,0))
+        self.screen.blit(sprite_handler.draw_hud(), (16,16))
+        pygame.display.flip()
+        time_6 = time.perf_counter()
+
+        phase_times = {
+            "update": (time_1 - time_0) + (time_3 - time_2),
+            "collision": time_2 - time_1,
+            "map_composite": time_4 - time_3,
+            "camera_scale": time_5 - time_4,
+            "flip": time_6 - time_5,
+        }
+        for phase in BENCHMARK_PHASES:
+            self.timings[phase].append(phase_times[phase]*1000 + self.pending[phase])
+            self.pending[phase] = 0.0
+
+# ============================================
+# ==             SCENARIOS                  ==
+# ============================================
+# Each scenario plays frame_count frames on a fresh Benchmark_Game.
+
+# Stand still on the starting map.
+def scenario_idle(game, frame_count):
+
+    for frame in range(frame_count):
+        game.frame([False]*9)
+
+# Put a player on top of the wall in front of them. Looks at the column
+# two tiles ahead and finds the first open tile, going up from the player's
+# feet, with something solid under it. Returns False if there isn't one.
+def climb_ahead(game, player, direction):
+
+    collision_grid = get_collision_grid(game.tmxdata)
+    column = player.rect.centerx//TILESIZE + 2*direction
+    if(column < 0 or column >= collision_grid.width): return False
+    for row in range(player.rect.bottom//TILESIZE, 0, -1):
+        if(not collision_grid.flags_at_tile(column, row) & TILE_SOLID and
+           collision_grid.flags_at_tile(column, row+1) & TILE_SOLID):
+            player.setpos(column*TILESIZE, row*TILESIZE + TILESIZE - player.rect.height)
+            player.vector[0] = 0
+            player.vector[1] = 0
+            return True
+    return False
+
+# Walk the soldier across the whole map and back, then the tank.
+# Hop every so often to get over bumps. Mars05 has walls taller than
+# anyone can jump, so if the player hasn't gotten anywhere for a while,
+# they get put on top of the wall in front of them.
+def scenario_walk(game, frame_count, stuck_frames = 30):
+
+    leg_length = max(frame_count//4, 1)
+    last_x = None
+    frames_stuck = 0
+    for frame in range(frame_count):
+        leg = frame//leg_length
+        if(leg == 2 and game.control_state != TANK_ACTIVE): game.set_control_state(TANK_ACTIVE)
+        keys = [False]*9
+        if(leg % 2 == 0): keys[RIGHT] = True
+        else: keys[LEFT] = True
+        keys[JUMP] = (frame % 60) < 20
+
+        player = game.sprite_handler.get_player(game.control_state)
+        if(player.rect.x == last_x): frames_stuck += 1
+        else: frames_stuck = 0
+        last_x = player.rect.x
+        if(frames_stuck >= stuck_frames):
+            if(keys[RIGHT]): climb_ahead(game, player, 1)
+            else: climb_ahead(game, player, -1)
+            frames_stuck = 0
+        game.frame(keys)
+
+# Fire as fast as the soldier can, and also spawn a burst of bullets and a
+# muzzle effect every frame, the way the spread weapons will. The bullets
+# come from the projectile engine and the effects from their pool, which
+# is how the game makes them now.
+def scenario_rapid_fire(game, frame_count, burst_size = 16):
+
+    sprite_handler = game.sprite_handler
+    for frame in range(frame_count):
+        keys = [False]*9
+        keys[FIRE] = (frame % 2 == 0)
+        start_time = time.perf_counter()
+        player_pos = sprite_handler.get_player_pos(game.control_state)
+        angles = numpy.linspace(-0.5, 0.5, burst_size) + frame*0.1
+        sprite_handler.player_projectiles.spawn_many("small_bullet", [player_pos[0]]*burst_size, [player_pos[1]]*burst_size,
+                                                     numpy.cos(angles)*8, numpy.sin(angles)*8)
+        sprite_handler.effect_list.add(sprite_handler.effect_pools["pellet_burst"].acquire(player_pos[0], player_pos[1], RIGHT))
+        game.pending["update"] += (time.perf_counter() - start_time)*1000
+        game.frame(keys)
+
+# Go through the exit over and over, turning around each time.
+def scenario_transitions(game, frame_count, frames_between = 20):
+
+    for frame in range(frame_count):
+        if(frame % frames_between == frames_between - 1):
+            if((frame//frames_between) % 2 == 0): game.transition(game.current_map, RIGHT, "RIGHT")
+            else: game.transition(game.current_map, LEFT, "LEFT")
+        game.frame([False]*9)
+
+# Zoom the camera in and out between 1 and 3 while walking.
+def scenario_zoom(game, frame_count, frames_between = 30):
+
+    for frame in range(frame_count):
+        if((frame//frames_between) % 2 == 0): game.zoom_override = 1
+        else: game.zoom_override = 3
+        keys = [False]*9
+        keys[RIGHT] = True
+        game.frame(keys)
+
+# Name, scenario, and how many frames it runs by default.
+SCENARIOS = [
+    ("idle", scenario_idle, 600),
+    ("walk", scenario_walk, 6000),
+    ("rapid_fire", scenario_rapid_fire, 600),
+    ("transitions", scenario_transitions, 600),
+    ("zoom", scenario_zoom, 600),
+]
+
+# ============================================
+# ==              RESULTS                   ==
+# ============================================
+
+# p50, p95 and p99 (and the mean and worst) of a list of frame times, in milliseconds.
+def summarize_times(times):
+
+    times = numpy.array(times, dtype=numpy.float64)
+    if len(times) == 0:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = numpy.percentile(times, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(times.mean()), 4),
+        "max_ms": round(float(times.max()), 4),
+    }
+
+# Run one scenario and summarize it. The first warmup frames are left out
+# of the numbers, since they're mostly drawing map chunks for the first time.
+def run_scenario(scenario, frame_count, warmup, start_map = STARTING_MAP):
+
+    game = Benchmark_Game(start_map)
+    start_time = time.perf_counter()
+    scenario(game, frame_count + warmup)
+    seconds = time.perf_counter() - start_time
+
+    phases = {}
+    total_times = numpy.zeros(frame_count)
+    for phase in BENCHMARK_PHASES:
+        times = game.timings[phase][warmup:]
+        phases[phase] = summarize_times(times)
+        total_times += times
+    return {
+        "frames": frame_count,
+        "warmup_frames": warmup,
+        "seconds": round(seconds, 4),
+        "total": summarize_times(total_times),
+        "phases": phases,
+    }
+
+# The git commit being benchmarked, if this is a git checkout.
+def get_revision():
+
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+
+    scenario_names = [name for name, scenario, frame_count in SCENARIOS]
+    parser = argparse.ArgumentParser(description="Time every part of the frame in a set of scripted scenarios.")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run: " + ", ".join(scenario_names) + " (default: all)")
+    parser.add_argument("--frames", type=int, help="frames per scenario, instead of each one's default")
+    parser.add_argument("--warmup", type=int, default=30, help="frames to run before timing starts")
+    parser.add_argument("--map", default=STARTING_MAP, help="map to run on")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to save the JSON results")
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in scenario_names: parser.error("unknown scenario: " + name)
+
+    results = {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "map": args.map,
+        "scenarios": {},
+    }
+
+    for name, scenario, frame_count in SCENARIOS:
+        if len(args.scenarios) > 0 and name not in args.scenarios: continue
+        if args.frames is not None: frame_count = args.frames
+        result = run_scenario(scenario, frame_count, args.warmup, args.map)
+        results["scenarios"][name] = result
+
+        print(name, "-", frame_count, "frames in", result["seconds"], "seconds")
+        for phase in ["total"] + BENCHMARK_PHASES:
+            summary = result["total"] if phase == "total" else result["phases"][phase]
+            print("   ", phase.ljust(14), "p50", summary["p50_ms"], "ms   p95", summary["p95_ms"], "ms   p99", summary["p99_ms"], "ms")
+
+    with open(args.output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print("Saved results:", args.output)
@@ -63,6 +63,11 @@ class Camera(object):
         # NOT MEASURED FROM TOP LEFT!
         self.x = 100
         self.y = 300
+        # Where the camera was before the last update. It gets drawn somewhere
+        # between here and (x,y), depending on how far we are to the next update.
+        self.previous_x = self.x
+        self.previous_y = self.y
+        self.interpolation = 1.0
         
         # A pointer to the sprite the camera is following
         self.following = pygame.sprite
@@ -78,6 +83,10 @@ class Camera(object):
         self.camera_speed = 2
         
         self.camera_scaled = pygame.Surface
+        
+        # Surfaces for draw() to reuse, so it doesn't make new ones every frame.
+        # One pair for each zoom level: {zoom: (camera_view, camera_scaled)}
+        self.zoom_buffers = {}
 
     def change_follow(self, target_sprite):
 
@@ -98,17 +107,39 @@ class Camera(object):
         
         self.x = self.target_x
         self.y = self.target_y
+        self.save_previous_position()
         
     def snap_to_coords(self, new_x, new_y):
         
         self.x = new_x
         self.y = new_y
+        self.save_previous_position()
+    
+    # Call before every update, so the camera can be drawn between updates.
+    def save_previous_position(self):
+        
+        self.previous_x = self.x
+        self.previous_y = self.y
+    
+    # How far we are from the last update to the next one, from 0 to 1.
+    # Everything the camera draws after this uses the in-between position.
+    def set_interpolation(self, interpolation):
+        
+        self.interpolation = interpolation
+    
+    # The center of the camera as it should be drawn right now.
+    def get_render_pos(self):
+        
+        render_x = self.previous_x + (self.x - self.previous_x)*self.interpolation
+        render_y = self.previous_y + (self.y - self.previous_y)*self.interpolation
+        return render_x, render_y
         
     def update(self, map_width, map_height, keys):
         
-        #Change zoom based on keys
-        if(self.zoom > self.target_zoom): self.zoom -= 1
-        elif(self.zoom < self.target_zoom): self.zoom += 1
+        #Change zoom based on keys. Don't step past the target, or we'd
+        #bounce back and forth around it forever.
+        if(self.zoom > self.target_zoom): self.zoom = max(self.zoom - 1, self.target_zoom)
+        elif(self.zoom < self.target_zoom): self.zoom = min(self.zoom + 1, self.target_zoom)
             
         #Determine size of camera view based on zoom.
         self.view_width = SCREEN_W/self.zoom
@@ -135,37 +166,222 @@ class Camera(object):
         if(self.y>map_height-(self.view_height/2)):
             self.y = map_height-(self.view_height/2)
 
-    def draw(self,pre_render_image):
+    # Get the view and output surfaces for a zoom level, making them the first
+    # time that zoom is used.
+    def get_zoom_buffers(self, zoom):
+        
+        buffers = self.zoom_buffers.get(zoom)
+        if buffers is None:
+            if(zoom == int(zoom)):
+                # Whole number zoom: the view is just big enough that scaling it up
+                # by exactly the zoom covers the screen. Any extra gets cut off.
+                view_size = (math.ceil(SCREEN_W/zoom), math.ceil(SCREEN_H/zoom))
+                scaled_size = (view_size[0]*int(zoom), view_size[1]*int(zoom))
+            else:
+                # Pygame surfaces only use integers, so we need to round off the
+                # view sizes, which can be floats.
+                view_size = (round(SCREEN_W/zoom), round(SCREEN_H/zoom))
+                scaled_size = (SCREEN_W, SCREEN_H)
+            buffers = (pygame.Surface(view_size).convert(), pygame.Surface(scaled_size).convert())
+            self.zoom_buffers[zoom] = buffers
+        return buffers
+
+    # Draws the part of the map the camera sees, scaled up to fill the screen.
+    # The surface this returns gets reused the next time draw is called, so
+    # copy it (blit it somewhere) if you need to keep it.
+    # pre_render_image doesn't have to be the whole map; image_origin says
+    # where on the map its top left corner is.
+    def draw(self,pre_render_image,image_origin=(0,0)):
         
         # Figure out how much of map image to draw based on zoom
         # We're looking at how much of the map we want to actually see.
-        x1 = self.x - self.view_width/2
-        y1 = self.y - self.view_height/2
-        x2 = self.view_width
-        y2 = self.view_height
-        
-        # Now, calculate round integers. We're about to make a temporary
-        # image that is exactly as large as the section of the screen
-        # that we want to display. Pygame surfaces only use integers, so
-        # we need to round off the view sizes, which can be floats.
-        approx_width = round(self.view_width,0)
-        approx_height = round(self.view_height,0)
-        # Create a temporary image just big enough for the part of the map we want.
-        camera_view = pygame.Surface((approx_width,approx_height))
+        render_x, render_y = self.get_render_pos()
+        x1 = render_x - self.view_width/2
+        y1 = render_y - self.view_height/2
+        
+        # Reuse the surfaces made for this zoom level instead of making new ones.
+        camera_view, self.camera_scaled = self.get_zoom_buffers(self.zoom)
         
         # Grab the portion of the map_image caculated by the zoom and load it
         # into our custom-sized image.
+        view_area = pygame.Rect(x1,y1,camera_view.get_width(),camera_view.get_height())
+        view_area.move_ip(-image_origin[0],-image_origin[1])
+        camera_view.fill(0)
         camera_view.blit( (pre_render_image), #Start with the pre-render image
                                (0,0), # draw it to the camera starting at corner 0,0
-                               (x1,y1,x2,y2) # Draw the section at the camera view            
+                               view_area # Draw the section at the camera view            
             )
 
         # Lastly, scale the image back to match the size of the screen showing to
-        # the player.
-        self.camera_scaled = pygame.transform.smoothscale(camera_view, (SCREEN_W, SCREEN_H))
+        # the player. Scaling by a whole number doesn't need smoothing, so use
+        # the much faster nearest neighbour scale for that. Both scale straight
+        # into the saved surface instead of making a new one.
+        if(self.zoom == int(self.zoom)):
+            if(self.zoom == 1):
+                self.camera_scaled = camera_view
+            else:
+                pygame.transform.scale(camera_view, self.camera_scaled.get_size(), self.camera_scaled)
+        else:
+            pygame.transform.smoothscale(camera_view, self.camera_scaled.get_size(), self.camera_scaled)
         
-        self.camera_scaled.convert
         return self.camera_scaled
+    
+    # The part of the map (in map pixels) the camera can currently see.
+    # Rounded outwards so it always covers the whole screen.
+    def get_view_rect(self):
+        
+        render_x, render_y = self.get_render_pos()
+        x1 = render_x - self.view_width/2
+        y1 = render_y - self.view_height/2
+        view_rect = pygame.Rect(x1, y1, 0, 0)
+        view_rect.width = math.ceil(self.view_width)+1
+        view_rect.height = math.ceil(self.view_height)+1
+        return view_rect
+    
+    # Draw just one rectangle of the map image to the screen, scaled up by the zoom.
+    # Only works for whole-number zooms, where every map pixel lands exactly on screen
+    # pixels. Returns the rectangle of the screen that was drawn to.
+    # Like draw, image_origin is where on the map the image's top left corner is.
+    def draw_region(self, screen, pre_render_image, map_rect, image_origin=(0,0)):
+        
+        view_rect = self.get_view_rect()
+        image_rect = pre_render_image.get_rect(topleft=image_origin)
+        map_rect = map_rect.clip(view_rect).clip(image_rect)
+        if(map_rect.width <= 0 or map_rect.height <= 0):
+            return None
+        
+        zoom = int(self.zoom)
+        screen_rect = pygame.Rect((map_rect.x-view_rect.x)*zoom, (map_rect.y-view_rect.y)*zoom,
+                                  map_rect.width*zoom, map_rect.height*zoom)
+        region = pre_render_image.subsurface(map_rect.move(-image_origin[0],-image_origin[1]))
+        if(zoom == 1):
+            screen.blit(region, screen_rect)
+        else:
+            screen.blit(pygame.transform.scale(region, screen_rect.size), screen_rect)
+        return screen_rect.clip(screen.get_rect())
+
+# ============================================
+# ==         DIRTY RECT RENDERER            ==
+# ============================================
+# Most frames, the camera sits still and only a few sprites move.
+# Redrawing the whole map and scaling the whole screen for that is
+# a waste. The dirty rect renderer remembers where every sprite was
+# drawn last frame. When the camera hasn't moved, it only patches the
+# map back where the sprites were, draws the sprites where they are
+# now, and sends just those rectangles to the display.
+# If the camera moved, zoomed, or the map changed, it draws everything.
+# The map goes on map_screen first and gets copied to the screen under the
+# HUD, so map_screen always has last frame's map without the HUD on it.
 
+class Dirty_Renderer(object):
+    
+    def __init__(self):
+        
+        # Where sprites were drawn on the map last frame.
+        self.last_sprite_rects = []
+        # Where the HUD was drawn on the screen last frame.
+        self.last_hud_rect = pygame.Rect(0,0,0,0)
+        # What the camera was looking at last frame: (view rect, zoom)
+        self.last_camera_state = None
+        # The map renderer we drew with last frame. A new one means a new map.
+        self.last_map_renderer = None
+        # Set this to force the next frame to be drawn in full.
+        self.full_redraw = True
+        # Last frame's map, as it is on the screen, but without the HUD or overlay.
+        self.map_screen = pygame.Surface((SCREEN_W,SCREEN_H))
+        
+    def request_full_redraw(self):
+        self.full_redraw = True
+    
+    # Draw the frame and update the display. If there's a frame timer, each part
+    # gets marked on it, and its overlay (if it's on) goes in the top right.
+    def draw_frame(self, screen, game_camera, map_renderer, sprite_handler, hud_position, frame_timer = None):
+        
+        sprite_rects = sprite_handler.get_draw_rects()
+        if frame_timer is not None: frame_timer.mark(PHASE_SPRITE_DRAW)
+        hud_image = sprite_handler.draw_hud()
+        hud_rect = hud_image.get_rect(topleft=hud_position)
+        overlay_image = None
+        if frame_timer is not None:
+            overlay_image = frame_timer.draw_overlay()
+            frame_timer.mark(PHASE_HUD)
+        
+        view_rect = game_camera.get_view_rect()
+        camera_state = (view_rect, game_camera.zoom)
+        whole_zoom = (game_camera.zoom == int(game_camera.zoom))
+        
+        if(self.full_redraw or not whole_zoom or camera_state != self.last_camera_state or
+           map_renderer is not self.last_map_renderer):
+            
+            # Draw everything, just like the normal renderer.
+            map_canvas = map_renderer.draw_background(view_rect)
+            if frame_timer is not None: frame_timer.mark(PHASE_MAP_COMPOSITE)
+            sprite_handler.draw(map_canvas, (-view_rect.x, -view_rect.y))
+            if frame_timer is not None: frame_timer.mark(PHASE_SPRITE_DRAW)
+            map_renderer.draw_foreground(map_canvas, view_rect)
+            self.map_screen.fill(0)
+            if frame_timer is not None: frame_timer.mark(PHASE_MAP_COMPOSITE)
+            if(whole_zoom):
+                game_camera.draw_region(self.map_screen, map_canvas, view_rect, view_rect.topleft)
+            else:
+                self.map_screen.blit(game_camera.draw(map_canvas, view_rect.topleft),(0,0))
+            screen.blit(self.map_screen,(0,0))
+            if frame_timer is not None: frame_timer.mark(PHASE_CAMERA_SCALE)
+            screen.blit(hud_image, hud_rect)
+            if overlay_image is not None:
+                screen.blit(overlay_image, overlay_image.get_rect(topright=(SCREEN_W,0)))
+            if frame_timer is not None: frame_timer.mark(PHASE_HUD)
+            pygame.display.flip()
+            
+        else:
+            
+            # The camera hasn't moved, so the view canvas still holds last frame.
+            map_canvas = map_renderer.get_view_canvas(view_rect.size)
             
-    
\ No newline at end of file
+            # Patch the background back where sprites were and where they're about to be...
+            dirty_map_rects = []
+            for dirty_rect in self.last_sprite_rects + sprite_rects:
+                dirty_rect = dirty_rect.clip(view_rect)
+                if(dirty_rect.width > 0 and dirty_rect.height > 0):
+                    map_renderer.draw_background_area(map_canvas, view_rect, dirty_rect)
+                    dirty_map_rects.append(dirty_rect)
+            if frame_timer is not None: frame_timer.mark(PHASE_MAP_COMPOSITE)
+            # ...then draw the sprites again on top, and the foreground over them.
+            sprite_handler.draw(map_canvas, (-view_rect.x, -view_rect.y))
+            if frame_timer is not None: frame_timer.mark(PHASE_SPRITE_DRAW)
+            for dirty_rect in dirty_map_rects:
+                map_renderer.draw_foreground_area(map_canvas, view_rect, dirty_rect)
+            if frame_timer is not None: frame_timer.mark(PHASE_MAP_COMPOSITE)
+            
+            # Copy just those parts of the map to the screen.
+            screen_rects = []
+            for dirty_rect in dirty_map_rects:
+                screen_rect = game_camera.draw_region(self.map_screen, map_canvas, dirty_rect, view_rect.topleft)
+                if screen_rect is not None:
+                    screen.blit(self.map_screen, screen_rect, screen_rect)
+                    screen_rects.append(screen_rect)
+            if frame_timer is not None: frame_timer.mark(PHASE_CAMERA_SCALE)
+                    
+            # The HUD sits on top of the map, so put the map back under it and draw it again.
+            hud_dirty_rect = hud_rect.union(self.last_hud_rect)
+            screen.blit(self.map_screen, hud_dirty_rect, hud_dirty_rect)
+            screen.blit(hud_image, hud_rect)
+            screen_rects.append(hud_dirty_rect)
+            
+            # Same for the frame timer's overlay. Turning it on or off asks for a full redraw,
+            # so it's always in the same place here.
+            if overlay_image is not None:
+                overlay_rect = overlay_image.get_rect(topright=(SCREEN_W,0))
+                screen.blit(self.map_screen, overlay_rect, overlay_rect)
+                screen.blit(overlay_image, overlay_rect)
+                screen_rects.append(overlay_rect)
+            if frame_timer is not None: frame_timer.mark(PHASE_HUD)
+            
+            pygame.display.update(screen_rects)
+        
+        self.last_sprite_rects = sprite_rects
+        self.last_hud_rect = hud_rect
+        self.last_camera_state = camera_state
+        self.last_map_renderer = map_renderer
+        self.full_redraw = False
+        if frame_timer is not None: frame_timer.mark(PHASE_FLIP)
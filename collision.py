@@ -0,0 +1,242 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#Import functions that let us read and write
+#to .tmx files, which are what Tiled Map Editor
+#creates.
+import pytmx
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==          COLLISION GRID                ==
+# ============================================
+# Asking pytmx for tile properties means a dictionary
+# lookup (and a try/except) every single time, and the
+# physics code asks several times per sprite per frame.
+# Instead, when a map loads we go through the block layer
+# once and pack each tile's properties into a single byte,
+# one bit per property (see the TILE_ flags in constants).
+# After that, looking a tile up is just indexing a bytearray.
+
+class Collision_Grid(object):
+    
+    def __init__(self, tmxdata):
+        
+        # Size of the map in tiles.
+        self.width = tmxdata.width
+        self.height = tmxdata.height
+        
+        # One byte per tile, row by row. Start every tile as solid, the same
+        # as the old code did for tiles with no properties at all.
+        self.cells = bytearray([TILE_SOLID]) * (self.width * self.height)
+        
+        # Lots of tiles share a gid, so only work out the flags for each gid once.
+        # Compiled maps come with the flags for every gid already worked out.
+        flags_by_gid = {}
+        tile_flags = getattr(tmxdata, "tile_flags", None)
+        
+        block_layer = tmxdata.layers[BLOCK_LAYER]
+        if isinstance(block_layer, pytmx.TiledTileLayer):
+            for tile_x, tile_y, gid in block_layer.iter_data():
+                if tile_flags is not None and gid < len(tile_flags):
+                    flags = tile_flags[gid]
+                else:
+                    flags = flags_by_gid.get(gid)
+                    if flags is None:
+                        flags = tile_flags_from_properties(tmxdata.get_tile_properties_by_gid(gid))
+                        flags_by_gid[gid] = flags
+                self.cells[tile_y * self.width + tile_x] = flags
+    
+    # Get the flags of a tile from its grid location.
+    # Anything off the edge of the map counts as solid.
+    def flags_at_tile(self, tile_x, tile_y):
+        if(0 <= tile_x < self.width and 0 <= tile_y < self.height):
+            return self.cells[tile_y * self.width + tile_x]
+        return TILE_SOLID
+    
+    # Get the flags of the tile under a point in the world (in pixels).
+    def flags_at(self, world_x, world_y):
+        return self.flags_at_tile(int(world_x // TILESIZE), int(world_y // TILESIZE))
+    
+    # All the flags of a run of tiles in one column, ORed together.
+    def flags_in_column(self, tile_x, first_tile_y, last_tile_y):
+        flags = 0
+        for tile_y in range(first_tile_y, last_tile_y+1):
+            flags = flags | self.flags_at_tile(tile_x, tile_y)
+        return flags
+    
+    # All the flags of a run of tiles in one row, ORed together.
+    def flags_in_row(self, tile_y, first_tile_x, last_tile_x):
+        flags = 0
+        for tile_x in range(first_tile_x, last_tile_x+1):
+            flags = flags | self.flags_at_tile(tile_x, tile_y)
+        return flags
+
+# ============================================
+# ==              HITBOXES                  ==
+# ============================================
+# A hitbox describes the part of a body that bumps into the map.
+# It is measured from the top left of the sprite's rect, so a body
+# can have a hitbox that is smaller or bigger than its rect.
+# Every body that moves through the map gets one of these instead
+# of its own hand-written collision checks.
+
+class Hitbox(object):
+    
+    def __init__(self, offset_x, offset_y, width, height, hazard_flags = 0):
+        
+        # Where the hitbox starts, measured from the top left of the rect.
+        self.offset_x = int(offset_x)
+        self.offset_y = int(offset_y)
+        # Size of the hitbox in pixels.
+        self.width = int(width)
+        self.height = int(height)
+        
+        # Tiles with these flags stop the body moving sideways or up.
+        self.wall_flags = TILE_SOLID
+        # Tiles with these flags can be landed on. Platforms only count from above.
+        self.ground_flags = TILE_SOLID | TILE_PLATFORM
+        # Tiles with these flags hurt the body when it's standing on them.
+        self.hazard_flags = hazard_flags
+
+# What happened when a hitbox moved through the map.
+class Sweep_Result(object):
+    
+    def __init__(self, x, y):
+        
+        # Where the rect ended up.
+        self.x = x
+        self.y = y
+        # Whether the movement got stopped on each axis.
+        self.blocked_x = False
+        self.blocked_y = False
+        # Whether the body is standing on something when it's done moving.
+        self.on_ground = False
+        # The flags of the tiles the body landed on this move, ORed together.
+        # Still 0 if it was already standing there, so spikes only hurt on
+        # landing, like they always have.
+        self.ground_tile_flags = 0
+
+# ============================================
+# ==          COLLISION METHODS             ==
+# ============================================
+
+# Turn a tile's property dictionary from the TSX into a byte of flags.
+# Tiles with no properties at all count as solid, just to be safe.
+#--------------------------------
+def tile_flags_from_properties(properties):
+    
+    if properties is None:
+        return TILE_SOLID
+    
+    flags = 0
+    for property_name in TILE_PROPERTY_FLAGS:
+        if properties.get(property_name, False) == True:
+            flags = flags | TILE_PROPERTY_FLAGS[property_name]
+    return flags
+
+# Build the collision grid for a map and save it on the map data.
+#--------------------------------
+def compile_collision_grid(tmxdata):
+    
+    tmxdata.collision_grid = Collision_Grid(tmxdata)
+    return tmxdata.collision_grid
+
+# Round a movement to whole pixels the same way a pygame Rect does when
+# you add a float to its position (halves round away from zero).
+#--------------------------------
+def whole_pixels(amount):
+    
+    if(amount < 0):
+        return -int(-amount + 0.5)
+    return int(amount + 0.5)
+
+# Move a hitbox through the map by a vector and stop it at anything solid.
+# Moves horizontally first, then vertically. On each axis it only looks at
+# the tiles the leading edge of the hitbox actually crosses, so it can't skip
+# through a wall no matter how fast the body is going. Returns a Sweep_Result
+# with the new rect position, what blocked it, and whether it's on the ground.
+#--------------------------------
+def sweep_hitbox(collision_grid, hitbox, rect_x, rect_y, vector):
+    
+    result = Sweep_Result(rect_x, rect_y)
+    left = rect_x + hitbox.offset_x
+    top = rect_y + hitbox.offset_y
+    
+    # Horizontal ---------------
+    move_x = whole_pixels(vector[0])
+    if(move_x != 0):
+        first_row = top // TILESIZE
+        last_row = (top + hitbox.height - 1) // TILESIZE
+        if(move_x > 0):
+            # Walk the columns to the right of our right edge, nearest first.
+            right = left + hitbox.width
+            for column in range((right - 1)//TILESIZE + 1, (right - 1 + move_x)//TILESIZE + 1):
+                if(collision_grid.flags_in_column(column, first_row, last_row) & hitbox.wall_flags):
+                    move_x = column*TILESIZE - right
+                    result.blocked_x = True
+                    break
+        else:
+            # Walk the columns to the left of our left edge, nearest first.
+            for column in range(left//TILESIZE - 1, (left + move_x)//TILESIZE - 1, -1):
+                if(collision_grid.flags_in_column(column, first_row, last_row) & hitbox.wall_flags):
+                    move_x = (column + 1)*TILESIZE - left
+                    result.blocked_x = True
+                    break
+        left += move_x
+        result.x += move_x
+    
+    # Vertical ---------------
+    first_column = left // TILESIZE
+    last_column = (left + hitbox.width - 1) // TILESIZE
+    move_y = whole_pixels(vector[1])
+    if(move_y > 0):
+        # Walk the rows below our feet, nearest first. We only look at rows we
+        # weren't already in, so we can jump up through platforms and land on them.
+        bottom = top + hitbox.height
+        for row in range((bottom - 1)//TILESIZE + 1, (bottom - 1 + move_y)//TILESIZE + 1):
+            row_flags = collision_grid.flags_in_row(row, first_column, last_column)
+            if(row_flags & hitbox.ground_flags):
+                move_y = row*TILESIZE - bottom
+                result.blocked_y = True
+                result.on_ground = True
+                result.ground_tile_flags = row_flags
+                break
+    elif(move_y < 0):
+        # Walk the rows above our head, nearest first.
+        for row in range(top//TILESIZE - 1, (top + move_y)//TILESIZE - 1, -1):
+            if(collision_grid.flags_in_row(row, first_column, last_column) & hitbox.wall_flags):
+                move_y = (row + 1)*TILESIZE - top
+                result.blocked_y = True
+                break
+    top += move_y
+    result.y += move_y
+    
+    # Ground contact ---------------
+    # If we didn't land this move, we might still be standing on something.
+    # That's only possible if our feet are lined up exactly with the top of a tile row.
+    bottom = top + hitbox.height
+    if(result.on_ground == False and move_y >= 0 and bottom % TILESIZE == 0):
+        if(collision_grid.flags_in_row(bottom // TILESIZE, first_column, last_column) & hitbox.ground_flags):
+            result.on_ground = True
+    
+    return result
+
+# Get the collision grid for a map, building it first if the map doesn't have one yet.
+#--------------------------------
+def get_collision_grid(tmxdata):
+    
+    collision_grid = getattr(tmxdata, "collision_grid", None)
+    if collision_grid is None:
+        collision_grid = compile_collision_grid(tmxdata)
+    return collision_grid
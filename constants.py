@@ -33,15 +33,158 @@ TERMINAL_VELOCITY = 4
 SCREEN_W = 640
 SCREEN_H = 480
 STARTING_CAMERA_ZOOM = 1.5
+# Only redraw the parts of the screen that changed when the camera is still.
+DIRTY_RECT_RENDERING = True
+
+# Timing Information
+# The game logic always runs this many times a second, no matter how fast
+# or slow the screen gets drawn. Drawing happens up to RENDER_FPS_CAP times
+# a second, and moves sprites part of the way between logic steps so motion
+# stays smooth.
+SIMULATION_RATE = 60
+SIMULATION_STEP_MS = 1000/SIMULATION_RATE
+# Most frames a second to draw. The clock sleeps between frames to keep
+# under it, so a fast computer doesn't spend a whole CPU core redrawing the
+# same thing. 144 keeps up with most fast monitors. 0 means no cap at all
+# (the clock never sleeps), which is only useful for measuring.
+RENDER_FPS_CAP = 144
+# If drawing falls so far behind that this many logic steps are waiting,
+# run this many and let the game slow down, instead of trying to catch up
+# forever (each catch-up step makes the next frame later still).
+MAX_SIMULATION_STEPS = 5
 
 # Map Information
 
 TILESIZE = 32
+# The map the game starts on.
+STARTING_MAP = "Maps/Mapdata/Mars05.tmx"
 BLOCK_LAYER = 1 # This is the layerID in Tiled we use for solidity checks with tiles on the map.
 BACKGROUND_LAYER = 3
 FOREGROUND_LAYER_1 = 4
 FOREGROUND_LAYER_2 = 6
 OBJECT_LAYER = 5
+# The map gets drawn in square chunks this many tiles on a side.
+MAP_CHUNK_TILES = 16
+# How many bytes of drawn map chunks to keep before throwing old ones away.
+MAP_CHUNK_MEMORY_BUDGET = 32*1024*1024
+# How many neighbouring maps the prefetcher keeps loaded and ready.
+MAP_PREFETCH_CACHE_SIZE = 4
+# Milliseconds per frame the main thread spends finishing prefetched maps
+# (converting their tiles and drawing chunks around the entrance).
+MAP_PREFETCH_FRAME_BUDGET_MS = 2
+# How many of each kind of effect to make ahead of time, so the first few don't allocate.
+EFFECT_POOL_PREALLOCATE = 8
+# Room for this many player projectiles before the projectile engine has to grow its arrays.
+PROJECTILE_ENGINE_CAPACITY = 256
+# Sprites get sorted into square cells this many pixels on a side for collision checks.
+SPATIAL_HASH_CELL_SIZE = TILESIZE*2
+# Exits get sorted into a grid of square cells this many pixels on a side.
+OBJECT_GRID_CELL_SIZE = TILESIZE*4
+# Compiled maps (see map_compiler.py) sit next to the .tmx with this extension.
+COMPILED_MAP_EXTENSION = ".mapc"
+# Change this whenever the compiled map format changes, so old files get ignored.
+COMPILED_MAP_VERSION = 1
+# Save parsed tilesets next to their TSX (with this extension) so the next run
+# doesn't have to parse the XML again. See tileset_cache.py.
+PERSIST_TILESET_CACHE = True
+TILESET_CACHE_EXTENSION = ".tilecache"
+# Change this whenever the saved tileset format changes, so old files get ignored.
+TILESET_CACHE_VERSION = 1
+
+# Frame Timing
+# Time every part of every frame (see frame_timer.py). Press F3 in game for
+# a graph of the times, and F4 to save them to a CSV file.
+FRAME_TIMING = True
+# How many frames of times to keep. 600 is ten seconds at 60 frames a second.
+FRAME_TIMER_SAMPLES = 600
+# How many frames to wait between redrawing the graph.
+FRAME_TIMER_OVERLAY_REFRESH = 15
+# The parts of a frame. Each frame's time gets split between these.
+PHASE_EVENT_PUMP = 0
+PHASE_MAP_EXIT = 1
+PHASE_TRANSITION = 2
+PHASE_UPDATE = 3
+PHASE_COLLISION = 4
+PHASE_MAP_COMPOSITE = 5
+PHASE_SPRITE_DRAW = 6
+PHASE_CAMERA_SCALE = 7
+PHASE_HUD = 8
+PHASE_FLIP = 9
+FRAME_PHASE_NAMES = ["event_pump", "map_exit", "transition", "update", "collision",
+                     "map_composite", "sprite_draw", "camera_scale", "hud", "flip"]
+
+# Sound Information
+# Every sound in this folder gets loaded once at startup (see sound_manager.py).
+SOUND_FOLDER = "Assets/Sounds"
+# Mixer channels kept for each kind of sound. One kind can only use its own
+# channels, so spamming one kind can't cut off the others.
+SOUND_CHANNEL_GROUPS = {"player": 4, "weapons": 6, "effects": 4, "ui": 2}
+# Extra channels for sounds played without the sound manager.
+SOUND_SPARE_CHANNELS = 2
+# Which kind each sound is. Anything not listed is "effects".
+SOUND_CATEGORIES = {
+    "Jump.wav": "player",
+    "Death.wav": "player",
+    "tank_door.wav": "player",
+    "pellet_fire.wav": "weapons",
+    "tank_fire.wav": "weapons",
+    "game_over_yah.wav": "ui",
+}
+# Most copies of one sound that can play at once. Past this, the oldest one gets cut off.
+SOUND_VOICE_LIMIT = 3
+
+# Music Information
+# Music streams from files in this folder instead of being loaded into memory (see music_player.py).
+MUSIC_FOLDER = "Assets/Music"
+# The map property that picks a map's track, and the track for maps that don't have one.
+# A map whose track is "none" is silent.
+MUSIC_MAP_PROPERTY = "music"
+MUSIC_DEFAULT_TRACK = "blastermaster.wav"
+MUSIC_VOLUME = 0.25
+# How long the music takes to fade from one map's track to the next.
+MUSIC_CROSSFADE_MS = 400
+# Bytes of the next maps' tracks to read ahead into memory. Bigger tracks stream straight from disk.
+MUSIC_PREBUFFER_BUDGET = 16*1024*1024
+
+# Logging Information
+# Log messages below this level are thrown away (see game_log.py).
+# "DEBUG" shows everything, "INFO" is for normal play.
+LOG_LEVEL = "INFO"
+# Any one line of code may log at most this many messages a second.
+LOG_RATE_LIMIT = 5
+# Most messages waiting to be written. Past this, new ones get dropped.
+LOG_QUEUE_SIZE = 1024
+# Also write the log to this file. None means just the terminal.
+LOG_FILE = None
+
+# Replay Information
+# Save every game's input to a replay file in REPLAY_FOLDER (see input_replay.py).
+RECORD_INPUT = False
+REPLAY_FOLDER = "Replays"
+REPLAY_EXTENSION = ".replay"
+# Change this whenever the replay format changes, so old files get ignored.
+REPLAY_VERSION = 1
+# Save a checksum of the game's state this often (in updates), so a replay
+# can tell exactly when it stopped matching the recording.
+REPLAY_CHECKPOINT_INTERVAL = 60
+
+# Tile property flags
+# The collision grid packs every tile's properties from the TSX
+# into a single byte. Each property gets its own bit.
+TILE_SOLID = 1
+TILE_PLATFORM = 2
+TILE_SPIKE_SMALL = 4
+TILE_SPIKE_LARGE = 8
+TILE_SAND = 16
+TILE_PUSH_ROCK = 32
+TILE_PROPERTY_FLAGS = {
+    "solid":TILE_SOLID,
+    "platform":TILE_PLATFORM,
+    "spike_small":TILE_SPIKE_SMALL,
+    "spike_large":TILE_SPIKE_LARGE,
+    "sand":TILE_SAND,
+    "push_rock":TILE_PUSH_ROCK,
+}
 
 # Sprite IDs
 PLAYER = 0
@@ -65,4 +208,25 @@ TANK_ACTIVE = 1
 NONE_ACTIVE = 2
 
 # Graphics information
-TRANSPARENT_COLOR = 0
\ No newline at end of file
+TRANSPARENT_COLOR = 0
+# How many bytes of sprite sheets the asset registry may keep loaded before
+# it starts throwing away sheets that nothing is using.
+ASSET_MEMORY_CAP = 64*1024*1024
+
+# Texture atlas information (see atlas_packer.py and texture_atlas.py).
+# Every sprite sheet in these folders gets packed into a few big atlas pages
+# ahead of time, so the game decodes a few pages instead of dozens of PNGs.
+ATLAS_SOURCE_FOLDERS = ["Assets/Graphics/Player", "Assets/Graphics/Projectiles", "Assets/Graphics/Effects",
+                        "Assets/Graphics/Enemies", "Assets/Graphics/HUD", "Assets/Graphics/Items"]
+# Where the packer writes the pages and the manifest that says where every frame went.
+ATLAS_FOLDER = "Assets/Graphics/Atlas"
+ATLAS_MANIFEST = "Assets/Graphics/Atlas/atlas.json"
+ATLAS_VERSION = 1
+# Pages are squares this many pixels on a side.
+ATLAS_PAGE_SIZE = 2048
+# Empty pixels between frames, so scaling a frame never picks up its neighbour.
+ATLAS_PADDING = 1
+# Frame sizes for sheets whose frames aren't squares as tall as the sheet.
+ATLAS_FRAME_SIZES = {
+    "Assets/Graphics/Player/Tank.png": (TILESIZE*5, TILESIZE*2.5),
+}
\ No newline at end of file
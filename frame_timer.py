@@ -0,0 +1,168 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For timing and saving times.
+import time
+import csv
+
+#NumPy keeps the saved times and works out averages.
+import numpy
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==             FRAME TIMER                ==
+# ============================================
+# Splits every frame's time between its parts (the PHASE_ constants).
+# Call start_frame() at the top of the frame, mark(phase) right after each
+# part finishes, and end_frame() at the bottom. mark() gives everything
+# since the last mark to that phase, so a phase that happens more than once
+# a frame (like updates when the game is catching up) adds up.
+#
+# Times are kept for the last FRAME_TIMER_SAMPLES frames, in a ring buffer:
+# one row per frame, written over in a circle, so nothing gets allocated
+# while the game runs. When the overlay is off, timing costs one
+# perf_counter() call per mark.
+
+class Frame_Timer(object):
+
+    def __init__(self, sample_count = FRAME_TIMER_SAMPLES, enabled = FRAME_TIMING):
+
+        self.enabled = enabled
+        self.sample_count = sample_count
+
+        # Milliseconds, one row per frame and one column per phase.
+        self.samples = numpy.zeros((sample_count, len(FRAME_PHASE_NAMES)), dtype=numpy.float64)
+        # The row the next frame goes in, and how many frames have been timed in all.
+        self.next_sample = 0
+        self.frames_timed = 0
+
+        # The frame being timed now, in seconds.
+        self.current = [0.0]*len(FRAME_PHASE_NAMES)
+        self.last_time = time.perf_counter()
+
+        # The graph. It only gets redrawn every FRAME_TIMER_OVERLAY_REFRESH frames.
+        self.show_overlay = False
+        self.overlay_image = None
+        self.overlay_age = 0
+        self.font = None
+
+    def start_frame(self):
+
+        if not self.enabled: return
+        current = self.current
+        for phase in range(len(current)):
+            current[phase] = 0.0
+        self.last_time = time.perf_counter()
+
+    # Everything since the last mark was this phase.
+    def mark(self, phase):
+
+        if not self.enabled: return
+        now = time.perf_counter()
+        self.current[phase] += now - self.last_time
+        self.last_time = now
+
+    def end_frame(self):
+
+        if not self.enabled: return
+        row = self.samples[self.next_sample]
+        row[:] = self.current
+        row *= 1000
+        self.next_sample = (self.next_sample + 1) % self.sample_count
+        self.frames_timed += 1
+
+    # The saved times, oldest frame first.
+    def get_samples(self):
+
+        if self.frames_timed < self.sample_count:
+            return self.samples[:self.frames_timed]
+        return numpy.roll(self.samples, -self.next_sample, axis=0)
+
+    # Average and worst milliseconds for each phase, and for whole frames,
+    # over the saved frames. Returns (averages, worsts, average total, worst total).
+    def get_stats(self):
+
+        samples = self.get_samples()
+        if len(samples) == 0:
+            zeros = [0.0]*len(FRAME_PHASE_NAMES)
+            return zeros, zeros, 0.0, 0.0
+        totals = samples.sum(axis=1)
+        return samples.mean(axis=0).tolist(), samples.max(axis=0).tolist(), float(totals.mean()), float(totals.max())
+
+    def toggle_overlay(self):
+
+        self.show_overlay = not self.show_overlay
+        self.overlay_image = None
+
+    # Save the times to a CSV file, oldest frame first. Returns the filename.
+    def save_csv(self, filename = None):
+
+        if filename is None:
+            filename = time.strftime("frame_times_%Y%m%d_%H%M%S.csv")
+        first_frame = self.frames_timed - len(self.get_samples())
+        with open(filename, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["frame"] + FRAME_PHASE_NAMES + ["total"])
+            for row_number, row in enumerate(self.get_samples().tolist()):
+                writer.writerow([first_frame + row_number] + [round(value, 4) for value in row] + [round(sum(row), 4)])
+        return filename
+
+    # The graph, or None if it's turned off. Each phase gets a bar for its average
+    # and a tick for its worst frame, measured against one 60fps frame. Under that
+    # is every saved frame's total time, with a line at 60fps.
+    def draw_overlay(self):
+
+        if not self.show_overlay: return None
+        self.overlay_age -= 1
+        if self.overlay_image is not None and self.overlay_age > 0:
+            return self.overlay_image
+        self.overlay_age = FRAME_TIMER_OVERLAY_REFRESH
+
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 16)
+        averages, worsts, average_total, worst_total = self.get_stats()
+        frame_budget = 1000/60
+        line_height = 12
+        bar_left = 100
+        bar_width = 120
+        graph_height = 40
+        width = bar_left + bar_width + 50
+        height = line_height*(len(FRAME_PHASE_NAMES) + 1) + graph_height + 8
+
+        overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        overlay.fill((0,0,0,170))
+
+        rows = list(zip(FRAME_PHASE_NAMES, averages, worsts)) + [("total", average_total, worst_total)]
+        for row_number, (name, average, worst) in enumerate(rows):
+            y = 2 + row_number*line_height
+            overlay.blit(self.font.render(name, True, (255,255,255)), (4, y))
+            average_width = min(int(bar_width*average/frame_budget), bar_width)
+            worst_x = bar_left + min(int(bar_width*worst/frame_budget), bar_width-1)
+            pygame.draw.rect(overlay, (80,200,80), (bar_left, y+2, max(average_width,1), line_height-4))
+            pygame.draw.line(overlay, (230,60,60), (worst_x, y+1), (worst_x, y+line_height-2))
+            overlay.blit(self.font.render(str(round(average, 2)), True, (255,255,255)), (bar_left + bar_width + 4, y))
+
+        # Frame totals, oldest on the left.
+        graph_top = height - graph_height - 4
+        totals = self.get_samples().sum(axis=1)
+        if len(totals) > 0:
+            step = max(len(totals)//(width-8), 1)
+            for x, total in enumerate(totals[::step][-(width-8):].tolist()):
+                bar_height = min(int(graph_height*total/(frame_budget*2)), graph_height)
+                pygame.draw.line(overlay, (120,170,255), (4+x, graph_top+graph_height), (4+x, graph_top+graph_height-bar_height))
+        budget_y = graph_top + graph_height//2
+        pygame.draw.line(overlay, (230,230,60), (4, budget_y), (width-4, budget_y))
+
+        self.overlay_image = overlay
+        return overlay
@@ -0,0 +1,108 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Python's own logging does the levels and formatting. We add the rate
+#limit and send everything through a queue to a writer thread.
+import logging
+import logging.handlers
+import queue
+import atexit
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==               GAME LOG                 ==
+# ============================================
+# print() writes straight to the terminal, and the game waits while it
+# does. That's slow, especially in a Windows console, and some prints
+# happened every frame. Instead, log with a level:
+#
+#   from game_log import log
+#   log.debug("new effect spawned: %s", self.name)
+#
+# Messages below LOG_LEVEL are thrown away before they're even formatted
+# (so pass values as arguments, like above, not already joined into a
+# string). Each line of code that logs gets at most LOG_RATE_LIMIT messages
+# a second; the rest are counted and dropped. Whatever's left goes in a
+# queue, and a background thread does the actual writing. If the queue is
+# full, messages are dropped rather than making the game wait.
+
+# Drops messages from any one line of code past LOG_RATE_LIMIT a second.
+# The next message that gets through says how many were dropped.
+class Rate_Limit_Filter(logging.Filter):
+
+    def __init__(self, rate_limit = LOG_RATE_LIMIT):
+
+        logging.Filter.__init__(self)
+        self.rate_limit = rate_limit
+        # (file, line): [second the count started, messages this second, messages dropped]
+        self.callsites = {}
+
+    def filter(self, record):
+
+        callsite = (record.pathname, record.lineno)
+        counts = self.callsites.get(callsite)
+        if counts is None:
+            counts = [record.created, 0, 0]
+            self.callsites[callsite] = counts
+        if record.created - counts[0] >= 1.0:
+            counts[0] = record.created
+            counts[1] = 0
+        if counts[1] >= self.rate_limit:
+            counts[2] += 1
+            return False
+        counts[1] += 1
+        if counts[2] > 0:
+            record.msg = record.getMessage() + " (" + str(counts[2]) + " more like this dropped)"
+            record.args = None
+            counts[2] = 0
+        return True
+
+# Puts messages in the queue for the writer thread. Drops them if it's full.
+class Log_Queue_Handler(logging.handlers.QueueHandler):
+
+    def __init__(self, log_queue):
+
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Set up the game's log and start the writer thread. Returns the log.
+def start_logging():
+
+    game_log = logging.getLogger("game")
+    game_log.setLevel(LOG_LEVEL)
+    game_log.propagate = False
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = Log_Queue_Handler(log_queue)
+    queue_handler.addFilter(Rate_Limit_Filter())
+    game_log.addHandler(queue_handler)
+
+    # These run on the writer thread.
+    formatter = logging.Formatter("%(relativeCreated)9.0f %(levelname)-7s %(module)s: %(message)s")
+    writers = [logging.StreamHandler()]
+    if LOG_FILE is not None:
+        writers.append(logging.FileHandler(LOG_FILE, "w"))
+    for writer in writers:
+        writer.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(log_queue, *writers)
+    listener.start()
+    # Write out anything still in the queue when the game closes.
+    atexit.register(listener.stop)
+
+    return game_log
+
+log = start_logging()
@@ -10,6 +10,7 @@ from pygame.locals import *
 
 import math
 import random
+import collections
 
 import pytmx
 from pytmx.util_pygame import load_pygame
@@ -18,10 +19,26 @@ import methods
 from methods import blit_all_tiles
 from methods import get_tile_properties
 from methods import play_sound
+from methods import load_sound
+from methods import local_path
+
+from collision import get_collision_grid
+from collision import Hitbox
+from collision import sweep_hitbox
+
+from object_index import get_object_index
+
+from spatial_hash import Spatial_Hash
+
+from projectile_engine import Projectile_Engine
+
+from texture_atlas import texture_atlas
 
 import constants
 from constants import *
 
+from game_log import log
+
 # ============================================
 # ==             SPRITE SHEET               ==
 # ============================================
@@ -29,17 +46,29 @@ from constants import *
 # all that well. Found a function that does.
 # documentation at https://www.pygame.org/wiki/Spritesheet
 
-# NOTE: Probably should make a master sprite sheet rather than
-# each object having their own.
+# Sheets that are in the texture atlas (see atlas_packer.py) come from
+# Atlas_Sprite_Sheet instead, below. Objects can't tell the difference.
 
 class Sprite_Sheet(object):
     
     def __init__(self, filename):
+        
+        # Every frame we cut out of the sheet gets saved here so that it
+        # only ever has to be sliced (and flipped) once. Keyed by the
+        # frame's rectangle plus whether it is flipped: (x, y, w, h, flipped)
+        self.frame_cache = {}
+        self.filename = filename
+        # Bytes of the sheet plus every cached frame. Counted as they're added.
+        self.bytes_used = 0
+        # The asset registry this sheet belongs to, which keeps a total of every sheet's bytes.
+        self.registry = None
+        
         try:
-            self.sheet = pygame.image.load(filename)
+            self.sheet = pygame.image.load(local_path(filename))
         except pygame.error:
-            print ("Unable to load spritesheet image:", filename)
+            log.error("Unable to load spritesheet image: %s", filename)
             return
+        self.bytes_used = self.sheet.get_width() * self.sheet.get_height() * self.sheet.get_bytesize()
         
     # Load a specific image from a specific rectangle
     def image_at(self, rectangle, colorkey = None):
@@ -65,6 +94,247 @@ class Sprite_Sheet(object):
         tups = [(rect[0]+rect[2]*x, rect[1], rect[2], rect[3])
                 for x in range(image_count)]
         return self.images_at(tups, colorkey)
+    
+    # Get a single frame from the frame cache. If it isn't in there yet, slice it
+    # out of the sheet (and flip it horizontally if asked) and save it for next time.
+    # Animations should use this instead of image_at so they don't make a brand new
+    # Surface every frame.
+    def frame_at(self, rectangle, flipped = False):
+        "Returns the cached frame at x,y,x+offset,y+offset"
+        rect = pygame.Rect(rectangle)
+        key = (rect.x, rect.y, rect.width, rect.height, flipped)
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            if flipped:
+                frame = pygame.transform.flip(self.frame_at(rect, False), True, False)
+            else:
+                frame = self.image_at(rect)
+            self.frame_cache[key] = frame
+            frame_bytes = frame.get_width() * frame.get_height() * frame.get_bytesize()
+            self.bytes_used += frame_bytes
+            if self.registry is not None:
+                self.registry.bytes_used += frame_bytes
+        return frame
+    
+    # Slice a whole strip of frames into the frame cache ahead of time, both
+    # facing left (as drawn) and flipped to face right.
+    def cache_strip(self, rect, image_count):
+        "Pre-slices a strip of images, facing both ways, into the frame cache"
+        # Don't bother slicing frames that would be past the edge of the sheet.
+        frame_rect = pygame.Rect(rect)
+        if frame_rect.width > 0:
+            sheet_frames = (self.get_width() - frame_rect.x) // frame_rect.width
+            image_count = min(image_count, sheet_frames)
+        for x in range(image_count):
+            frame = (frame_rect.x+frame_rect.width*x, frame_rect.y, frame_rect.width, frame_rect.height)
+            self.frame_at(frame, False)
+            self.frame_at(frame, True)
+    
+    # How wide the whole sheet is.
+    def get_width(self):
+        return self.sheet.get_width()
+    
+    # Roughly how many bytes this sheet and all of its cached frames take up.
+    def memory_used(self):
+        return self.bytes_used
+
+# ============================================
+# ==          ATLAS SPRITE SHEET            ==
+# ============================================
+# A sprite sheet whose frames were packed into the texture atlas. It
+# works exactly like a Sprite_Sheet, with the same rectangles, but never
+# loads a PNG of its own. The atlas keeps every frame trimmed down to the
+# part that isn't empty, so image_at builds the rectangle it's asked for
+# out of whichever packed frames overlap it.
+
+class Atlas_Sprite_Sheet(Sprite_Sheet):
+    
+    def __init__(self, filename, atlas):
+        
+        self.frame_cache = {}
+        self.filename = filename
+        # The atlas pages are shared, so only the cached frames count.
+        self.bytes_used = 0
+        self.registry = None
+        self.size = atlas.get_size(filename)
+        # (rect on the sheet, atlas page, rect on the page) for every frame.
+        self.cells = atlas.get_cells(filename)
+    
+    # Load a specific image from a specific rectangle
+    def image_at(self, rectangle, colorkey = None):
+        "Loads image from x,y,x+offset,y+offset"
+        rect = pygame.Rect(rectangle)
+        image = pygame.Surface((rect.size),pygame.SRCALPHA).convert_alpha()
+        image.set_alpha(255)
+        for sheet_rect, page, page_rect in self.cells:
+            overlap = sheet_rect.clip(rect)
+            if overlap.width == 0 or overlap.height == 0: continue
+            area = pygame.Rect(page_rect.x + overlap.x - sheet_rect.x, page_rect.y + overlap.y - sheet_rect.y,
+                               overlap.width, overlap.height)
+            image.blit(page, (overlap.x - rect.x, overlap.y - rect.y), area)
+        if colorkey is not None:
+            if colorkey == -1:
+                colorkey = image.get_at((0,0))
+            image.set_colorkey(colorkey, pygame.RLEACCEL)
+        return image
+    
+    def get_width(self):
+        return self.size[0]
+
+# ============================================
+# ==            ASSET REGISTRY              ==
+# ============================================
+# Loading a PNG from the disk is slow, way too slow to do every time
+# the player fires a bullet. Instead of every object loading its own
+# copy of its sprite sheet, everyone asks the registry. It loads each
+# sheet once and hands out the same one to everybody who asks.
+# It also counts how many objects are using each sheet. If too much
+# memory is being used, sheets that nobody is using get thrown away,
+# starting with the one that was used longest ago.
+
+class Asset_Registry(object):
+    
+    def __init__(self, memory_cap = ASSET_MEMORY_CAP):
+        
+        # How many bytes of sheets we're allowed to keep around.
+        self.memory_cap = memory_cap
+        # Loaded sheets by filename. Kept in order of use, so the
+        # first one is the one that was used longest ago.
+        self.sheets = collections.OrderedDict()
+        # How many objects are currently using each sheet.
+        self.users = {}
+        # Bytes of all the sheets put together. Sheets add to it themselves
+        # as they cache frames, so checking it never has to look at every sheet.
+        self.bytes_used = 0
+        
+        # Stats so we can see how well the registry is doing.
+        self.loads = 0 # Times we actually had to go to the disk
+        self.hits = 0 # Times we already had the sheet
+        self.evictions = 0 # Times we threw a sheet away
+        
+    # Get a shared sprite sheet, loading it only if we don't have it yet.
+    # Every get_sheet should be matched with a release_sheet when the
+    # object using it goes away.
+    def get_sheet(self, filename):
+        
+        sheet = self.sheets.get(filename)
+        if sheet is None:
+            if texture_atlas.has_asset(filename):
+                sheet = Atlas_Sprite_Sheet(filename, texture_atlas)
+            else:
+                sheet = Sprite_Sheet(filename)
+            sheet.registry = self
+            self.bytes_used += sheet.memory_used()
+            self.sheets[filename] = sheet
+            self.loads += 1
+        else:
+            self.sheets.move_to_end(filename)
+            self.hits += 1
+        self.users[filename] = self.users.get(filename,0) + 1
+        
+        self.evict_idle_sheets()
+        return sheet
+    
+    # An object is done with a sheet.
+    def release_sheet(self, filename):
+        
+        if(self.users.get(filename,0) > 0):
+            self.users[filename] -= 1
+        self.evict_idle_sheets()
+        
+    def memory_used(self):
+        
+        return self.bytes_used
+    
+    # If we're over the memory cap, throw away sheets nobody is using,
+    # oldest first, until we're back under it. The running total is
+    # cheap to check; only when it's over do we look through the sheets.
+    def evict_idle_sheets(self):
+        
+        if(self.bytes_used <= self.memory_cap): return
+        
+        for filename in list(self.sheets.keys()):
+            if(self.users.get(filename,0) <= 0):
+                sheet = self.sheets.pop(filename)
+                sheet.registry = None
+                self.bytes_used -= sheet.memory_used()
+                self.users.pop(filename, None)
+                self.evictions += 1
+                if(self.bytes_used <= self.memory_cap): return
+
+# The one registry everybody shares.
+asset_registry = Asset_Registry()
+
+# ============================================
+# ==              SPRITE POOL               ==
+# ============================================
+# Short-lived sprites like effects get made and thrown away constantly:
+# every shot makes a pellet burst, every tank jump makes a jump effect.
+# All that garbage makes Python stop to clean up now and then, which
+# shows up as hitches in long fights.
+# A pool keeps dead sprites of one class and name on a free list. Asking
+# the pool for one resets an old one (with the class's reset() method,
+# which takes the same arguments as its constructor, minus the name)
+# instead of making a new one. When a pooled sprite is killed, it goes
+# back on the free list by itself.
+
+class Sprite_Pool(object):
+    
+    def __init__(self, sprite_class, name, preallocate = 0, *preallocate_args):
+        
+        self.sprite_class = sprite_class
+        self.name = name
+        # Sprites that are ready to be reused.
+        self.free_list = []
+        
+        # Stats
+        self.created = 0 # Sprites this pool has ever made
+        self.reused = 0 # Times a sprite came off the free list
+        self.in_use = 0 # Sprites out in the game right now
+        self.high_water_mark = 0 # Most sprites ever out at once
+        
+        # Make some ahead of time, using preallocate_args as their reset() arguments.
+        for count in range(preallocate):
+            new_sprite = self.create(*preallocate_args)
+            new_sprite.in_pool = True
+            self.free_list.append(new_sprite)
+    
+    def create(self, *args):
+        
+        new_sprite = self.sprite_class(self.name, *args)
+        new_sprite.pool = self
+        self.created += 1
+        return new_sprite
+    
+    # Get a sprite, reset with these arguments.
+    def acquire(self, *args):
+        
+        if(len(self.free_list) > 0):
+            new_sprite = self.free_list.pop()
+            new_sprite.in_pool = False
+            new_sprite.reset(self.name, *args)
+            self.reused += 1
+        else:
+            new_sprite = self.create(*args)
+        
+        self.in_use += 1
+        if(self.in_use > self.high_water_mark): self.high_water_mark = self.in_use
+        return new_sprite
+    
+    # Put a sprite back on the free list. Pooled sprites' kill() does this.
+    def release(self, old_sprite):
+        
+        assert not old_sprite.in_pool, "sprite released to its pool twice"
+        old_sprite.in_pool = True
+        self.in_use -= 1
+        self.free_list.append(old_sprite)
+    
+    # Throw away the free list, and let go of the sprite sheets it was holding.
+    def drain(self):
+        
+        for old_sprite in self.free_list:
+            old_sprite.release_sprite_sheet()
+        self.free_list = []
 
 # ============================================
 # ==            SPRITE HANDLER              ==
@@ -88,12 +358,22 @@ class Sprite_Handler(object):
         self.item_list = pygame.sprite.Group()
         # Enemy projectiles collide with player, dealing damage.
         self.enemy_projectile_list = pygame.sprite.Group()
-        # Player projectiles collide with enemies, dealing damage.
-        self.player_projectile_list = pygame.sprite.Group()
+        # Player bullets. These aren't sprites; they all live in one set of
+        # arrays so there can be thousands of them. Spawn them by type name.
+        self.player_projectiles = Projectile_Engine(asset_registry)
         # Doodads can interact with all other sprites. Switches, moving platforms, etc.
         self.doodad_list = pygame.sprite.Group()
         # Effects don't interact withodad anything; they are used for graphical flair.
         self.effect_list = pygame.sprite.Group()
+        # Effects get made every shot and every jump, so they come from pools.
+        self.effect_pools = {
+            "pellet_burst": Sprite_Pool(Effect, "pellet_burst", EFFECT_POOL_PREALLOCATE, 0, 0, LEFT),
+            "tank_jump": Sprite_Pool(Effect, "tank_jump", EFFECT_POOL_PREALLOCATE, 0, 0, LEFT),
+        }
+        
+        # Sorts every group's sprites by where they are, so collision checks
+        # only look at sprites that are close together. Rebuilt every update.
+        self.spatial_hash = Spatial_Hash()
         
         # HUD Displays information
         self.hud = Hud()
@@ -101,6 +381,9 @@ class Sprite_Handler(object):
         # Communicate to main that control mode needs to change
         self.wants_to_change_control_mode = False
         
+        # How far between the last update and the next one to draw sprites, from 0 to 1.
+        self.interpolation = 1.0
+        
     def change_control_mode(self):
         temp_bool = self.wants_to_change_control_mode
         self.wants_to_change_control_mode = False
@@ -111,7 +394,7 @@ class Sprite_Handler(object):
         # Check Tank collisions
         if(control_state == TANK_ACTIVE and self.tank.behavior_state != DYING):
             
-            self.enemy_hit_list = pygame.sprite.spritecollide(self.tank, self.enemy_list, False)
+            self.enemy_hit_list = self.spatial_hash.query(self.tank, "enemies")
             
             player_was_hit = False
             
@@ -132,7 +415,7 @@ class Sprite_Handler(object):
         # Check Soldier collisions
         elif(control_state == SOLDIER_ACTIVE and self.soldier.behavior_state != DYING):
                 
-            self.enemy_hit_list = pygame.sprite.spritecollide(self.soldier, self.enemy_list, False)
+            self.enemy_hit_list = self.spatial_hash.query(self.soldier, "enemies")
             
             player_was_hit = False
             
@@ -149,6 +432,58 @@ class Sprite_Handler(object):
                         player_was_hit = True
                         
             if player_was_hit: self.soldier.take_damage()           
+    
+    # Projectiles hitting things. Player projectiles damage enemies,
+    # and enemy projectiles damage the active player.
+    def projectile_collision_check(self, control_state):
+        
+        # Only enemies that share a cell with a bullet can be touching one, and
+        # each of those only gets checked against the bullets in its own cells.
+        for enemy in self.spatial_hash.sprites_near_projectiles("player_projectiles", "enemies"):
+            if(enemy.state != DYING) and (enemy.state != DEAD):
+                hit_slots = self.spatial_hash.query_projectiles(enemy.rect, "player_projectiles")
+                if len(hit_slots) > 0:
+                    enemy.take_damage(self.player_projectiles.get_power(hit_slots[0]))
+                    # A projectile only gets to hit one enemy.
+                    self.player_projectiles.kill(hit_slots[0])
+        
+        player = self.get_player(control_state)
+        if(player.behavior_state != DYING):
+            for enemy_projectile in self.spatial_hash.query(player, "enemy_projectiles"):
+                if(enemy_projectile.state != DEAD):
+                    player.take_damage(enemy_projectile.power)
+                    enemy_projectile.state = DEAD
+    
+    # Items the active player touches get picked up. Each item does whatever
+    # it does to the player in pick_up(), then goes away.
+    def item_collision_check(self, control_state):
+        
+        player = self.get_player(control_state)
+        if(player.behavior_state == DYING) or (player.behavior_state == DEAD): return
+        for item in self.spatial_hash.query(player, "items"):
+            if(item.state != DEAD):
+                item.pick_up(player)
+                item.state = DEAD
+                item.kill()
+    
+    # Put every group's sprites in the spatial hash, where they are right now.
+    def update_broadphase(self):
+        
+        self.spatial_hash.rebuild({
+            "players": (self.tank, self.soldier),
+            "enemies": self.enemy_list,
+            "items": self.item_list,
+            "enemy_projectiles": self.enemy_projectile_list,
+            "doodads": self.doodad_list,
+        })
+        self.spatial_hash.add_projectiles("player_projectiles", self.player_projectiles)
+    
+    # Every touching (sprite from group a, sprite from group b) pair, using the
+    # groups' names in update_broadphase. narrowphase works like pygame's
+    # collide functions (like pygame.sprite.collide_mask); by default it's a rect check.
+    def get_collision_pairs(self, group_name_a, group_name_b, narrowphase = None):
+        
+        return self.spatial_hash.query_pairs(group_name_a, group_name_b, narrowphase)
                     
     def get_player(self, control_state):
         
@@ -157,13 +492,23 @@ class Sprite_Handler(object):
         elif(control_state == SOLDIER_ACTIVE):
             return self.soldier
     
+    # Call before every update, so sprites can be drawn between updates.
+    def save_previous_positions(self):
+        
+        self.tank.save_previous_position()
+        self.soldier.save_previous_position()
+    
+    # How far we are from the last update to the next one, from 0 to 1.
+    # draw() and get_draw_rects() put moving sprites that far along.
+    def set_interpolation(self, interpolation):
+        
+        self.interpolation = interpolation
+    
     def update(self, tmxdata, keys, control_state):
         
         # Remove sprites
         for enemy in self.enemy_list:
             if(enemy.behavior_state == DEAD): enemy.kill()
-        for player_projectile in self.player_projectile_list:
-            if(player_projectile.behavior_state == DEAD): player_projectile.kill()
         for effect in self.effect_list:
             if(effect.behavior_state == DEAD): effect.kill()
                       
@@ -187,7 +532,7 @@ class Sprite_Handler(object):
         self.soldier.update(tmxdata, keys)
         self.tank.update(tmxdata, keys)
         self.enemy_list.update(tmxdata, keys)
-        self.player_projectile_list.update()
+        self.player_projectiles.update()
         self.effect_list.update()
         
         # See if a player object wants to spawn other objects
@@ -206,19 +551,18 @@ class Sprite_Handler(object):
             if(type_of_sprite_to_spawn == "player_projectile"):    
                 if(name_of_sprite_to_spawn == "small_bullet"):
                     # Spawn a bullet
-                    new_player_projectile = Player_projectile(name_of_sprite_to_spawn,coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],vector_of_sprite_to_spawn)
-                    self.player_projectile_list.add(new_player_projectile)
+                    self.player_projectiles.spawn(name_of_sprite_to_spawn,coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],vector_of_sprite_to_spawn)
                     # Spawn the pellet blast effect
                     new_direction = RIGHT
                     if(vector_of_sprite_to_spawn[0]<0): new_direction = LEFT
-                    new_effect = Effect("pellet_burst",coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],new_direction)
+                    new_effect = self.effect_pools["pellet_burst"].acquire(coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],new_direction)
                     self.effect_list.add(new_effect)
 
             if(type_of_sprite_to_spawn == "effect"):
                 if(name_of_sprite_to_spawn == "tank_jump"):
-                    new_effect = Effect(name_of_sprite_to_spawn,coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],vector_of_sprite_to_spawn)
+                    new_effect = self.effect_pools[name_of_sprite_to_spawn].acquire(coords_of_sprite_to_spawn[0],coords_of_sprite_to_spawn[1],vector_of_sprite_to_spawn)
                     self.effect_list.add(new_effect)
-                    print(coords_of_sprite_to_spawn)
+                    log.debug("tank jump effect at %s", coords_of_sprite_to_spawn)
 
         #Update
         if(control_state == TANK_ACTIVE):
@@ -226,15 +570,30 @@ class Sprite_Handler(object):
         elif(control_state == SOLDIER_ACTIVE):
             self.hud.update(self.soldier.get_hp())
         
-        # Check to see if map needs to change.
-        self.check_for_map_exit(tmxdata, control_state)
+        # Everything has moved, so sort it for this frame's collision checks.
+        self.update_broadphase()
     
-    def draw(self, map_image):
-        
-        self.tank.draw(map_image)
-        self.soldier.draw(map_image)
-        self.player_projectile_list.draw(map_image)
-        self.effect_list.draw(map_image)
+    # Draw every sprite onto map_image. If map_image is only part of the map,
+    # offset is added to every position to line sprites up with it.
+    def draw(self, map_image, offset=(0,0)):
+        
+        self.tank.draw(map_image, offset, self.interpolation)
+        self.soldier.draw(map_image, offset, self.interpolation)
+        self.player_projectiles.draw(map_image, offset, self.interpolation)
+        for sprite in self.effect_list:
+            map_image.blit(sprite.image,(sprite.rect.x+offset[0],sprite.rect.y+offset[1]))
+    
+    # The rectangles on the map that draw() is going to draw over.
+    # The dirty rect renderer uses these to know what needs redrawing.
+    def get_draw_rects(self):
+        
+        draw_rects = []
+        for player in (self.tank, self.soldier):
+            draw_rects.append(player.get_draw_rect(self.interpolation))
+        draw_rects.extend(self.player_projectiles.get_draw_rects(self.interpolation))
+        for sprite in self.effect_list:
+            draw_rects.append(sprite.image.get_rect(topleft=sprite.rect.topleft))
+        return draw_rects
     
     def draw_hud(self):
     
@@ -246,17 +605,14 @@ class Sprite_Handler(object):
         elif(control_state == SOLDIER_ACTIVE):
             return self.soldier.getpos()
     
-    # Function searches the Object layers of the TMXDATA you pass
-    # and, if it finds any objects named "enemy," spawns an enemy
+    # Function looks up the objects in the TMXDATA you pass
+    # and, if it finds any objects named "enemy_spawn," spawns an enemy
     # in that location.
     def spawn_sprites_from_map(self, tmxdata):
         
-       for layer in tmxdata.visible_layers:
-            if(isinstance(layer,pytmx.TiledTileLayer)):
-                for tile_object in tmxdata.objects:
-                    if (tile_object.name == "enemy_spawn"):
-                        enemy = Enemy(tile_object.x,tile_object.y,(0,0))
-                        self.enemy_list.add(enemy)
+        for tile_object in get_object_index(tmxdata).get_objects("enemy_spawn"):
+            enemy = Enemy(tile_object.x,tile_object.y,(0,0))
+            self.enemy_list.add(enemy)
 
     # Clear all sprites other than players.
     def prepare_for_new_map(self):
@@ -264,49 +620,47 @@ class Sprite_Handler(object):
         # Remove all non-player sprites
         self.enemy_list.empty()
         self.doodad_list.empty()
+        self.player_projectiles.clear()
+        self.update_broadphase()
         
     def reset_player(self, tmxdata):
         self.tank.hit_points = 4
-        self.tank.state = self.player.STANDING
-        self.player.hit_points = 4
-        self.player.state = self.player.STANDING
+        self.tank.behavior_state = self.tank.STANDING
+        self.soldier.hit_points = 4
+        self.soldier.behavior_state = self.soldier.STANDING
         self.player_enters_map(tmxdata, RIGHT)
         
     # Find the entrance object and put player there.
     # If there isnt a player yet, make one at the spawn point.
     def player_enters_map(self, tmxdata, entrance_direction):
 
-        for layer in tmxdata.visible_layers:
-            if(isinstance(layer,pytmx.TiledTileLayer)):
-                for tile_object in tmxdata.objects:
-                    if (tile_object.name == "entrance"):
-                        if(tile_object.properties['dir'] == "RIGHT" and entrance_direction == RIGHT):
-                            self.tank.setpos(tile_object.x,tile_object.y)
-                            self.soldier.setpos(tile_object.x,tile_object.y)
-                        elif(tile_object.properties['dir'] == "LEFT" and entrance_direction == LEFT):
-                            self.tank.setpos(tile_object.x,tile_object.y)
-                            self.soldier.setpos(tile_object.x,tile_object.y)
-                        elif(tile_object.properties['dir'] == "UP" and entrance_direction == UP):
-                            self.tank.setpos(tile_object.x,tile_object.y)
-                            self.soldier.setpos(tile_object.x,tile_object.y) 
-                        elif(tile_object.properties['dir'] == "DOWN" and entrance_direction == DOWN):
-                            self.tank.setpos(tile_object.x,tile_object.y)
-                            self.soldier.setpos(tile_object.x,tile_object.y)
-                        else: print("No appropriate landing direction found!")
+        # Entrances are saved by their "dir" property, which is a string.
+        direction_name = "none"
+        if(entrance_direction == RIGHT): direction_name = "RIGHT"
+        elif(entrance_direction == LEFT): direction_name = "LEFT"
+        elif(entrance_direction == UP): direction_name = "UP"
+        elif(entrance_direction == DOWN): direction_name = "DOWN"
+        
+        tile_object = get_object_index(tmxdata).get_entrance(direction_name)
+        if tile_object is None:
+            log.warning("No appropriate landing direction found!")
+            return
+        self.tank.setpos(tile_object.x,tile_object.y)
+        self.soldier.setpos(tile_object.x,tile_object.y)
+        # They jumped here, so don't draw them sliding in from where they were.
+        self.save_previous_positions()
                             
     def check_for_map_exit(self, tmxdata, control_state):
         
-        # Look for the screen exit object
-        for tile_object in tmxdata.objects:
-            if(tile_object.name == 'exit'):
-                player_rect = Rect(self.tank.rect)
-                if(control_state == SOLDIER_ACTIVE): player_rect = Rect(self.soldier.rect)
-                exit_object_rect = Rect(tile_object.x,tile_object.y,tile_object.width,tile_object.height)
-        
-                # If the player is intersecting the exit object, need to load a new screen.
-                if(pygame.Rect.colliderect(player_rect,exit_object_rect)):
-                    print(tile_object.properties)
-                    return tile_object.properties
+        player_rect = self.tank.rect
+        if(control_state == SOLDIER_ACTIVE): player_rect = self.soldier.rect
+        
+        # Look for a screen exit object where the player is.
+        # If the player is intersecting one, need to load a new screen.
+        exit_properties = get_object_index(tmxdata).find_exit(player_rect)
+        if exit_properties is not None:
+            log.debug("on exit %s", exit_properties)
+            return exit_properties
                 
         default_dict = {'dest':'none', 'dir':'none'}
         return default_dict
@@ -359,7 +713,7 @@ class Player(pygame.sprite.Sprite):
             # GRAPHICS SETUP ------------        
             # Instead of loading an image directly we will use the
             # spritesheet object, defined below. 
-            self.my_sprite_sheet = Sprite_Sheet("Assets\Graphics\Player\Soldier.png")
+            self.my_sprite_sheet = asset_registry.get_sheet("Assets\Graphics\Player\Soldier.png")
             # The sprites on the sprite sheet are 64x64, but only the middle 32x32 is checked
             # for collision. Need to keep track of the offset for the top left corner for drawing.
             # Assume that TILESIZE is 32. If this changes, so long as the sprite stays twice the size
@@ -421,20 +775,26 @@ class Player(pygame.sprite.Sprite):
             # Variables to control how many frames each state uses and how quickly they animate.
             self.animation_current_frame = 0
             self.animation_counter = 0
+            # Slice every animation frame, facing both ways, once now instead of every update.
+            self.frame_size = (TILESIZE*2,TILESIZE*2)
+            self.my_sprite_sheet.cache_strip((0,0,self.frame_size[0],self.frame_size[1]), self.count_animation_frames())
             
             # LOCATION -----------
             # Tuple is: (x position, y position, collision size horiz, collision size vert)
             # Note that these are TRUE POSITIONS. The sprite animation may be outside of this.
             self.rect = pygame.Rect(init_x,init_y,TILESIZE,TILESIZE)
+            # The part of the soldier that bumps into the map. Leaves a little headroom
+            # at the top of the rect. Small spikes hurt the soldier.
+            self.hitbox = Hitbox(0,TILESIZE/4,TILESIZE,TILESIZE*(3/4),TILE_SPIKE_SMALL)
             # The direction this sprite is moving is stored in a vector.
             self.vector = list(init_vector)
             # The direction this sprite is FACING when not moving.
             self.facing = RIGHT
             
             # SOUND_EFFECTS -----------
-            self.sound_jump = pygame.mixer.Sound("Assets/Sounds/Jump.wav")
-            self.sound_death= pygame.mixer.Sound("Assets/Sounds/Death.wav")
-            self.sound_pellet_fire = pygame.mixer.Sound("Assets/Sounds/pellet_fire.wav")
+            self.sound_jump = load_sound("Assets/Sounds/Jump.wav")
+            self.sound_death= load_sound("Assets/Sounds/Death.wav")
+            self.sound_pellet_fire = load_sound("Assets/Sounds/pellet_fire.wav")
          # =======================
          # End of Soldier Setup
         
@@ -445,7 +805,7 @@ class Player(pygame.sprite.Sprite):
             # GRAPHICS SETUP ------------        
             # Instead of loading an image directly we will use the
             # spritesheet object, defined below. 
-            self.my_sprite_sheet = Sprite_Sheet("Assets\Graphics\Player\Tank.png")
+            self.my_sprite_sheet = asset_registry.get_sheet("Assets\Graphics\Player\Tank.png")
             # The sprites on the sprite sheet are 64x64, but only the middle 32x32 is checked
             # for collision. Need to keep track of the offset for the top left corner for drawing.
             # Assume that TILESIZE is 32. If this changes, so long as the sprite stays twice the size
@@ -510,23 +870,34 @@ class Player(pygame.sprite.Sprite):
             # Variables to control how many frames each state uses and how quickly they animate.
             self.animation_current_frame = 0
             self.animation_counter = 0
+            # Slice every animation frame, facing both ways, once now instead of every update.
+            self.frame_size = (TILESIZE*5,TILESIZE*2.5)
+            self.my_sprite_sheet.cache_strip((0,0,self.frame_size[0],self.frame_size[1]), self.count_animation_frames())
             
             # LOCATION -----------
             # Tuple is: (x position, y position, collision size horiz, collision size vert)
             # Note that these are TRUE POSITIONS. The sprite animation may be outside of this.
             self.rect = pygame.Rect(init_x,init_y,TILESIZE*(1.75),TILESIZE*(1.75))
+            # The part of the tank that bumps into the map. The treads are three tiles
+            # wide, much wider than the rect. Large spikes hurt the tank.
+            self.hitbox = Hitbox(0,TILESIZE/4,TILESIZE*3,TILESIZE*(1.5),TILE_SPIKE_LARGE)
             # The direction this sprite is moving is stored in a vector.
             self.vector = list(init_vector)
             # The direction this sprite is FACING when not moving.
             self.facing = RIGHT
             
             # SOUND_EFFECTS -----------
-            self.sound_jump = pygame.mixer.Sound("Assets/Sounds/Jump.wav")
-            self.sound_death= pygame.mixer.Sound("Assets/Sounds/Death.wav")
-            self.sound_pellet_fire = pygame.mixer.Sound("Assets/Sounds/pellet_fire.wav")
+            self.sound_jump = load_sound("Assets/Sounds/Jump.wav")
+            self.sound_death= load_sound("Assets/Sounds/Death.wav")
+            self.sound_pellet_fire = load_sound("Assets/Sounds/pellet_fire.wav")
          # =======================
          # End of Tank Setup
         
+        # Where this object was before the last update. It gets drawn somewhere
+        # between there and where it is now.
+        self.previous_x = self.rect.x
+        self.previous_y = self.rect.y
+        
         # SPAWNING GAME OBJECTS ---------------
         # This object does not have permission to make objects.
         # So, instead, it will announce to the sprite handler when it wants to make something.
@@ -554,15 +925,32 @@ class Player(pygame.sprite.Sprite):
     def get_hp(self):
         return self.hit_points
     
+    # Remember where this object is before it updates.
+    def save_previous_position(self):
+        self.previous_x = self.rect.x
+        self.previous_y = self.rect.y
+    
+    # Where to draw this object, interpolation of the way from where it was
+    # before the last update to where it is now.
+    def get_render_pos(self, interpolation = 1.0):
+        render_x = round(self.previous_x + (self.rect.x - self.previous_x)*interpolation)
+        render_y = round(self.previous_y + (self.rect.y - self.previous_y)*interpolation)
+        return [render_x+self.render_offset_vect[0], render_y+self.render_offset_vect[1]]
+    
     # Returns the image of this object
-    def draw(self, map_image):
+    def draw(self, map_image, offset=(0,0), interpolation = 1.0):
         if(self.i_blink==False):
-            map_image.blit(self.image,(self.rect.x+self.render_offset_vect[0],self.rect.y+self.render_offset_vect[1]))
+            render_pos = self.get_render_pos(interpolation)
+            map_image.blit(self.image,(render_pos[0]+offset[0],render_pos[1]+offset[1]))
+
+    # The rectangle of the map this object's image covers when drawn.
+    def get_draw_rect(self, interpolation = 1.0):
+        return self.image.get_rect(topleft=self.get_render_pos(interpolation))
 
     def change_control_mode(self):
         temp_bool = self.wants_to_change_control_mode
         self.wants_to_change_control_mode = False
-        print(temp_bool)
+        log.debug("%s wants to change control mode: %s", self.name, temp_bool)
         return temp_bool
 
     def spawn(self):
@@ -570,6 +958,13 @@ class Player(pygame.sprite.Sprite):
         self.wants_to_spawn_sprite = False # Clear the spawn boolean so it only makes one 
         return spawn_tuple
 
+    # How many frames long the sprite sheet strip needs to be to cover every animation.
+    def count_animation_frames(self):
+        frame_count = 0
+        for animation in self.animation_data:
+            frame_count = max(frame_count, animation[self.ANIM_START]+animation[self.ANIM_FRAMES])
+        return frame_count
+
     # Used to tell this object where it's partner is; tank versus soldier.
     def assign_partner(self, new_partner):
         partner = new_partner
@@ -654,7 +1049,7 @@ class Player(pygame.sprite.Sprite):
         # See if we need to change control state
         if(keys[TANK_DOOR] == True):
             self.wants_to_change_control_mode = True
-            print("wants to swap!")
+            log.debug("wants to swap!")
         
         # Accelerate left or right based on input
         if(keys[LEFT]) == True:
@@ -717,133 +1112,28 @@ class Player(pygame.sprite.Sprite):
         if(keys[FIRE] == True): self.holding_fire = True
         else: self.holding_fire = False
 
-    def apply_gravity(self, tmxdata):
-        # Apply gravity by seeing what is on the tile below the player.
-        # This is checking the TMX map for custom booleans named "solid"
-        # or "platform"
-
-        if(self.name == "soldier"):
-            # Check three points under the soldier to ensure good-feeling collision
-            tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+TILESIZE)
-            tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE/2), self.rect.y+self.vector[1]+TILESIZE)
-            tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+TILESIZE-1, self.rect.y+self.vector[1]+TILESIZE)
-            if (
-            tile_to_check1['solid'] == False and tile_to_check1['platform'] == False and
-            tile_to_check2['solid'] == False and tile_to_check2['platform'] == False and
-            tile_to_check3['solid'] == False and tile_to_check3['platform'] == False):
-                self.on_ground = False
-                self.vector[1]+= GRAVITY_STRENGTH
-                if(self.vector[1]>4): self.vector[1]=TERMINAL_VELOCITY #speed limit
-            else: self.on_ground = True
-            
-        elif(self.name == "tank"):
-            # Tank has to check more areas underneath it because it's a larger sprite. If you don't check enough
-            # areas, it will 
-            tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-            tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE), self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-            tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*2), self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-            tile_to_check4 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*3)-1, self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-            if (
-            tile_to_check1['solid'] == False and tile_to_check1['platform'] == False and
-            tile_to_check2['solid'] == False and tile_to_check2['platform'] == False and
-            tile_to_check3['solid'] == False and tile_to_check2['platform'] == False and
-            tile_to_check4['solid'] == False and tile_to_check3['platform'] == False):
-                self.on_ground = False
-                self.vector[1]+= GRAVITY_STRENGTH
-                if(self.vector[1]>4): self.vector[1]=TERMINAL_VELOCITY #speed limit
-            else: self.on_ground = True          
+    def apply_gravity(self):
+        # Apply gravity if there was nothing under the player at the end of
+        # their last move. The collision sweep in apply_map_data works that out.
+        if(self.on_ground == False):
+            self.vector[1]+= GRAVITY_STRENGTH
+            if(self.vector[1]>TERMINAL_VELOCITY): self.vector[1]=TERMINAL_VELOCITY #speed limit
 
     def apply_map_data(self, tmxdata):
         
-        # Checks for interaction with the map including solidity, spikes, etc.
+        # Moves the player by their vector while checking for interaction with the
+        # map including solidity, spikes, etc. The sweep stops the hitbox at walls,
+        # ceilings and floors and tells us if we ended up standing on something.
+        result = sweep_hitbox(get_collision_grid(tmxdata), self.hitbox, self.rect.x, self.rect.y, self.vector)
+        self.rect.x = result.x
+        self.rect.y = result.y
+        if(result.blocked_x): self.vector[0]=0
+        if(result.blocked_y): self.vector[1]=0
+        self.on_ground = result.on_ground
         
-        # Solider Checks --------------------------------
-        if(self.name == "soldier"):
-            if (self.vector[0] < 0): #moving left
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+(TILESIZE/4))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+(TILESIZE/2))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+TILESIZE-1)
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True):
-                    self.vector[0]=0
-                    
-            if (self.vector[0] > 0): #moving right
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+TILESIZE, self.rect.y+(TILESIZE/4))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+TILESIZE, self.rect.y+(TILESIZE/2))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+TILESIZE, self.rect.y+TILESIZE-1)
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True):
-                    self.vector[0]=0
-                    
-            if (self.vector[1] < 0): #moving up.
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+(TILESIZE/4))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE/2), self.rect.y+self.vector[1]+(TILESIZE/4))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+TILESIZE-1, self.rect.y+self.vector[1]+(TILESIZE/4))
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True):
-                    self.vector[1]=0
-                    
-            # Moving down is a little more complicated. We want to not fall through the floor, but also "snap to" the floor
-            # when we land on it. We accomplish this by calculating how much the character needs to move to snap to the next
-            # grid location. Note that this assumes solidity is only applicable in full TILESIZE tiles.
-            if (self.vector[1] > 0): #moving down
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+TILESIZE)
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE/2), self.rect.y+self.vector[1]+TILESIZE)
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+TILESIZE-1, self.rect.y+self.vector[1]+TILESIZE)
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True or
-                    tile_to_check1['platform'] == True) or (tile_to_check2['platform'] == True) or (tile_to_check3['platform'] == True):
-                     snap_to_grid = TILESIZE - (self.rect.y%TILESIZE)
-                     self.rect.y += snap_to_grid 
-                     self.vector[1]=0
-                     self.on_ground = True
-                if (tile_to_check1['spike_small'] == True) or (tile_to_check2['spike_small'] == True) or (tile_to_check3['spike_small'] == True):
-                     self.take_damage(1)
-        # End of Solider Checks
-        
-        # Tank Checks
-        # ---------------------------------
-        if(self.name == "tank"):
-            if (self.vector[0] < 0): #moving left
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+(TILESIZE/2))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+(TILESIZE))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+self.vector[0], self.rect.y+(TILESIZE*1.75)-1)
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True):
-                    self.vector[0]=0
-                    
-            if (self.vector[0] > 0): #moving right
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+(TILESIZE*3), self.rect.y+(TILESIZE/2))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+(TILESIZE*3), self.rect.y+(TILESIZE))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+self.vector[0]+(TILESIZE*3), self.rect.y+(TILESIZE*1.75)-1)
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True):
-                    self.vector[0]=0
-                    
-            # Again, tank is much wider than the solider. Needs to check more locations when moving vertically
-            if (self.vector[1] < 0): #moving up.
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+(TILESIZE/4))
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE), self.rect.y+self.vector[1]+(TILESIZE/4))
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*2), self.rect.y+self.vector[1]+(TILESIZE/4))
-                tile_to_check4 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*3)-1, self.rect.y+self.vector[1]+(TILESIZE/4))
-               
-                if (tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or (tile_to_check3['solid'] == True) or (tile_to_check4['solid'] == True):
-                    self.vector[1]=0
-                    
-            # Moving down is a little more complicated. We want to not fall through the floor, but also "snap to" the floor
-            # when we land on it. We accomplish this by calculating how much the character needs to move to snap to the next
-            # grid location. Note that this assumes solidity is only applicable in full TILESIZE tiles.
-            if (self.vector[1] > 0): #moving down
-                tile_to_check1 = get_tile_properties(tmxdata, self.rect.x+1, self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-                tile_to_check2 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE), self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-                tile_to_check3 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*2), self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-                tile_to_check4 = get_tile_properties(tmxdata, self.rect.x+(TILESIZE*3)-1, self.rect.y+self.vector[1]+TILESIZE*(1.75)+1)
-                if ((tile_to_check1['solid'] == True) or (tile_to_check2['solid'] == True) or
-                   (tile_to_check3['solid'] == True) or (tile_to_check4['solid'] == True) or
-                   (tile_to_check1['platform'] == True) or (tile_to_check2['platform'] == True) or
-                   (tile_to_check3['platform'] == True) or (tile_to_check4['platform'] == True)):
-                         #snap_to_grid = TILESIZE - (self.rect.y%TILESIZE)
-                         #self.rect.y += snap_to_grid
-                         self.vector[1]=0
-                         self.rect.y += 1
-                         self.on_ground = True
-                if ((tile_to_check1['spike_large'] == True) or (tile_to_check2['spike_large'] == True) or
-                   (tile_to_check3['spike_large'] == True) or (tile_to_check4['spike_large'] == True)):
-                         self.take_damage(1)
+        # Landed on something that hurts?
+        if(result.ground_tile_flags & self.hitbox.hazard_flags):
+            self.take_damage(1)
         
     def update_animation_state(self):
         # Using the sprites current situation, determine what the necessary
@@ -891,15 +1181,11 @@ class Player(pygame.sprite.Sprite):
         if(self.animation_current_frame >= self.animation_data[self.animation_state][self.ANIM_FRAMES]):
            self.animation_current_frame = 0 
         
-        if(self.name == "soldier"):
-            frame_adjustment = self.animation_data[self.animation_state][self.ANIM_START] * TILESIZE * 2
-            frame_adjustment += self.animation_current_frame * TILESIZE * 2
-            self.image = self.my_sprite_sheet.image_at((frame_adjustment,0,TILESIZE*2,TILESIZE*2)).convert_alpha()
-            
-        elif(self.name == "tank"):
-            frame_adjustment = self.animation_data[self.animation_state][self.ANIM_START] * TILESIZE * 5
-            frame_adjustment += self.animation_current_frame * TILESIZE * 5
-            self.image = self.my_sprite_sheet.image_at((frame_adjustment,0,TILESIZE*5,TILESIZE*2.5)).convert_alpha()
+        # Frames sit side by side on the sheet, so the frame's x is just
+        # (which frame) * (frame width). Works for both the soldier and the tank.
+        frame_adjustment = self.animation_data[self.animation_state][self.ANIM_START] * self.frame_size[0]
+        frame_adjustment += self.animation_current_frame * self.frame_size[0]
+        frame_rect = (frame_adjustment,0,self.frame_size[0],self.frame_size[1])
             
         # IFRAMES
         # Blinking when you're damaged.
@@ -914,14 +1200,11 @@ class Player(pygame.sprite.Sprite):
             else: self.i_blink_counter -= 1
 
         # Image will be facing left by default, because that is how it is
-        # draw. Flip it depending on direction.
+        # draw. The frame cache already holds a flipped copy of every frame,
+        # so we just ask for the flipped one when facing right.
         # Note that we don't use .self here. Why? B'c this is a global constant
         # coming from our constants file, not a class constant!
-        if self.facing == RIGHT:
-            # The flip function has three parameters: source image,
-            # whether to flip horizonal, whether to flip vertical
-            # Here, we flip horizontaly if facing left.
-            self.image = pygame.transform.flip(self.image, True, False)
+        self.image = self.my_sprite_sheet.frame_at(frame_rect, self.facing == RIGHT)
     
     # -----------------------                    
     # Update Method
@@ -958,107 +1241,19 @@ class Player(pygame.sprite.Sprite):
         if(self.hit_points <= 0): self.die
 
         # Using the map data, modify movement according to situation.
-        self.apply_gravity(tmxdata)
+        # apply_map_data also moves us by our vector.
+        self.apply_gravity()
         self.apply_map_data(tmxdata)
-                   
-        # Update position based on vector
-        self.rect.x = self.rect.x + self.vector[0]
-        self.rect.y = self.rect.y + self.vector[1]
             
         # Update animation state and frame
         self.update_animation_state()
         self.update_animation_frame()    
            
 # ============================================
-# ==      PLAYER_PROJECTILE CLASS           ==
+# ==             EFFECT CLASS               ==
 # ============================================
-# This class handles projectiles fired by the
-# player. They collide with enemies or certain
-# objects on the map.
-
-class Player_projectile(pygame.sprite.Sprite):
-    
-    def __init__(self,new_name,init_x,init_y,init_vector):
-        
-        # Call the init function of the sprite class from which this inherets.
-        pygame.sprite.Sprite.__init__(self)
-        self.name = new_name
-         
-        # GRAPHICS SETUP ------------        
-        # Load the proper graphics for this kind of projectile
-        if(self.name == "small_bullet"):
-            self.my_sprite_sheet = Sprite_Sheet("Assets\Graphics\Projectiles\small_bullet.png")
-            
-        self.image = self.my_sprite_sheet.image_at((0,0,TILESIZE*2,TILESIZE*2))
-
-        # As we set initial condition, understand the spawn point is going to be up
-        # and to the right of where the initial x and y are because this is a larger sprite
-        # And, remember, the Rect arguments are (x,y,h,w), not x1,y1 and x2,y2!
-        self.rect = pygame.Rect(init_x-TILESIZE/2,init_y-TILESIZE/2,TILESIZE*2,TILESIZE*2)
-        
-        # Set up initial velocity
-        self.vector = list(init_vector)
-        
-        # ANIMATION SETUP-----------
-        # Starting Animation
-        self.animation_state = 0
-        # Variables to control how many frames each state uses and how quickly they animate.
-        self.animation_current_frame = 0
-        self.animation_counter = 0
-
-        # These control the animation state of the object.
-        # Animations are indexed to the same number as the STATE of the object.
-        # I can forsee some objects where the animation_state is not the same as the
-        # behavior_state; but for player objects, they'll be the same.
-        # Each tuple is: (start_frame, number of frames, animation speed)
-        self.ANIM_START=0
-        self.ANIM_FRAMES=1
-        self.ANIM_SPEED=2
-        
-        if(self.name == "small_bullet"):
-            self.animation_data = [
-                [0,2,8] # ACTIVE
-            ]
-            
-        # MECHANICS SETUP
-        self.ALIVE = 1
-        self.behavior_state = self.ALIVE
-        
-        if(self.name == "small_bullet"):
-            self.power = 1
-            self.lifespan = 30
-           
-    # Returns the image of this object
-    def draw(self, map_image):
-        map_image.blit(self.image,(self.rect.x,self.rect.y))
-        
-    def update_animation(self):
-
-        #All that the effect does is cycle through its animation and then die.
-        self.animation_counter += 1
-        if(self.animation_counter > self.animation_data[self.animation_state][self.ANIM_SPEED]):
-            self.animation_counter = 0
-            self.animation_current_frame += 1
-        if(self.animation_counter > self.animation_data[self.animation_state][self.ANIM_FRAMES]):
-            self.animation_current_frame = 0
-        self.image = self.my_sprite_sheet.image_at((self.animation_current_frame*TILESIZE*2,0,TILESIZE*2,TILESIZE*2)).convert_alpha()
-  
-    def update(self):
-        
-        # Update position based on vector
-        self.rect.x = self.rect.x + self.vector[0]
-        self.rect.y = self.rect.y + self.vector[1]
-        
-        # Update the animation
-        self.update_animation()
-        
-        # Decrement lifespan
-        self.lifespan -= 1
-        
-        # Eliminate once dead
-        if(self.lifespan <= 0):
-            self.behavior_state = DEAD
-            
+# Effects are animations that play once where
+# something happened, like bullets hitting.
 
 class Effect(pygame.sprite.Sprite):
     
@@ -1066,22 +1261,48 @@ class Effect(pygame.sprite.Sprite):
         
         # Call the init function of the sprite class from which this inherets.
         pygame.sprite.Sprite.__init__(self)
-        self.name = new_name
+        
+        # Everything else gets set up in reset(), so a Sprite_Pool can reuse
+        # this effect and have it come out the same as a new one.
+        self.name = None
+        self.my_sprite_sheet = None
+        self.pool = None
+        # Whether this sprite is sitting on its pool's free list.
+        self.in_pool = False
+        self.rect = pygame.Rect(0,0,0,0)
+        self.reset(new_name,init_x,init_y,new_facing)
+    
+    def reset(self,new_name,init_x,init_y,new_facing):
          
         # GRAPHICS SETUP ------------        
         # Load the proper graphics for this kind of projectile
-        if(self.name == "pellet_burst"):
-            self.my_sprite_sheet = Sprite_Sheet("Assets\Graphics\Effects\pellet_burst.png")
-            self.image = self.my_sprite_sheet.image_at((0,0,TILESIZE*2,TILESIZE*2))
-            self.rect = pygame.Rect(init_x-TILESIZE/2,init_y-TILESIZE/2,TILESIZE*2,TILESIZE*2)
-        if(self.name == "tank_jump"):
-            self.my_sprite_sheet = Sprite_Sheet("Assets\Graphics\Effects\jumpy.png")
-            self.image = self.my_sprite_sheet.image_at((0,0,TILESIZE*4,TILESIZE*4))
-            self.rect = pygame.Rect(init_x-TILESIZE/2,init_y-TILESIZE/2,TILESIZE*4,TILESIZE*4)
+        # Sheets are shared through the asset registry, so this doesn't touch the disk.
+        # A reused effect of the same kind already has them.
+        if(new_name != self.name):
+            self.release_sprite_sheet()
+            self.name = new_name
+            if(self.name == "pellet_burst"):
+                self.my_sprite_sheet = asset_registry.get_sheet("Assets\Graphics\Effects\pellet_burst.png")
+                self.rect.size = (TILESIZE*2,TILESIZE*2)
+                self.animation_data = [
+                    [0,6,3] # ACTIVE
+                ]
+                self.frame_size = (TILESIZE*2,TILESIZE*2)
+            if(self.name == "tank_jump"):
+                self.my_sprite_sheet = asset_registry.get_sheet("Assets\Graphics\Effects\jumpy.png")
+                self.rect.size = (TILESIZE*4,TILESIZE*4)
+                self.animation_data = [
+                    [0,6,3] # ACTIVE
+                ]
+                self.frame_size = (TILESIZE*4,TILESIZE*4)
+            # Slice the animation frames, facing both ways, once so updates can just grab them.
+            self.my_sprite_sheet.cache_strip((0,0,self.frame_size[0],self.frame_size[1]), self.animation_data[0][1])
+        self.image = self.my_sprite_sheet.frame_at((0,0,self.rect.width,self.rect.height))
 
         # As we set initial condition, understand the spawn point is going to be up
         # and to the right of where the initial x and y are because this is a larger sprite
-        # And, remember, the Rect arguments are (x,y,h,w), not x1,y1 and x2,y2!
+        self.rect.x = int(init_x-TILESIZE/2)
+        self.rect.y = int(init_y-TILESIZE/2)
         
         self.facing = new_facing
         
@@ -1097,32 +1318,40 @@ class Effect(pygame.sprite.Sprite):
         # I can forsee some objects where the animation_state is not the same as the
         # behavior_state; but for player objects, they'll be the same.
         # Each tuple is: (start_frame, number of frames, animation speed)
+        # (The animation data itself was set up with the graphics.)
         self.ANIM_START=0
         self.ANIM_FRAMES=1
         self.ANIM_SPEED=2
         
-        if(self.name == "pellet_burst"):
-            self.animation_data = [
-                [0,6,3] # ACTIVE
-            ]
-            self.lifespan = self.animation_data[self.animation_state][self.ANIM_FRAMES] * self.animation_data[self.animation_state][self.ANIM_SPEED]
-        if(self.name == "tank_jump"):
-            self.animation_data = [
-                [0,6,3] # ACTIVE
-            ]
-            self.lifespan = self.animation_data[self.animation_state][self.ANIM_FRAMES] * self.animation_data[self.animation_state][self.ANIM_SPEED]
+        self.lifespan = self.animation_data[self.animation_state][self.ANIM_FRAMES] * self.animation_data[self.animation_state][self.ANIM_SPEED]
                        
         # MECHANICS SETUP
         self.ALIVE = 1
         self.behavior_state = self.ALIVE
         
-        print("new effect spawned:")
-        print(self.name)
+        log.debug("new effect spawned: %s", self.name)
         
     # Returns the image of this object
     def draw(self, map_image):
-        print("drawing effect")
+        log.debug("drawing effect")
         map_image.blit(self.image,(self.rect.x,self.rect.y))
+    
+    # Leave all sprite groups. Pooled effects go back to their pool; anything
+    # else gives the shared sprite sheet back to the registry.
+    def kill(self):
+        # Killing a sprite that's already back in its pool does nothing. Otherwise
+        # it would go on the free list twice and get handed out to two owners.
+        if(self.in_pool): return
+        pygame.sprite.Sprite.kill(self)
+        if(self.pool is not None):
+            self.pool.release(self)
+        else:
+            self.release_sprite_sheet()
+    
+    def release_sprite_sheet(self):
+        if(self.my_sprite_sheet is not None):
+            asset_registry.release_sheet(self.my_sprite_sheet.filename)
+            self.my_sprite_sheet = None
             
     def update(self):
         #All that the effect does is cycle through its animation and then die.
@@ -1131,12 +1360,9 @@ class Effect(pygame.sprite.Sprite):
             self.animation_counter = 0
             self.animation_current_frame += 1
         
-        if(self.name == "pellet_burst"):
-            self.image = self.my_sprite_sheet.image_at((self.animation_current_frame*TILESIZE*2,0,TILESIZE*2,TILESIZE*2)).convert_alpha()
-        elif(self.name == "tank_jump"):
-            self.image = self.my_sprite_sheet.image_at((self.animation_current_frame*TILESIZE*4,0,TILESIZE*4,TILESIZE*4)).convert_alpha()
-        if(self.facing == RIGHT): 
-            self.image = pygame.transform.flip(self.image, True, False)
+        # The frame cache holds a flipped copy of every frame for facing right.
+        frame_rect = (self.animation_current_frame*self.frame_size[0],0,self.frame_size[0],self.frame_size[1])
+        self.image = self.my_sprite_sheet.frame_at(frame_rect, self.facing == RIGHT)
             
         self.lifespan -= 1
         if(self.lifespan <= 0): self.behavior_state = DEAD
@@ -1157,7 +1383,7 @@ class Hud(object):
         # GRAPHICS SETUP ------------        
         # Instead of loading an image directly we will use the
         # spritesheet object, defined below. 
-        self.lifebar_sprite_sheet = Sprite_Sheet("Assets\Graphics\HUD\Heart.png")
+        self.lifebar_sprite_sheet = asset_registry.get_sheet("Assets\Graphics\HUD\Heart.png")
 
         # Now we will initially set the image of this sprite
         # to be the first image on the sprite sheet.
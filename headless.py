@@ -0,0 +1,261 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#SDL reads these when pygame starts up, so they have to be set before
+#anything starts pygame. "dummy" means no window and no sound card.
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+#Import Pygame
+import pygame
+
+#For reading the command line and timing the run.
+import argparse
+import random
+import time
+import sys
+
+#Import global methods.
+import methods
+from methods import load_map_data
+from methods import enter_prepared_map
+
+#Recording and playing back input.
+import input_replay
+from input_replay import Input_Recorder
+from input_replay import load_replay
+from input_replay import get_state_checksum
+
+#Map loading pieces. Headless mode never draws, so it skips the map renderer.
+from collision import compile_collision_grid
+from object_index import compile_object_index
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==           HEADLESS GAME                ==
+# ============================================
+# Runs the game logic with no window, no sound, and no frame cap.
+# Each step() is one update of the main game loop's PLAYING state:
+# map exits, Sprite_Handler.update, collision checks, and dying.
+# Nothing gets drawn, so it runs as fast as the CPU can go. Used for
+# benchmarks, soak tests, and letting scripts play the game on
+# machines without a display.
+#
+# Run it from the command line:
+#   python headless.py --frames 10000 --input random --seed 1
+
+# Pygame still needs a "screen" before sprite sheets can be converted,
+# so make a tiny one with the dummy video driver. The mixer is left off,
+# so load_sound gives back None and nothing plays.
+def start_headless_pygame():
+
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1,1))
+
+class Headless_Game(object):
+
+    def __init__(self, start_map = STARTING_MAP):
+
+        start_headless_pygame()
+
+        # Game objects need pygame running before they load anything.
+        import game_objects
+        self.sprite_handler = game_objects.Sprite_Handler()
+
+        # Maps that have been loaded already, by name.
+        self.maps = {}
+
+        self.current_map = start_map
+        self.tmxdata = enter_prepared_map(self.load_map(start_map), self.sprite_handler, RIGHT)
+
+        self.game_state = PLAYING
+        self.control_state = SOLDIER_ACTIVE
+        self.player_has_died = False
+        self.player_death_counter = 0
+
+        # Stats
+        self.frame = 0
+        self.map_transitions = 0
+        self.game_overs = 0
+
+    # Load a map's data, collision grid and object index, but no renderer.
+    def load_map(self, map_name):
+
+        tmxdata = self.maps.get(map_name)
+        if tmxdata is None:
+            tmxdata = load_map_data(map_name)
+            compile_collision_grid(tmxdata)
+            compile_object_index(tmxdata)
+            self.maps[map_name] = tmxdata
+        return tmxdata
+
+    # Move to the map an exit leads to. Same as main, minus the scrolling.
+    def change_map(self, exit_dict):
+
+        direction = 0
+        if(exit_dict["dir"] == "UP"): direction = UP
+        elif(exit_dict["dir"] == "DOWN"): direction = DOWN
+        elif(exit_dict["dir"] == "LEFT"): direction = LEFT
+        elif(exit_dict["dir"] == "RIGHT"): direction = RIGHT
+
+        self.current_map = exit_dict["dest"]
+        self.tmxdata = enter_prepared_map(self.load_map(self.current_map), self.sprite_handler, direction)
+        self.map_transitions += 1
+
+    # Run one update of the game with these keys held down.
+    def step(self, keys):
+
+        self.frame += 1
+
+        # No game over screen here. Just put the player back and keep going.
+        if(self.game_state == GAME_OVER):
+            self.player_has_died = False
+            self.player_death_counter = 0
+            self.sprite_handler.reset_player(self.tmxdata)
+            self.game_state = PLAYING
+            self.game_overs += 1
+
+        elif(self.game_state == PAUSED):
+            if(keys[PAUSE] == True):
+                self.game_state = PLAYING
+                keys[PAUSE] = False
+
+        elif(self.game_state == PLAYING):
+
+            if(keys[PAUSE] == True):
+                self.game_state = PAUSED
+                keys[PAUSE] = False
+
+            checked_exit_dict = self.sprite_handler.check_for_map_exit(self.tmxdata, self.control_state)
+            if(checked_exit_dict["dest"] != "none"):
+                self.change_map(checked_exit_dict)
+
+            self.sprite_handler.update(self.tmxdata, keys, self.control_state)
+            if(self.sprite_handler.change_control_mode()):
+                if(self.control_state == TANK_ACTIVE): self.control_state = SOLDIER_ACTIVE
+                elif(self.control_state == SOLDIER_ACTIVE): self.control_state = TANK_ACTIVE
+
+            self.sprite_handler.player_enemy_collision_check(self.control_state)
+            self.sprite_handler.projectile_collision_check(self.control_state)
+            self.sprite_handler.item_collision_check(self.control_state)
+
+            check_player = self.sprite_handler.get_player(self.control_state)
+            if check_player.behavior_state == DEAD:
+                self.player_has_died = True
+            if(self.player_has_died == True):
+                self.player_death_counter += 1
+                if(self.player_death_counter >= 200): self.game_state = GAME_OVER
+
+    # Run frame_count updates. get_keys(frame) says what's held down each
+    # update; if there isn't one, nothing is pressed. If there's a recorder,
+    # every update gets recorded. Returns how many seconds it took.
+    def run(self, frame_count, get_keys = None, recorder = None):
+
+        keys = [False]*9
+        if recorder is not None:
+            recorder.checkpoint(self.sprite_handler, self.current_map)
+        start_time = time.perf_counter()
+        for frame in range(frame_count):
+            if get_keys is not None:
+                keys = get_keys(frame)
+            if recorder is not None:
+                recorder.record(keys)
+            self.step(keys)
+            if recorder is not None:
+                recorder.checkpoint(self.sprite_handler, self.current_map)
+        return time.perf_counter() - start_time
+
+    # Check the game against a replay's checkpoint after this many updates.
+    # Returns (frame, expected, actual) if it doesn't match, otherwise None.
+    def check_replay(self, replay, frame):
+
+        expected = replay.get_checksum(frame)
+        if expected is None:
+            return None
+        actual = get_state_checksum(self.sprite_handler, self.current_map)
+        if actual != expected:
+            return (frame, expected, actual)
+        return None
+
+# Play a replay file back as fast as possible, checking the game's state at
+# every checkpoint. Returns (game, seconds, mismatches), where mismatches lists
+# (frame, expected, actual) for every checkpoint that didn't match.
+def run_replay(filename):
+
+    replay = load_replay(filename)
+    if replay is None:
+        return None, 0, []
+    random.seed(replay.seed)
+    game = Headless_Game(replay.start_map)
+
+    mismatches = []
+    mismatch = game.check_replay(replay, 0)
+    if mismatch is not None: mismatches.append(mismatch)
+    start_time = time.perf_counter()
+    for frame in range(replay.frames):
+        game.step(replay.get_keys(frame))
+        mismatch = game.check_replay(replay, frame+1)
+        if mismatch is not None: mismatches.append(mismatch)
+    return game, time.perf_counter() - start_time, mismatches
+
+# Input that mashes buttons at random, holding each one for a while like
+# a player would. Never pauses. The same seed always presses the same buttons.
+class Random_Input(object):
+
+    def __init__(self, seed = 0, change_chance = 0.05):
+
+        self.random = random.Random(seed)
+        self.change_chance = change_chance
+        self.keys = [False]*9
+
+    def __call__(self, frame):
+
+        for key in (UP, DOWN, LEFT, RIGHT, JUMP, FIRE, ITEM, TANK_DOOR):
+            if self.random.random() < self.change_chance:
+                self.keys[key] = not self.keys[key]
+        return self.keys
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run the game logic without a display.")
+    parser.add_argument("--frames", type=int, default=10000, help="how many updates to run")
+    parser.add_argument("--map", default=STARTING_MAP, help="map to start on")
+    parser.add_argument("--input", choices=["idle","random"], default="random", help="what buttons to press")
+    parser.add_argument("--seed", type=int, default=0, help="seed for random input")
+    parser.add_argument("--record", metavar="FILE", help="save the run's input to a replay file")
+    parser.add_argument("--replay", metavar="FILE", help="play back a replay file instead, and check it still matches")
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        game, seconds, mismatches = run_replay(args.replay)
+        if game is None: sys.exit(1)
+        frame_count = game.frame
+    else:
+        recorder = None
+        if args.record is not None: recorder = Input_Recorder(args.map, args.seed)
+        game = Headless_Game(args.map)
+        get_keys = None
+        if args.input == "random": get_keys = Random_Input(args.seed)
+        seconds = game.run(args.frames, get_keys, recorder)
+        frame_count = args.frames
+        if recorder is not None:
+            recorder.checkpoint(game.sprite_handler, game.current_map, True)
+            print("Saved replay:", recorder.save(args.record))
+
+    print("Ran", frame_count, "frames in", round(seconds, 3), "seconds:", round(frame_count/max(seconds, 1e-9)), "frames per second")
+    print("Map transitions:", game.map_transitions, "Game overs:", game.game_overs, "Ended on:", game.current_map)
+
+    if args.replay is not None:
+        for frame, expected, actual in mismatches:
+            print("Replay didn't match at frame", frame, "expected checksum", expected, "got", actual)
+        if len(mismatches) > 0: sys.exit(1)
+        print("Replay matched at every checkpoint.")
@@ -0,0 +1,200 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#For reading and writing replay files.
+import os
+import time
+import json
+import struct
+import zlib
+
+#Replays seed the random module so anything random happens the same way twice.
+import random
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+# ============================================
+# ==           REPLAY FILES                 ==
+# ============================================
+# Everything the game does comes from the keys list, one update at a time.
+# So if we save the keys for every update, plus the seed for the random
+# module, playing them back does exactly the same thing again. That lets
+# us repeat a bug as many times as we like, or time the same run on two
+# versions of the code.
+#
+# A replay file is:
+#   The magic b"CTGR", the format version, and the length of the header.
+#   A JSON header: random seed, starting map, number of updates, and the
+#   checkpoints, a list of [update, state checksum].
+#   The keys. Each key is one bit of a 16 bit number, and keys are held
+#   for a long time, so we only save each change: [keys, updates held]
+#   as two unsigned shorts.
+#
+# Replays line up with updates of the PLAYING, PAUSED and GAME_OVER states,
+# not with frames drawn, so they play back the same at any speed.
+
+REPLAY_MAGIC = b"CTGR"
+# The magic, version and header length at the top of every replay.
+REPLAY_PREAMBLE = struct.Struct("<4sHI")
+# One run of the same keys: the keys, then how many updates they were held.
+REPLAY_RUN = struct.Struct("<HH")
+REPLAY_KEY_COUNT = 9
+
+# Pack the keys list into one number, a bit per key.
+def pack_keys(keys):
+
+    key_bits = 0
+    for key in range(REPLAY_KEY_COUNT):
+        if keys[key]: key_bits |= 1 << key
+    return key_bits
+
+def unpack_keys(key_bits):
+
+    return [bool(key_bits & (1 << key)) for key in range(REPLAY_KEY_COUNT)]
+
+# A checksum of everything about the game that the keys can change. If a
+# replay's checksum doesn't match the recording's, the game did something different.
+def get_state_checksum(sprite_handler, current_map):
+
+    state = [current_map]
+    for player in (sprite_handler.tank, sprite_handler.soldier):
+        state.append((player.rect.x, player.rect.y, player.vector, player.hit_points,
+                      player.behavior_state, player.facing, player.animation_current_frame))
+    projectiles = sprite_handler.player_projectiles
+    count = projectiles.count
+    state.append((count, projectiles.x[:count].tobytes(), projectiles.y[:count].tobytes(),
+                  projectiles.lifespan[:count].tobytes()))
+    state.append(sorted((effect.name, effect.rect.x, effect.rect.y, effect.lifespan) for effect in sprite_handler.effect_list))
+    state.append(sorted((enemy.rect.x, enemy.rect.y) for enemy in sprite_handler.enemy_list))
+    return zlib.crc32(repr(state).encode("utf-8"))
+
+# Where to save a new recording.
+def get_replay_path():
+
+    return os.path.join(REPLAY_FOLDER, time.strftime("replay_%Y%m%d_%H%M%S") + REPLAY_EXTENSION)
+
+# ============================================
+# ==           INPUT RECORDER               ==
+# ============================================
+# Call record() with the keys at the start of every update, and
+# checkpoint() at the end of it. save() writes it all out.
+# Making a recorder seeds the random module.
+
+class Input_Recorder(object):
+
+    def __init__(self, start_map, seed = None, checkpoint_interval = REPLAY_CHECKPOINT_INTERVAL):
+
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        random.seed(seed)
+
+        self.start_map = start_map
+        self.checkpoint_interval = checkpoint_interval
+        # [keys, updates held], for every time the keys changed.
+        self.runs = []
+        # [update, checksum]
+        self.checkpoints = []
+        # How many updates have been recorded.
+        self.frames = 0
+
+    def record(self, keys):
+
+        key_bits = pack_keys(keys)
+        if(len(self.runs) > 0 and self.runs[-1][0] == key_bits and self.runs[-1][1] < 0xFFFF):
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([key_bits, 1])
+        self.frames += 1
+
+    # Save a checksum if it's time for one. Update 0 is the state before anything happened.
+    def checkpoint(self, sprite_handler, current_map, force = False):
+
+        if(len(self.checkpoints) > 0 and self.checkpoints[-1][0] == self.frames):
+            return
+        if(force or self.frames % self.checkpoint_interval == 0):
+            self.checkpoints.append([self.frames, get_state_checksum(sprite_handler, current_map)])
+
+    def save(self, filename):
+
+        header = {
+            "seed": self.seed,
+            "start_map": self.start_map,
+            "frames": self.frames,
+            "checkpoints": self.checkpoints,
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        folder = os.path.dirname(filename)
+        if folder != "":
+            os.makedirs(folder, exist_ok=True)
+        with open(filename, "wb") as replay_file:
+            replay_file.write(REPLAY_PREAMBLE.pack(REPLAY_MAGIC, REPLAY_VERSION, len(header_bytes)))
+            replay_file.write(header_bytes)
+            for key_bits, held in self.runs:
+                replay_file.write(REPLAY_RUN.pack(key_bits, held))
+        return filename
+
+# ============================================
+# ==           INPUT REPLAY                 ==
+# ============================================
+# A loaded replay. get_keys(frame) gives the keys for each update.
+# It's fastest when asked for the updates in order, which is how
+# they get played back.
+
+class Input_Replay(object):
+
+    def __init__(self, seed, start_map, frames, runs, checkpoints):
+
+        self.seed = seed
+        self.start_map = start_map
+        self.frames = frames
+        self.runs = runs
+        # {update: checksum}
+        self.checkpoints = dict(checkpoints)
+
+        # Which run we're in, and the updates it covers.
+        self.run_index = 0
+        self.run_start = 0
+
+    def get_keys(self, frame):
+
+        # Going backwards means starting over from the first run.
+        if frame < self.run_start:
+            self.run_index = 0
+            self.run_start = 0
+        while self.run_index < len(self.runs) and frame >= self.run_start + self.runs[self.run_index][1]:
+            self.run_start += self.runs[self.run_index][1]
+            self.run_index += 1
+        if self.run_index >= len(self.runs):
+            return [False]*REPLAY_KEY_COUNT
+        return unpack_keys(self.runs[self.run_index][0])
+
+    # The checksum the recording had after this many updates, or None if
+    # there's no checkpoint there.
+    def get_checksum(self, frame):
+
+        return self.checkpoints.get(frame)
+
+# Load a replay file. Returns None if it isn't one this version can read.
+def load_replay(filename):
+
+    with open(filename, "rb") as replay_file:
+        data = replay_file.read()
+
+    magic, version, header_length = REPLAY_PREAMBLE.unpack_from(data, 0)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        log.warning("Replay is from a different version and can't be played: %s", filename)
+        return None
+    header_start = REPLAY_PREAMBLE.size
+    data_start = header_start + header_length
+    header = json.loads(data[header_start : data_start].decode("utf-8"))
+    runs = [list(run) for run in REPLAY_RUN.iter_unpack(data[data_start:])]
+    return Input_Replay(header["seed"], header["start_map"], header["frames"], runs, header["checkpoints"])
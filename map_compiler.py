@@ -0,0 +1,548 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For reading and writing the compiled map files.
+import os
+import sys
+import glob
+import json
+import mmap
+import array
+import struct
+import zlib
+import xml.etree.ElementTree as ElementTree
+
+#Import functions that let us read and write
+#to .tmx files, which are what Tiled Map Editor
+#creates.
+import pytmx
+from pytmx.pytmx import parse_properties, unpack_gids, GID_TRANS_ROT
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+#Collision flags for each tile come from the same place the collision grid gets them.
+from collision import tile_flags_from_properties
+
+#Tilesets (and their images) shared between every map that uses them.
+from tileset_cache import tileset_cache
+
+# ============================================
+# ==           COMPILED MAPS                ==
+# ============================================
+# pytmx loads a map by parsing the TMX's XML, then the TSX's XML
+# (Mars.tsx alone is about 5,500 lines of tile properties), and then
+# turning it all into dictionaries. That's most of the time a map
+# takes to load, and it's the same work every time.
+#
+# The tileset is the same for every Mars room, so when we do load a
+# TMX, its tilesets come out of the tileset cache (see tileset_cache.py)
+# and only the TMX itself gets parsed. That's load_tmx_map below.
+#
+# Better still, we can do the whole thing once, offline. Run this file and it compiles every map
+# in Maps/Mapdata into a .mapc file next to the .tmx:
+#
+#     python map_compiler.py                 (every map)
+#     python map_compiler.py Maps/Mapdata/Mars05.tmx
+#
+# A .mapc file looks like this (all numbers little-endian):
+#
+#     "CTGM"                magic, so we know it's one of ours
+#     uint16                format version (COMPILED_MAP_VERSION)
+#     uint32                length of the header
+#     header                JSON: map size, tilesets, layer info, objects,
+#                           the table of tile property dictionaries, and
+#                           a checksum of every source file
+#     data                  packed arrays. Where each one starts (counted
+#                           from the start of the data) is in the header:
+#                             uint32 per tile, per tile layer   (gids)
+#                             uint8 per gid                     (TILE_ collision flags)
+#                             uint16 per gid                    (index into the property table)
+#
+# The game memory-maps the file and builds the map straight from it. The
+# tiles keep their gids from Tiled, so nothing needs remapping. If any of
+# the source files have changed since the map was compiled, the compiled
+# map is ignored and the game goes back to loading the TMX with pytmx.
+
+COMPILED_MAP_MAGIC = b"CTGM"
+# The magic, version and header length at the top of every compiled map.
+COMPILED_MAP_PREAMBLE = struct.Struct("<4sHI")
+
+# The map classes below are pytmx's own classes, just filled in from a
+# compiled map instead of from XML. That way everything that checks
+# isinstance(layer, pytmx.TiledTileLayer) keeps working.
+
+class Compiled_Map(pytmx.TiledMap):
+    
+    def __init__(self, filename):
+        
+        # No filename, so pytmx doesn't parse anything.
+        pytmx.TiledMap.__init__(self)
+        self.filename = filename
+        
+        # Collision flags for every gid, packed one byte each. The collision
+        # grid reads these instead of asking for property dictionaries.
+        self.tile_flags = None
+        
+        # Where each tileset's images came from, as (firstgid, image path, tileset
+        # settings), so convert_map_images can fetch them again once they're converted.
+        self.tile_image_sources = []
+
+class Compiled_Tile_Layer(pytmx.TiledTileLayer):
+    
+    def __init__(self, parent, layer_info, data):
+        
+        pytmx.TiledElement.__init__(self)
+        self.parent = parent
+        # One array of gids per row, the same shape pytmx uses.
+        self.data = data
+        
+        self.id = layer_info["id"]
+        self.name = layer_info["name"]
+        self.width = layer_info["width"]
+        self.height = layer_info["height"]
+        self.opacity = layer_info["opacity"]
+        self.visible = layer_info["visible"]
+        self.offsetx = layer_info["offsetx"]
+        self.offsety = layer_info["offsety"]
+        self.properties = layer_info["properties"]
+
+class Compiled_Object_Group(pytmx.TiledObjectGroup):
+    
+    def __init__(self, parent, layer_info):
+        
+        pytmx.TiledElement.__init__(self)
+        self.parent = parent
+        
+        self.id = layer_info["id"]
+        self.name = layer_info["name"]
+        self.color = None
+        self.opacity = layer_info["opacity"]
+        self.visible = layer_info["visible"]
+        self.offsetx = layer_info["offsetx"]
+        self.offsety = layer_info["offsety"]
+        self.custom_types = {}
+        self.draworder = "index"
+        self.properties = layer_info["properties"]
+        
+        for object_info in layer_info["objects"]:
+            self.append(Compiled_Object(parent, object_info))
+
+class Compiled_Object(pytmx.TiledObject):
+    
+    def __init__(self, parent, object_info):
+        
+        pytmx.TiledElement.__init__(self)
+        self.parent = parent
+        
+        self.id = object_info["id"]
+        self.name = object_info["name"]
+        self.type = object_info["type"]
+        self.x = object_info["x"]
+        self.y = object_info["y"]
+        self.width = object_info["width"]
+        self.height = object_info["height"]
+        self.rotation = object_info["rotation"]
+        self.gid = object_info["gid"]
+        self.visible = object_info["visible"]
+        self.closed = True
+        self.template = None
+        self.custom_types = {}
+        self.properties = object_info["properties"]
+
+# ============================================
+# ==          COMPILER METHODS              ==
+# ============================================
+
+# Where the compiled version of a map lives: next to the .tmx.
+#--------------------------------
+def get_compiled_map_path(map_name):
+    
+    return os.path.splitext(map_name)[0] + COMPILED_MAP_EXTENSION
+
+# A checksum of a file, so we can tell if it's changed since we compiled it.
+# Checksums survive git checkouts and copies, unlike modified times.
+#--------------------------------
+def get_file_checksum(path):
+    
+    with open(path, "rb") as source_file:
+        return zlib.crc32(source_file.read())
+
+# Find the files a TMX was built from: the TMX itself and any TSX files it uses.
+# Paths are relative to the folder the TMX is in.
+#--------------------------------
+def get_map_sources(map_name):
+    
+    sources = [os.path.basename(map_name)]
+    for tileset_node in ElementTree.parse(map_name).getroot().findall("tileset"):
+        source = tileset_node.get("source")
+        if source is not None:
+            sources.append(source)
+    return sources
+
+# Turn a pytmx object into something JSON can store.
+#--------------------------------
+def object_to_dict(tile_object):
+    
+    return {"id": tile_object.id, "name": tile_object.name, "type": tile_object.type,
+            "x": tile_object.x, "y": tile_object.y,
+            "width": tile_object.width, "height": tile_object.height,
+            "rotation": tile_object.rotation, "gid": tile_object.parent.tiledgidmap.get(tile_object.gid, 0),
+            "visible": tile_object.visible, "properties": dict(tile_object.properties)}
+
+# The layer settings every kind of layer has.
+#--------------------------------
+def layer_to_dict(layer):
+    
+    return {"id": getattr(layer, "id", 0), "name": layer.name,
+            "opacity": layer.opacity, "visible": layer.visible,
+            "offsetx": layer.offsetx, "offsety": layer.offsety,
+            "properties": dict(layer.properties)}
+
+# Compile a TMX map (and its tilesets) into a .mapc file.
+# Returns the path of the compiled map.
+#--------------------------------
+def compile_map(map_name, compiled_map_name = None):
+    
+    if compiled_map_name is None:
+        compiled_map_name = get_compiled_map_path(map_name)
+    map_folder = os.path.dirname(map_name)
+    compiled_map_folder = os.path.dirname(compiled_map_name)
+    
+    # Let pytmx do the parsing. Without an image loader it doesn't touch any images.
+    tmxdata = pytmx.TiledMap(map_name)
+    
+    # pytmx hands out its own gids in the order tiles turn up. Turn them back
+    # into Tiled's gids, so the compiled map doesn't depend on that order.
+    def tiled_gid(pytmx_gid):
+        if pytmx_gid == 0: return 0
+        return tmxdata.tiledgidmap[pytmx_gid]
+    
+    # Tilesets. Image paths are saved relative to the compiled map.
+    tilesets = []
+    gid_count = 1
+    for tileset in tmxdata.tilesets:
+        image_path = os.path.normpath(os.path.join(map_folder, tileset.source))
+        tilesets.append({"firstgid": tileset.firstgid, "tilecount": tileset.tilecount,
+                         "columns": tileset.columns, "tilewidth": tileset.tilewidth,
+                         "tileheight": tileset.tileheight, "margin": tileset.margin,
+                         "spacing": tileset.spacing,
+                         "image": os.path.relpath(image_path, compiled_map_folder or ".").replace(os.sep, "/"),
+                         "trans": getattr(tileset, "trans", None)})
+        gid_count = max(gid_count, tileset.firstgid + tileset.tilecount)
+    
+    # Tile properties, by Tiled gid. Most tiles share the same few property
+    # dictionaries, so each different dictionary only gets saved once. The
+    # "id" pytmx adds is different for every tile, so leave it out; the
+    # loader puts it back.
+    properties_by_gid = {}
+    for pytmx_gid, properties in tmxdata.tile_properties.items():
+        properties = dict(properties)
+        properties.pop("id", None)
+        properties_by_gid[tiled_gid(pytmx_gid)] = properties
+    
+    property_table = []
+    property_table_index = {}
+    tile_flags = bytearray(gid_count)
+    tile_property_index = array.array("H", [0]) * gid_count
+    for gid in range(gid_count):
+        properties = properties_by_gid.get(gid)
+        tile_flags[gid] = tile_flags_from_properties(properties)
+        # Index 0 means "no properties".
+        if properties is not None:
+            key = json.dumps(properties, sort_keys=True, default=str)
+            if key not in property_table_index:
+                property_table.append(properties)
+                property_table_index[key] = len(property_table)
+            tile_property_index[gid] = property_table_index[key]
+    
+    # Layers. Tile data gets packed after the header; everything else goes in it.
+    data = bytearray()
+    layers = []
+    for layer in tmxdata.layers:
+        layer_info = layer_to_dict(layer)
+        if isinstance(layer, pytmx.TiledTileLayer):
+            gids = array.array("I", [tiled_gid(gid) for row in layer.data for gid in row])
+            if sys.byteorder == "big": gids.byteswap()
+            layer_info.update({"type": "tiles", "width": layer.width, "height": layer.height, "data": len(data)})
+            data += gids.tobytes()
+        elif isinstance(layer, pytmx.TiledObjectGroup):
+            layer_info.update({"type": "objects", "objects": [object_to_dict(tile_object) for tile_object in layer]})
+        else:
+            # Image and group layers aren't used by this game.
+            log.warning("Skipping layer the compiler doesn't handle: %s", layer.name)
+            continue
+        layers.append(layer_info)
+    
+    tile_flags_offset = len(data)
+    data += tile_flags
+    if sys.byteorder == "big": tile_property_index.byteswap()
+    tile_property_index_offset = len(data)
+    data += tile_property_index.tobytes()
+    
+    # Checksums of the files we compiled from, so the loader can tell if we're out of date.
+    sources = {}
+    for source in get_map_sources(map_name):
+        sources[source] = get_file_checksum(os.path.join(map_folder, source))
+    
+    header = {"width": tmxdata.width, "height": tmxdata.height,
+              "tilewidth": tmxdata.tilewidth, "tileheight": tmxdata.tileheight,
+              "properties": dict(tmxdata.properties),
+              "sources": sources, "tilesets": tilesets, "gid_count": gid_count,
+              "tile_flags": tile_flags_offset, "tile_property_index": tile_property_index_offset,
+              "property_table": property_table, "layers": layers}
+    header_bytes = json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+    
+    with open(compiled_map_name, "wb") as compiled_file:
+        compiled_file.write(COMPILED_MAP_PREAMBLE.pack(COMPILED_MAP_MAGIC, COMPILED_MAP_VERSION, len(header_bytes)))
+        compiled_file.write(header_bytes)
+        compiled_file.write(data)
+    
+    return compiled_map_name
+
+# ============================================
+# ==           LOADER METHODS               ==
+# ============================================
+
+# Check that none of a compiled map's source files have changed.
+# If a source file isn't there at all, trust the compiled map.
+#--------------------------------
+def compiled_map_is_current(header, map_folder):
+    
+    for source, checksum in header["sources"].items():
+        source_path = os.path.join(map_folder, source)
+        if os.path.exists(source_path) and get_file_checksum(source_path) != checksum:
+            return False
+    return True
+
+# Read a packed array out of the compiled map.
+#--------------------------------
+def read_array(data, type_code, offset, count):
+    
+    values = array.array(type_code)
+    values.frombytes(data[offset : offset + count * values.itemsize])
+    if sys.byteorder == "big": values.byteswap()
+    return values
+
+# Put a tileset's tile images in a map's image list, one per gid.
+# The tileset cache only cuts up each tileset image once.
+#--------------------------------
+def load_tileset_images(tmxdata, tileset, compiled_map_folder):
+    
+    image_path = os.path.join(compiled_map_folder, tileset["image"])
+    tile_images = tileset_cache.get_tile_images(image_path, tileset)
+    tmxdata.images[tileset["firstgid"] : tileset["firstgid"] + len(tile_images)] = tile_images
+    tmxdata.tile_image_sources.append((tileset["firstgid"], image_path, tileset))
+
+# A map loaded on the map prefetcher's thread has tile images that aren't
+# converted for the screen yet, because only the main thread can do that.
+# Call this on the main thread before drawing the map. Cheap if they already are.
+#--------------------------------
+def convert_map_images(tmxdata):
+    
+    for firstgid, image_path, tileset_info in getattr(tmxdata, "tile_image_sources", ()):
+        tile_images = tileset_cache.get_tile_images(image_path, tileset_info)
+        tmxdata.images[firstgid : firstgid + len(tile_images)] = tile_images
+
+# Load the compiled version of a map, if there's an up-to-date one.
+# Returns the map, or None if the TMX needs loading the slow way.
+#--------------------------------
+def load_compiled_map(map_name):
+    
+    compiled_map_name = get_compiled_map_path(map_name)
+    if not os.path.exists(compiled_map_name):
+        return None
+    map_folder = os.path.dirname(map_name)
+    compiled_map_folder = os.path.dirname(compiled_map_name)
+    
+    with open(compiled_map_name, "rb") as compiled_file:
+        with mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            
+            magic, version, header_length = COMPILED_MAP_PREAMBLE.unpack_from(mapped_file, 0)
+            if magic != COMPILED_MAP_MAGIC or version != COMPILED_MAP_VERSION:
+                log.info("Compiled map is from a different version; loading the TMX instead: %s", compiled_map_name)
+                return None
+            header_start = COMPILED_MAP_PREAMBLE.size
+            data_start = header_start + header_length
+            header = json.loads(mapped_file[header_start : data_start].decode("utf-8"))
+            if not compiled_map_is_current(header, map_folder):
+                log.info("Compiled map is out of date; loading the TMX instead: %s", compiled_map_name)
+                return None
+            data = memoryview(mapped_file)[data_start:]
+            
+            try:
+                tmxdata = Compiled_Map(map_name)
+                tmxdata.width = header["width"]
+                tmxdata.height = header["height"]
+                tmxdata.tilewidth = header["tilewidth"]
+                tmxdata.tileheight = header["tileheight"]
+                tmxdata.properties = header["properties"]
+                
+                # Tile properties and collision flags, by gid.
+                gid_count = header["gid_count"]
+                tmxdata.maxgid = gid_count
+                tmxdata.tile_flags = bytearray(data[header["tile_flags"] : header["tile_flags"] + gid_count])
+                tile_property_index = read_array(data, "H", header["tile_property_index"], gid_count)
+                property_table = header["property_table"]
+                for tileset in header["tilesets"]:
+                    for tile_id in range(tileset["tilecount"]):
+                        gid = tileset["firstgid"] + tile_id
+                        if tile_property_index[gid] != 0:
+                            properties = dict(property_table[tile_property_index[gid] - 1])
+                            properties["id"] = tile_id
+                            tmxdata.tile_properties[gid] = properties
+                
+                # Layers
+                for layer_info in header["layers"]:
+                    if(layer_info["type"] == "tiles"):
+                        width = layer_info["width"]
+                        gids = read_array(data, "I", layer_info["data"], width * layer_info["height"])
+                        rows = [gids[row_start : row_start + width] for row_start in range(0, len(gids), width)]
+                        layer = Compiled_Tile_Layer(tmxdata, layer_info, rows)
+                    else:
+                        layer = Compiled_Object_Group(tmxdata, layer_info)
+                        for tile_object in layer:
+                            tmxdata.objects_by_id[tile_object.id] = tile_object
+                            tmxdata.objects_by_name[tile_object.name] = tile_object
+                    tmxdata.layers.append(layer)
+                    tmxdata.layernames[layer.name] = layer
+            finally:
+                # The mmap can't close while we're still looking at it.
+                data.release()
+    
+    # Tile images
+    tmxdata.images = [None] * gid_count
+    for tileset in header["tilesets"]:
+        load_tileset_images(tmxdata, tileset, compiled_map_folder)
+    
+    return tmxdata
+
+# Load a TMX ourselves, getting its tilesets from the tileset cache.
+# Only handles what this game's maps use: orthogonal maps, external TSX
+# tilesets, unflipped tiles, tile layers and plain object layers.
+# Returns the map, or None if the TMX needs pytmx.
+#--------------------------------
+def load_tmx_map(map_name):
+    
+    map_folder = os.path.dirname(map_name)
+    root = ElementTree.parse(map_name).getroot()
+    if(root.get("orientation", "orthogonal") != "orthogonal" or root.get("infinite", "0") != "0"):
+        return None
+    
+    tmxdata = Compiled_Map(map_name)
+    tmxdata.width = int(root.get("width"))
+    tmxdata.height = int(root.get("height"))
+    tmxdata.tilewidth = int(root.get("tilewidth"))
+    tmxdata.tileheight = int(root.get("tileheight"))
+    tmxdata.properties = parse_properties(root)
+    
+    # Tilesets
+    tilesets = []
+    gid_count = 1
+    for tileset_node in root.findall("tileset"):
+        source = tileset_node.get("source")
+        if source is None or not source.lower().endswith(".tsx"):
+            return None
+        tileset = tileset_cache.get_tileset(os.path.join(map_folder, source))
+        firstgid = int(tileset_node.get("firstgid"))
+        tilesets.append((firstgid, tileset))
+        gid_count = max(gid_count, firstgid + tileset.tilecount)
+    
+    # Tile properties, collision flags and images, by gid. Gids that don't
+    # belong to any tileset count as solid, like they do with pytmx.
+    tmxdata.maxgid = gid_count
+    tmxdata.tile_flags = bytearray([TILE_SOLID]) * gid_count
+    tmxdata.images = [None] * gid_count
+    for firstgid, tileset in tilesets:
+        tmxdata.tile_flags[firstgid : firstgid + tileset.tilecount] = tileset.tile_flags
+        for tile_id in range(tileset.tilecount):
+            if tileset.tile_properties[tile_id] is not None:
+                tmxdata.tile_properties[firstgid + tile_id] = tileset.tile_properties[tile_id]
+        tile_images = tileset_cache.get_tileset_images(tileset)
+        tmxdata.images[firstgid : firstgid + len(tile_images)] = tile_images
+        tmxdata.tile_image_sources.append((firstgid, tileset.get_image_path(), tileset.get_info()))
+    
+    # Layers. pytmx puts all the tile layers first and then the object
+    # layers, and code uses layer numbers like BLOCK_LAYER, so do the same.
+    if root.find("imagelayer") is not None or root.find("group") is not None:
+        return None
+    
+    for layer_node in root.findall("layer"):
+        layer_info = get_layer_info(layer_node)
+        layer_info["width"] = int(layer_node.get("width"))
+        layer_info["height"] = int(layer_node.get("height"))
+        data_node = layer_node.find("data")
+        gids = unpack_gids(data_node.text.strip(), data_node.get("encoding"), data_node.get("compression"))
+        if gids is None or max(gids) >= GID_TRANS_ROT:
+            # Flipped tiles or <tile> data; let pytmx deal with it.
+            return None
+        width = layer_info["width"]
+        rows = [gids[row_start : row_start + width] for row_start in range(0, len(gids), width)]
+        layer = Compiled_Tile_Layer(tmxdata, layer_info, rows)
+        tmxdata.layers.append(layer)
+        tmxdata.layernames[layer.name] = layer
+    
+    for layer_node in root.findall("objectgroup"):
+        layer_info = get_layer_info(layer_node, is_object_layer = True)
+        layer_info["objects"] = []
+        for object_node in layer_node.findall("object"):
+            if object_node.find("polygon") is not None or object_node.find("polyline") is not None:
+                return None
+            layer_info["objects"].append(get_object_info(object_node))
+        layer = Compiled_Object_Group(tmxdata, layer_info)
+        for tile_object in layer:
+            tmxdata.objects_by_id[tile_object.id] = tile_object
+            tmxdata.objects_by_name[tile_object.name] = tile_object
+        tmxdata.layers.append(layer)
+        tmxdata.layernames[layer.name] = layer
+    
+    return tmxdata
+
+# The settings every kind of layer has, read from its XML tag with the same
+# types (and defaults) pytmx would give them.
+#--------------------------------
+def get_layer_info(layer_node, is_object_layer = False):
+    
+    layer_info = {"id": 0, "name": None, "opacity": 1.0, "visible": True, "offsetx": 0, "offsety": 0}
+    if is_object_layer:
+        layer_info["opacity"] = 1
+        layer_info["visible"] = 1
+    for key, value in layer_node.items():
+        if key in layer_info:
+            layer_info[key] = pytmx.pytmx.types[key](value)
+    layer_info["properties"] = parse_properties(layer_node)
+    return layer_info
+
+# An object, read from its XML tag with the same types pytmx would give it.
+#--------------------------------
+def get_object_info(object_node):
+    
+    object_info = {"id": 0, "name": None, "type": None, "x": 0, "y": 0, "width": 0, "height": 0,
+                   "rotation": 0, "gid": 0, "visible": 1}
+    for key, value in object_node.items():
+        if key in object_info:
+            object_info[key] = pytmx.pytmx.types[key](value)
+    object_info["properties"] = parse_properties(object_node)
+    return object_info
+
+# ============================================
+# ==     COMPILE MAPS FROM COMMAND LINE     ==
+# ============================================
+
+if __name__ == "__main__":
+    
+    map_names = sys.argv[1:]
+    if len(map_names) == 0:
+        map_names = glob.glob(os.path.join("Maps", "Mapdata", "*.tmx"))
+    for map_name in map_names:
+        print("Compiled", map_name, "->", compile_map(map_name))
@@ -0,0 +1,218 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#Threads let us load maps in the background while the game keeps running.
+import threading
+import queue
+import collections
+import time
+
+#Import global methods. prepare_map does the actual loading.
+import methods
+from methods import prepare_map
+from methods import get_landing_coords
+
+#Tiles loaded on the worker thread get converted on the main thread.
+from map_compiler import convert_map_images
+
+#Every map's exits are in its object index.
+from object_index import get_object_index
+
+#Each map's music gets read ahead along with the map.
+from music_player import music_player
+from music_player import get_map_music
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+# ============================================
+# ==           MAP PREFETCHER               ==
+# ============================================
+# Loading a map (parsing the TMX, loading the tileset, drawing it)
+# takes long enough that the game visibly freezes when the player
+# walks through an exit. But we always know where the exits go: every
+# "exit" object has a "dest" property. So as soon as a map loads, the
+# prefetcher starts loading all of its neighbours on a worker thread.
+# By the time the player reaches an exit, the map is ready.
+#
+# Only the main thread may make Surfaces for the screen, so the worker
+# just does the parsing: the map, its tilesets, its collision grid, and
+# decoding the tileset image. Then it hands the map back, and update()
+# (called once a frame) finishes it on the main thread a little at a
+# time: it converts the tiles, then draws the chunks around the entrance
+# the player will land at, one chunk at a time, stopping each frame once
+# it's used up its time budget. If the player gets to the exit first,
+# get_map does the converting right then and the transition draws the rest.
+#
+# Prefetched maps go in a small cache. When it's full, the map that was
+# used longest ago gets thrown away. Hits and misses are counted so we
+# can tell if the cache is big enough.
+#
+# The worker also has the music player read ahead each map's track, so
+# the music can switch during the transition without waiting on the disk.
+
+class Map_Prefetcher(object):
+    
+    def __init__(self, max_maps = MAP_PREFETCH_CACHE_SIZE):
+        
+        # How many prepared maps we can keep at once.
+        self.max_maps = max_maps
+        # Prepared maps by map name, as (tmxdata, map_renderer). Oldest-used first.
+        self.maps = collections.OrderedDict()
+        # Maps the worker thread has been asked for but hasn't finished yet.
+        self.loading = set()
+        # Maps the worker has loaded that the main thread is still finishing, by
+        # map name, as (prepared map, finishing steps). Oldest first.
+        self.finishing = collections.OrderedDict()
+        
+        # Stats
+        self.hits = 0 # Asked for a map that was ready
+        self.misses = 0 # Asked for a map and had to load it right then
+        self.evictions = 0
+        
+        # The cache is shared with the worker thread, so only touch it while
+        # holding this lock. Waiting on it lets get_map wait for the worker.
+        self.lock = threading.Condition()
+        
+        # Maps for the worker to load, as (map name, entrance direction).
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self.worker_loop, daemon=True)
+        self.worker.start()
+    
+    # Ask the worker to load every map this map's exits lead to.
+    def prefetch_exits(self, tmxdata):
+        
+        for exit_rect, exit_properties in get_object_index(tmxdata).exits:
+            map_name = exit_properties["dest"]
+            if map_name == "none": continue
+            with self.lock:
+                if map_name in self.maps or map_name in self.loading or map_name in self.finishing: continue
+                self.loading.add(map_name)
+            self.requests.put((map_name, exit_properties["dir"]))
+    
+    # Get a prepared map as (tmxdata, map_renderer). If the worker is still
+    # loading it, wait for it. If nobody has loaded it, load it now.
+    def get_map(self, map_name):
+        
+        with self.lock:
+            while map_name in self.loading:
+                self.lock.wait()
+            finishing = self.finishing.pop(map_name, None)
+            if finishing is not None:
+                self.hits += 1
+                self.store_map(map_name, finishing[0])
+            elif map_name in self.maps:
+                self.hits += 1
+                self.maps.move_to_end(map_name)
+                return self.maps[map_name]
+            else:
+                self.misses += 1
+        
+        # The worker loaded it, but update() hasn't finished it yet. Convert
+        # its tiles now; the transition draws whatever chunks it needs.
+        if finishing is not None:
+            prepared_map = finishing[0]
+            convert_map_images(prepared_map[0])
+            return prepared_map
+        
+        prepared_map = prepare_map(map_name)
+        with self.lock:
+            self.store_map(map_name, prepared_map)
+        return prepared_map
+    
+    # Put a map in the cache, throwing out the oldest if it's full.
+    # Only call this while holding the lock.
+    def store_map(self, map_name, prepared_map):
+        
+        self.maps[map_name] = prepared_map
+        self.maps.move_to_end(map_name)
+        while len(self.maps) > self.max_maps:
+            self.maps.popitem(last=False)
+            self.evictions += 1
+    
+    # Keep a map we loaded some other way (like the one the game started on),
+    # so coming back to it later doesn't load it again.
+    def remember_map(self, map_name, prepared_map):
+        
+        with self.lock:
+            self.store_map(map_name, prepared_map)
+    
+    # Forget a map, so the next get_map loads it fresh.
+    def forget_map(self, map_name):
+        
+        with self.lock:
+            self.maps.pop(map_name, None)
+            self.finishing.pop(map_name, None)
+    
+    # Finish the maps the worker has loaded, on the main thread, for up to
+    # time_budget milliseconds. Call this once a frame.
+    def update(self, time_budget = MAP_PREFETCH_FRAME_BUDGET_MS):
+        
+        end_time = time.perf_counter() + time_budget/1000
+        while True:
+            with self.lock:
+                if len(self.finishing) == 0: return
+                map_name, (prepared_map, steps) = next(iter(self.finishing.items()))
+            
+            # Each step is small: converting the tiles, or drawing one chunk.
+            # If one fails, drop the map; get_map loads it when it's needed.
+            try:
+                finished = next(steps, None) is None
+            except Exception as error:
+                log.warning("Couldn't finish prefetched map %s: %s", map_name, error)
+                with self.lock:
+                    self.finishing.pop(map_name, None)
+                finished = False
+            if finished:
+                with self.lock:
+                    if self.finishing.pop(map_name, None) is not None:
+                        self.store_map(map_name, prepared_map)
+            if time.perf_counter() >= end_time: return
+    
+    # The steps that finish a map the worker loaded, one per next().
+    # Main thread only.
+    def finish_map_steps(self, prepared_map, entrance_direction):
+        
+        tmxdata, map_renderer = prepared_map
+        convert_map_images(tmxdata)
+        yield True
+        
+        # Draw the part of the map around where the player will come in,
+        # so the transition doesn't have to.
+        if entrance_direction is None: return
+        landing_rect = pygame.Rect(0, 0, SCREEN_W, SCREEN_H)
+        landing_rect.center = get_landing_coords(tmxdata, entrance_direction)
+        yield from map_renderer.warm_up_steps(landing_rect)
+    
+    # The worker thread. Loads maps one at a time as they're asked for.
+    # Nothing here makes a Surface for the screen; update() does that part.
+    def worker_loop(self):
+        
+        while True:
+            map_name, entrance_direction = self.requests.get()
+            prepared_map = None
+            try:
+                prepared_map = prepare_map(map_name, use_pytmx = False)
+                if prepared_map is None:
+                    log.info("Map %s needs pytmx, so it'll load when it's needed instead.", map_name)
+                else:
+                    music_player.prebuffer(get_map_music(prepared_map[0]))
+            except Exception as error:
+                log.warning("Couldn't prefetch map %s: %s", map_name, error)
+                prepared_map = None
+            
+            with self.lock:
+                self.loading.discard(map_name)
+                if prepared_map is not None:
+                    self.finishing[map_name] = (prepared_map, self.finish_map_steps(prepared_map, entrance_direction))
+                self.lock.notify_all()
@@ -0,0 +1,348 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+# Import math functions
+import math
+import collections
+
+#Import functions that let us read and write
+#to .tmx files, which are what Tiled Map Editor
+#creates.
+import pytmx
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==             MAP PLANE                  ==
+# ============================================
+# Drawing a whole map into one giant Surface gets very expensive
+# as maps get bigger. A 500x500 tile map would need a 16000x16000
+# image, and we'd be copying it around every frame.
+# Instead, a map plane cuts its layers into square chunks
+# (MAP_CHUNK_TILES tiles on a side). A chunk only gets drawn the first
+# time the camera can see it. Drawn chunks are kept in a cache; when the
+# cache uses more memory than its budget, the chunk that was looked at
+# longest ago gets thrown away. While the camera is moving, the plane
+# also draws one chunk ahead in the direction it's going, so it's
+# usually ready before it comes on screen.
+# That way, drawing the map costs about the same for any size of map.
+#
+# A plane is a group of tile layers that always get drawn together:
+# they're all on the same side of the sprites and scroll at the same
+# speed. The Map_Renderer below splits a map up into planes.
+
+class Map_Plane(object):
+    
+    def __init__(self, tmxdata, layers, transparent, parallax, chunk_tiles = MAP_CHUNK_TILES, memory_budget = MAP_CHUNK_MEMORY_BUDGET):
+        
+        self.tmxdata = tmxdata
+        
+        # The layers this plane draws, bottom first. Saved as (layer index, layer)
+        # because pytmx looks tiles up by the layer's index.
+        self.layers = layers
+        # Whether the chunks need to be see-through (for anything drawn over
+        # something else) or can be solid (the very bottom plane).
+        self.transparent = transparent
+        # How fast this plane scrolls compared to the map, as (x, y).
+        # 1 scrolls with the map, less than 1 scrolls slower and looks further away.
+        self.parallax = parallax
+        
+        # Size of the map in pixels
+        self.width = tmxdata.width * TILESIZE
+        self.height = tmxdata.height * TILESIZE
+        
+        # Size of each chunk, in tiles and in pixels
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * TILESIZE
+        
+        # How many bytes of drawn chunks we're allowed to keep around.
+        self.memory_budget = memory_budget
+        
+        # Drawn chunks by (chunk x, chunk y). Kept in order of use, so the
+        # first one is the one that was used longest ago.
+        self.chunks = collections.OrderedDict()
+        self.chunk_memory = 0
+        
+        # For prefetching: where the camera was looking last time, and
+        # how many chunks we're allowed to draw ahead of time each frame.
+        self.last_view_rect = None
+        self.prefetch_per_frame = 1
+        
+        # Stats so we can tell how well the cache is doing.
+        self.chunks_drawn = 0
+        self.chunk_hits = 0
+        self.chunks_evicted = 0
+        
+    # Get a drawn chunk, drawing it first if it's not in the cache.
+    def get_chunk(self, chunk_x, chunk_y):
+        
+        key = (chunk_x, chunk_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.rasterize_chunk(chunk_x, chunk_y)
+            self.chunks[key] = chunk
+            self.chunk_memory += self.surface_memory(chunk)
+            self.evict_chunks()
+        else:
+            self.chunks.move_to_end(key)
+            self.chunk_hits += 1
+        return chunk
+    
+    # Draw every tile of every layer in this plane that's inside one chunk.
+    def rasterize_chunk(self, chunk_x, chunk_y):
+        
+        first_tile_x = chunk_x * self.chunk_tiles
+        first_tile_y = chunk_y * self.chunk_tiles
+        last_tile_x = min(first_tile_x + self.chunk_tiles, self.tmxdata.width)
+        last_tile_y = min(first_tile_y + self.chunk_tiles, self.tmxdata.height)
+        
+        # Chunks on the right and bottom edges of the map may be smaller.
+        chunk_size = ((last_tile_x-first_tile_x)*TILESIZE, (last_tile_y-first_tile_y)*TILESIZE)
+        if(self.transparent):
+            chunk = pygame.Surface(chunk_size, pygame.SRCALPHA).convert_alpha()
+            chunk.fill((0,0,0,0))
+        else:
+            chunk = pygame.Surface(chunk_size).convert()
+            chunk.fill(0)
+        
+        for layer_index, layer in self.layers:
+            for tile_y in range(first_tile_y, last_tile_y):
+                row = layer.data[tile_y]
+                for tile_x in range(first_tile_x, last_tile_x):
+                    gid = row[tile_x]
+                    if gid:
+                        tile_image = self.tmxdata.get_tile_image_by_gid(gid)
+                        if tile_image is not None:
+                            chunk.blit(tile_image, ((tile_x-first_tile_x)*TILESIZE, (tile_y-first_tile_y)*TILESIZE))
+        
+        self.chunks_drawn += 1
+        return chunk
+    
+    def surface_memory(self, surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+    
+    # Throw away the oldest chunks until we're under the memory budget.
+    # Always keep enough chunks to cover the whole screen, though, or we'd
+    # end up redrawing chunks we need every frame.
+    def evict_chunks(self):
+        
+        chunks_on_screen = (math.ceil(SCREEN_W/self.chunk_size)+1) * (math.ceil(SCREEN_H/self.chunk_size)+1)
+        while(self.chunk_memory > self.memory_budget and len(self.chunks) > chunks_on_screen):
+            key, chunk = self.chunks.popitem(last=False)
+            self.chunk_memory -= self.surface_memory(chunk)
+            self.chunks_evicted += 1
+    
+    # Get the chunk coordinates that cover a rectangle of the plane.
+    def chunks_in_rect(self, plane_rect):
+        
+        plane_rect = plane_rect.clip(pygame.Rect(0, 0, self.width, self.height))
+        if(plane_rect.width <= 0 or plane_rect.height <= 0):
+            return []
+        chunk_coords = []
+        for chunk_y in range(plane_rect.top // self.chunk_size, (plane_rect.bottom-1) // self.chunk_size + 1):
+            for chunk_x in range(plane_rect.left // self.chunk_size, (plane_rect.right-1) // self.chunk_size + 1):
+                chunk_coords.append((chunk_x, chunk_y))
+        return chunk_coords
+    
+    # Draw one rectangle of the plane onto dest, with the rectangle's top left at dest_pos.
+    def draw_area(self, dest, plane_rect, dest_pos):
+        
+        for chunk_x, chunk_y in self.chunks_in_rect(plane_rect):
+            chunk = self.get_chunk(chunk_x, chunk_y)
+            chunk_rect = chunk.get_rect(topleft=(chunk_x*self.chunk_size, chunk_y*self.chunk_size))
+            part = plane_rect.clip(chunk_rect)
+            dest.blit(chunk,
+                      (dest_pos[0] + part.x - plane_rect.x, dest_pos[1] + part.y - plane_rect.y),
+                      part.move(-chunk_rect.x, -chunk_rect.y))
+    
+    # Where this plane's view starts when the camera's view starts at view_rect.
+    # Parallax planes scroll slower, so their view is shifted back towards the corner.
+    def get_plane_view_rect(self, view_rect):
+        
+        return pygame.Rect(round(view_rect.x*self.parallax[0]), round(view_rect.y*self.parallax[1]),
+                           view_rect.width, view_rect.height)
+    
+    # Draw the part of this plane that shows up under map_rect when the camera
+    # is looking at view_rect. canvas's top left corner is the top left of view_rect.
+    def draw_view_area(self, canvas, view_rect, map_rect):
+        
+        plane_view_rect = self.get_plane_view_rect(view_rect)
+        plane_rect = map_rect.move(plane_view_rect.x - view_rect.x, plane_view_rect.y - view_rect.y)
+        self.draw_area(canvas, plane_rect, (map_rect.x - view_rect.x, map_rect.y - view_rect.y))
+    
+    # If the camera is moving, draw the next chunks it's heading towards
+    # before they come on screen. Only draws a few per frame so we don't stutter.
+    def prefetch(self, view_rect):
+        
+        view_rect = self.get_plane_view_rect(view_rect)
+        last_view_rect = self.last_view_rect
+        self.last_view_rect = view_rect
+        if last_view_rect is None:
+            return
+        
+        move_x = view_rect.x - last_view_rect.x
+        move_y = view_rect.y - last_view_rect.y
+        if(move_x == 0 and move_y == 0):
+            return
+        
+        # Look one chunk ahead in whichever direction(s) we're moving.
+        direction_x = (move_x > 0) - (move_x < 0)
+        direction_y = (move_y > 0) - (move_y < 0)
+        ahead_rect = view_rect.move(direction_x*self.chunk_size, direction_y*self.chunk_size)
+        
+        chunks_prefetched = 0
+        for chunk_x, chunk_y in self.chunks_in_rect(ahead_rect):
+            if (chunk_x, chunk_y) not in self.chunks:
+                self.get_chunk(chunk_x, chunk_y)
+                chunks_prefetched += 1
+                if(chunks_prefetched >= self.prefetch_per_frame): return
+
+# ============================================
+# ==           MAP RENDERER                 ==
+# ============================================
+# Splits a map's tile layers into background planes, which get drawn
+# under the sprites, and foreground planes, which get drawn over them.
+# A layer is foreground if its Tiled layer ID is one of the FOREGROUND_LAYER
+# constants, or if it has a "foreground" property set to true.
+# A layer can also have a "parallax" property (or "parallax_x" and
+# "parallax_y") to scroll slower or faster than the map.
+# Each frame goes: background planes, then sprites, then foreground planes.
+# None of the tiles get drawn again once their chunk is cached.
+
+class Map_Renderer(object):
+    
+    def __init__(self, tmxdata, chunk_tiles = MAP_CHUNK_TILES, memory_budget = MAP_CHUNK_MEMORY_BUDGET):
+        
+        self.tmxdata = tmxdata
+        
+        # Sort the layers into planes, keeping the order they're drawn in.
+        # Next-door layers on the same side of the sprites with the same
+        # parallax share a plane.
+        background_layers = []
+        foreground_layers = []
+        for layer_index, layer in enumerate(tmxdata.layers):
+            if layer.visible and isinstance(layer, pytmx.TiledTileLayer):
+                if(self.is_foreground_layer(layer)):
+                    self.add_to_planes(foreground_layers, layer_index, layer)
+                else:
+                    self.add_to_planes(background_layers, layer_index, layer)
+        
+        # Every plane gets an equal share of the memory budget.
+        plane_budget = memory_budget // max(1, len(background_layers) + len(foreground_layers))
+        
+        # Only the bottom plane can be solid. Everything else has to be see-through.
+        self.background_planes = []
+        for plane_layers, parallax in background_layers:
+            transparent = len(self.background_planes) > 0
+            self.background_planes.append(Map_Plane(tmxdata, plane_layers, transparent, parallax, chunk_tiles, plane_budget))
+        self.foreground_planes = []
+        for plane_layers, parallax in foreground_layers:
+            self.foreground_planes.append(Map_Plane(tmxdata, plane_layers, True, parallax, chunk_tiles, plane_budget))
+        
+        # A view-sized surface we can reuse for drawing the visible part of the map.
+        self.view_canvas = None
+        
+    def is_foreground_layer(self, layer):
+        
+        if layer.properties.get("foreground", False) in (True, "true"):
+            return True
+        return layer.id in (FOREGROUND_LAYER_1, FOREGROUND_LAYER_2)
+    
+    # Read a layer's parallax factors from its Tiled properties. 1 means no parallax.
+    def get_layer_parallax(self, layer):
+        
+        parallax = float(layer.properties.get("parallax", 1))
+        parallax_x = float(layer.properties.get("parallax_x", parallax))
+        parallax_y = float(layer.properties.get("parallax_y", parallax))
+        return (parallax_x, parallax_y)
+    
+    # Put a layer in the top plane of a list of planes, or start a new
+    # plane if it doesn't scroll the same as the top one.
+    def add_to_planes(self, planes, layer_index, layer):
+        
+        parallax = self.get_layer_parallax(layer)
+        if(len(planes) > 0 and planes[-1][1] == parallax):
+            planes[-1][0].append((layer_index, layer))
+        else:
+            planes.append(([(layer_index, layer)], parallax))
+    
+    def get_planes(self):
+        return self.background_planes + self.foreground_planes
+    
+    # Stats, added up across all planes.
+    def get_chunks_drawn(self):
+        return sum(plane.chunks_drawn for plane in self.get_planes())
+    def get_chunk_hits(self):
+        return sum(plane.chunk_hits for plane in self.get_planes())
+    def get_chunks_evicted(self):
+        return sum(plane.chunks_evicted for plane in self.get_planes())
+    
+    # Get the reusable view-sized surface, making a new one only if the size changed.
+    def get_view_canvas(self, size):
+        
+        if self.view_canvas is None or self.view_canvas.get_size() != tuple(size):
+            self.view_canvas = pygame.Surface(size).convert()
+        return self.view_canvas
+    
+    # Draw the background planes for one rectangle of the map onto canvas,
+    # whose top left corner is the top left of view_rect.
+    def draw_background_area(self, canvas, view_rect, map_rect):
+        
+        for plane in self.background_planes:
+            plane.draw_view_area(canvas, view_rect, map_rect)
+    
+    # Same thing, but the foreground planes. Do this after drawing sprites.
+    def draw_foreground_area(self, canvas, view_rect, map_rect):
+        
+        for plane in self.foreground_planes:
+            plane.draw_view_area(canvas, view_rect, map_rect)
+    
+    # Draw the background the camera can see onto the view canvas and return it.
+    # The canvas's top left corner is the top left corner of view_rect.
+    # Sprites go on next, then draw_foreground.
+    def draw_background(self, view_rect):
+        
+        canvas = self.get_view_canvas(view_rect.size)
+        canvas.fill(0)
+        self.draw_background_area(canvas, view_rect, view_rect)
+        for plane in self.get_planes():
+            plane.prefetch(view_rect)
+        return canvas
+    
+    # Draw the foreground the camera can see on top of the canvas.
+    def draw_foreground(self, canvas, view_rect):
+        
+        self.draw_foreground_area(canvas, view_rect, view_rect)
+    
+    # Draw every chunk that covers map_rect into the cache ahead of time,
+    # without drawing anything to the screen.
+    def warm_up(self, map_rect):
+        
+        for step in self.warm_up_steps(map_rect):
+            pass
+    
+    # The same thing one chunk at a time, so it can be spread over several
+    # frames: each next() draws one chunk.
+    def warm_up_steps(self, map_rect):
+        
+        for plane in self.get_planes():
+            plane_rect = plane.get_plane_view_rect(map_rect)
+            for chunk_x, chunk_y in plane.chunks_in_rect(plane_rect):
+                plane.get_chunk(chunk_x, chunk_y)
+                yield True
+    
+    # Draw everything the camera can see, with no sprites. Returns the view canvas.
+    def draw_view(self, view_rect):
+        
+        canvas = self.draw_background(view_rect)
+        self.draw_foreground(canvas, view_rect)
+        return canvas
@@ -37,6 +37,26 @@ import constants
 #More bad practice importing all of constant
 from constants import *
 
+from game_log import log
+
+#Collision grid that physics uses instead of asking pytmx for tile properties.
+from collision import compile_collision_grid
+
+#Map objects sorted by name, and exits sorted into a grid, so we don't have to search for them.
+from object_index import compile_object_index
+from object_index import get_object_index
+
+#Draws maps in chunks, so we never need an image of a whole map.
+from map_renderer import Map_Renderer
+
+#Loads maps that have been compiled ahead of time, which is much faster than parsing the TMX.
+#Otherwise loads the TMX with tilesets from the tileset cache, so they only get parsed once.
+from map_compiler import load_compiled_map
+from map_compiler import load_tmx_map
+
+#Sounds are loaded once and played through the sound manager.
+from sound_manager import sound_manager
+
 # ============================================
 # ==            GLOBAL METHODS              ==
 # ============================================
@@ -45,19 +65,39 @@ from constants import *
 #--------------------------------
 
 def play_sound(sound_to_play):
-    pygame.mixer.Sound.play(sound_to_play)
+    sound_manager.play(sound_to_play)
+
+#Get a sound effect. Everyone asking for the same file shares one Sound,
+#loaded by the sound manager at startup. If the game is running without
+#sound (like in headless mode), returns None instead, which play_sound just skips.
+#--------------------------------
+def load_sound(filename):
+    return sound_manager.get_sound(local_path(filename))
+
+#Paths in the code and map files are written Windows style, with backslashes.
+#Forward slashes work everywhere, so switch to those before opening anything.
+#--------------------------------
+def local_path(path):
+    return path.replace("\\", "/")
     
 #Load a new Tiled Map. Returns the new map.
 #Also tells sprite handler to update sprite information
 #--------------------------------
 def load_new_map(map_name, sprite_handler, entrance_direction):
 
+    #Map - This is loading the Tiled Map Editor map we used.
+    tmxdata, map_renderer = prepare_map(map_name)
+    return enter_prepared_map(tmxdata, sprite_handler, entrance_direction)
+
+#Start playing on a map that's already been loaded (by prepare_map or the
+#map prefetcher). Tells sprite handler to update sprite information, but
+#doesn't parse or draw anything. Returns the map.
+#--------------------------------
+def enter_prepared_map(tmxdata, sprite_handler, entrance_direction):
+
     #Clear sprites
     sprite_handler.prepare_for_new_map()
     
-    #Map - This is loading the Tiled Map Editor map we used.
-    tmxdata = load_pygame(map_name, pixelalpha=True)
-    
     #Adjust sprites for new map
     sprite_handler.spawn_sprites_from_map(tmxdata)
     sprite_handler.player_enters_map(tmxdata, entrance_direction)
@@ -70,9 +110,39 @@ def load_new_map(map_name, sprite_handler, entrance_direction):
 def preview_new_map(map_name):
 
     #Map - This is loading the Tiled Map Editor map we used.
-    tmxdata = load_pygame(map_name, pixelalpha=True)
+    tmxdata = load_map_data(map_name)
+    return tmxdata
+
+#Load a Tiled Map's data. Uses the compiled version of the map if there's
+#an up-to-date one (see map_compiler.py). Otherwise parses the TMX, reusing
+#any tilesets we've already loaded. Anything our loaders can't handle goes to pytmx,
+#unless use_pytmx is False, and then it returns None. pytmx converts its images
+#for the screen, which only the main thread can do.
+#--------------------------------
+def load_map_data(map_name, use_pytmx = True):
+
+    map_name = local_path(map_name)
+    tmxdata = load_compiled_map(map_name)
+    if tmxdata is None:
+        tmxdata = load_tmx_map(map_name)
+    if tmxdata is None and use_pytmx:
+        tmxdata = load_pygame(map_name, pixelalpha=True)
     return tmxdata
 
+#Load a Tiled Map and get it ready to play, without telling the Sprite Handler
+#anything. Builds the collision grid and a map renderer for it.
+#Returns (tmxdata, map_renderer), or None if use_pytmx is False and the map needs it.
+#The map prefetcher's thread calls this with use_pytmx = False; the tile images
+#it gets still need convert_map_images on the main thread before they're drawn.
+#--------------------------------
+def prepare_map(map_name, use_pytmx = True):
+
+    tmxdata = load_map_data(map_name, use_pytmx)
+    if tmxdata is None: return None
+    compile_collision_grid(tmxdata)
+    compile_object_index(tmxdata)
+    return (tmxdata, Map_Renderer(tmxdata))
+
 #Load a new map image based on currently loaded Tiled Map. Returns image.
 #------------------------------
 def load_map_image(tmxdata):
@@ -111,11 +181,11 @@ def get_tile_properties(tmxdata, x_to_check, y_to_check):
     try:
         properties = tmxdata.get_tile_properties(tile_x, tile_y, BLOCK_LAYER)
     except Exception:
-        print("exception thrown; cant find tile data")
+        log.debug("exception thrown; cant find tile data")
         properties = {"solid":True,"platform":False}
     # Also supply defaults if there are no properties at all, for some reason.
     if properties is None:
-        print("exception thrown; no properties found")
+        log.debug("exception thrown; no properties found")
         properties = {"solid":True,"platform":False}
     return properties
 
@@ -124,69 +194,66 @@ def get_tile_properties(tmxdata, x_to_check, y_to_check):
 #-------------------------------
 
 def get_landing_coords(tmxdata, direction):
-     # Look for the screen entrance objects
-        for tile_object in tmxdata.objects:
-            if(tile_object.name == 'entrance' and tile_object.properties["dir"] == direction):
-                return (tile_object.x,tile_object.y)
+     # Look up the screen entrance object
+        tile_object = get_object_index(tmxdata).get_entrance(direction)
+        if tile_object is not None:
+            return (tile_object.x,tile_object.y)
         
         # Default return top left corner if nothing located.
-        print("No entrance location found moving" + direction)
+        log.warning("No entrance location found moving %s", direction)
         return (0,0)
 
-def create_transition_screen(tmxdata1, #The first map, and the camera's loc 
+def create_transition_screen(old_map_screen, #Last frame's map, as drawn on the screen but without the HUD.
                        tmxdata2, #The second map, and where the camera needs to go
                        new_camera_x, new_camera_y, # The coords on the new map where the camera should be
                        direction_to_scroll, #Which way are we scrolling; UP, DOWN, LEFT, or RIGHT.
                        game_camera,#The camera objects
-                       keys): # b'c camera needs this to update
+                       keys, # b'c camera needs this to update
+                       map_renderer2): # Renderer for the new map, usually from the prefetcher
     
-    # Save an image of the existing map.
-    old_map_image = load_map_image(tmxdata1)
-    blit_all_tiles(old_map_image, tmxdata1, (0,0))
-    old_map_width = tmxdata1.width*TILESIZE 
-    old_map_height = tmxdata1.height*TILESIZE
-    old_map_screen = pygame.Surface((SCREEN_W,SCREEN_H))
-    old_map_screen.blit(game_camera.draw(old_map_image),(0,0))
+    # The old map was drawn last frame, so it's already on old_map_screen and we
+    # don't need to draw it again.
     
     # Save an image of the new map at same zoom, focused on the new coordinates passed to this method.
-    new_map_image = load_map_image(tmxdata2)
-    blit_all_tiles(new_map_image, tmxdata2, (0,0))
+    # Only the part the camera can see gets drawn, from chunks the prefetcher has usually drawn already.
     new_map_width = tmxdata2.width*TILESIZE 
     new_map_height = tmxdata2.height*TILESIZE
     game_camera.snap_to_coords(new_camera_x, new_camera_y)
     game_camera.update(new_map_width,new_map_height,keys)
+    view_rect = game_camera.get_view_rect()
+    new_map_image = map_renderer2.draw_view(view_rect)
     new_map_screen = pygame.Surface((SCREEN_W,SCREEN_H))
-    new_map_screen.blit(game_camera.draw(new_map_image),(0,0))
+    new_map_screen.blit(game_camera.draw(new_map_image, view_rect.topleft),(0,0))
      
-    # Create a composite image based on the direction
-    
-    composite_screen = pygame.Surface((SCREEN_W,SCREEN_H))
+    # Create a composite image based on the direction.
+    # Make it the right size to begin with, rather than scaling up an empty screen.
 
     if(direction_to_scroll == LEFT):
-        composite_screen = pygame.transform.smoothscale(composite_screen, (SCREEN_W*2,SCREEN_H))
-        print(composite_screen)
+        composite_screen = pygame.Surface((SCREEN_W*2,SCREEN_H))
+        log.debug("transition screen %s", composite_screen)
         composite_screen.blit(new_map_screen,(0,0))
         composite_screen.blit(old_map_screen,(SCREEN_W,0)) 
     elif(direction_to_scroll == RIGHT):
-        composite_screen = pygame.transform.smoothscale(composite_screen, (SCREEN_W*2,SCREEN_H))
-        print(composite_screen)
+        composite_screen = pygame.Surface((SCREEN_W*2,SCREEN_H))
+        log.debug("transition screen %s", composite_screen)
         composite_screen.blit(old_map_screen,(0,0))
         composite_screen.blit(new_map_screen,(SCREEN_W,0))  
-    elif(direction_to_scroll == UP):
-        composite_screen = pygame.transform.smoothscale(composite_screen, (SCREEN_W,SCREEN_H*2))
-        print(composite_screen)
-        composite_screen.blit(new_map_screen,(0,0))
-        composite_screen.blit(old_map_screen,(0,SCREEN_H)) 
     elif(direction_to_scroll == DOWN):
-        composite_screen = pygame.transform.smoothscale(composite_screen, (SCREEN_W,SCREEN_H*2))
-        print(composite_screen)
+        composite_screen = pygame.Surface((SCREEN_W,SCREEN_H*2))
+        log.debug("transition screen %s", composite_screen)
         composite_screen.blit(old_map_screen,(0,0))
         composite_screen.blit(new_map_screen,(0,SCREEN_H))
+    # UP, which is also what main uses when an exit's direction isn't one it knows.
+    else:
+        composite_screen = pygame.Surface((SCREEN_W,SCREEN_H*2))
+        log.debug("transition screen %s", composite_screen)
+        composite_screen.blit(new_map_screen,(0,0))
+        composite_screen.blit(old_map_screen,(0,SCREEN_H)) 
         
     #return composite_screen
     return composite_screen
 
-def scroll_transition_screen(composite_image, direction_to_scroll, screen, clock):
+def scroll_transition_screen(composite_image, direction_to_scroll, screen, clock, music = None):
 
     scroll_counter = 0
     image_position_x = 0
@@ -238,6 +305,10 @@ def scroll_transition_screen(composite_image, direction_to_scroll, screen, clock
         # Set the game to run at 60fps
         clock.tick(60)
         
+        # Keep the music's crossfade going while the screen scrolls.
+        if(music is not None):
+            music.update()
+        
         scroll_counter = scroll_counter + 40
     
 
@@ -299,7 +370,7 @@ def main_menu(screen, clock, myfont):
 def game_over_menu(screen, clock, myfont):
     
     menu_running = True
-    sound_game_over = pygame.mixer.Sound("game_over_yah.wav")
+    sound_game_over = load_sound("Assets/Sounds/game_over_yah.wav")
     play_sound(sound_game_over)
     
     while menu_running:
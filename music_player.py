@@ -0,0 +1,199 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For finding tracks and reading them ahead on the prefetcher's thread.
+import os
+import io
+import threading
+import collections
+
+#Import global methods.
+import methods
+from methods import local_path
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+# ============================================
+# ==             MUSIC PLAYER               ==
+# ============================================
+# The music used to be a pygame.mixer.Sound, which decodes the whole
+# track into memory before the first frame. pygame.mixer.music streams
+# instead: it decodes a little at a time as the track plays, so starting
+# is quick and only one track is ever in memory.
+#
+# Each map picks its track with its MUSIC_MAP_PROPERTY map property, a
+# file name in MUSIC_FOLDER. Maps without one play MUSIC_DEFAULT_TRACK.
+# When the player changes maps, crossfade_to() fades the old track out and
+# the new one in while the screen scrolls. Call update() every frame to
+# move the fade along. Walking between maps with the same track doesn't
+# touch the music at all.
+#
+# There's only one music stream, so a crossfade is really a fade out and
+# then a fade in. To keep the switch in the middle from hitching, the map
+# prefetcher calls prebuffer() for every map it loads, which reads that
+# map's track file into memory on the prefetcher's thread. Then starting
+# it doesn't have to wait on the disk.
+#
+# Without a mixer (like in headless mode), everything here does nothing.
+
+# The track a map wants, or None if it should be silent.
+def get_map_music(tmxdata):
+
+    track = tmxdata.properties.get(MUSIC_MAP_PROPERTY, MUSIC_DEFAULT_TRACK)
+    if track == "none" or track == "":
+        return None
+    return track
+
+class Music_Player(object):
+
+    def __init__(self, music_folder = MUSIC_FOLDER, volume = MUSIC_VOLUME, prebuffer_budget = MUSIC_PREBUFFER_BUDGET):
+
+        self.music_folder = music_folder
+        self.volume = volume
+        self.prebuffer_budget = prebuffer_budget
+
+        # The track playing now (or that would be, if its file was missing).
+        self.current_track = None
+
+        # The crossfade going on now, if there is one.
+        self.fading = False
+        self.fade_track = None
+        self.fade_start = 0
+        self.fade_length = 0
+        # Whether the fade has got to the middle and started the new track yet.
+        self.fade_switched = False
+
+        # Track files read ahead of time, by track. Oldest first. prebuffer()
+        # runs on the prefetcher's thread, so only touch these while holding the lock.
+        self.prebuffered = collections.OrderedDict()
+        self.prebuffered_bytes = 0
+        self.lock = threading.Lock()
+
+        # Tracks we already warned about, so a missing file only gets logged once.
+        self.missing = set()
+
+    def get_path(self, track):
+
+        return os.path.join(self.music_folder, local_path(track))
+
+    # Read a track's file into memory so it can start without waiting on the disk.
+    # Safe to call from any thread.
+    def prebuffer(self, track):
+
+        if track is None or pygame.mixer.get_init() is None: return
+        with self.lock:
+            if track == self.current_track or track in self.prebuffered: return
+        path = self.get_path(track)
+        try:
+            if os.path.getsize(path) > self.prebuffer_budget: return
+            with open(path, "rb") as track_file:
+                data = track_file.read()
+        except OSError:
+            # play() warns about it if the track is ever needed.
+            return
+
+        with self.lock:
+            self.prebuffered[track] = data
+            self.prebuffered_bytes += len(data)
+            while self.prebuffered_bytes > self.prebuffer_budget:
+                old_track, old_data = self.prebuffered.popitem(last=False)
+                self.prebuffered_bytes -= len(old_data)
+
+    # Load a track into the music stream and start it from the beginning.
+    # Uses the prebuffered copy if there is one. Returns False if it couldn't.
+    def start_track(self, track):
+
+        self.current_track = track
+        if track is None:
+            pygame.mixer.music.stop()
+            return True
+
+        with self.lock:
+            data = self.prebuffered.pop(track, None)
+            if data is not None:
+                self.prebuffered_bytes -= len(data)
+        try:
+            if data is not None:
+                pygame.mixer.music.load(io.BytesIO(data), os.path.splitext(track)[1].lstrip("."))
+            else:
+                pygame.mixer.music.load(self.get_path(track))
+            pygame.mixer.music.play(-1)
+        except (pygame.error, OSError) as error:
+            if track not in self.missing:
+                self.missing.add(track)
+                log.warning("Couldn't play music %s: %s", track, error)
+            pygame.mixer.music.stop()
+            return False
+        return True
+
+    # Play a track right away, unless it's already playing.
+    def play(self, track):
+
+        if pygame.mixer.get_init() is None: return
+        if track == self.current_track and not self.fading: return
+        self.fading = False
+        pygame.mixer.music.set_volume(self.volume)
+        self.start_track(track)
+
+    def stop(self):
+
+        if pygame.mixer.get_init() is None: return
+        if self.current_track is None and not self.fading: return
+        self.fading = False
+        self.current_track = None
+        pygame.mixer.music.stop()
+
+    # Fade from whatever's playing to a new track over fade_length milliseconds.
+    def crossfade_to(self, track, fade_length = MUSIC_CROSSFADE_MS):
+
+        if pygame.mixer.get_init() is None: return
+        if self.fading:
+            if track == self.fade_track: return
+        elif track == self.current_track:
+            return
+
+        self.fading = True
+        self.fade_track = track
+        self.fade_start = pygame.time.get_ticks()
+        self.fade_length = max(fade_length, 1)
+        # Nothing playing? Skip straight to fading in.
+        self.fade_switched = False
+        if self.current_track is None:
+            self.fade_start -= self.fade_length//2
+
+    # Move the crossfade along. Cheap when there isn't one.
+    def update(self):
+
+        if not self.fading: return
+        progress = (pygame.time.get_ticks() - self.fade_start)/self.fade_length
+
+        # First half: fade the old track out.
+        if progress < 0.5:
+            pygame.mixer.music.set_volume(self.volume*(1 - progress*2))
+            return
+
+        # Halfway: start the new track, silent.
+        if not self.fade_switched:
+            self.fade_switched = True
+            pygame.mixer.music.set_volume(0)
+            self.start_track(self.fade_track)
+
+        # Second half: fade it in.
+        if progress >= 1:
+            self.fading = False
+            pygame.mixer.music.set_volume(self.volume)
+        else:
+            pygame.mixer.music.set_volume(self.volume*(progress*2 - 1))
+
+music_player = Music_Player()
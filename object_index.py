@@ -0,0 +1,123 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+from pygame.locals import *
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==            OBJECT INDEX                ==
+# ============================================
+# The Object Layer holds the map's exits, entrances, enemy spawns and
+# so on. Looking for one used to mean going through every object on
+# the map, and the exit check did that (and made new Rects) every
+# frame. Instead, when a map loads we sort its objects once:
+#   - by name and by type,
+#   - entrances by their "dir" property,
+#   - exits into a grid of OBJECT_GRID_CELL_SIZE cells, so finding the
+#     exit the player is touching only looks at the cells the player is in.
+
+class Object_Index(object):
+    
+    def __init__(self, tmxdata):
+        
+        # Every object, by name and by type.
+        self.objects_by_name = {}
+        self.objects_by_type = {}
+        # Entrance objects by their "dir" property ("UP", "DOWN", "LEFT" or "RIGHT").
+        self.entrances = {}
+        
+        # Exits, as (rect, properties). Every exit has a "dest" and a "dir",
+        # even if the map forgot to give it one.
+        self.exits = []
+        # Which exits touch each grid cell, by (cell x, cell y).
+        self.exit_grid = {}
+        
+        for tile_object in tmxdata.objects:
+            self.objects_by_name.setdefault(tile_object.name, []).append(tile_object)
+            self.objects_by_type.setdefault(tile_object.type, []).append(tile_object)
+            
+            if(tile_object.name == "entrance"):
+                direction = tile_object.properties.get("dir")
+                # If there are two entrances for a direction, the first one wins, like it used to.
+                if direction not in self.entrances:
+                    self.entrances[direction] = tile_object
+                    
+            elif(tile_object.name == "exit"):
+                self.add_exit(tile_object)
+    
+    def add_exit(self, tile_object):
+        
+        exit_rect = Rect(tile_object.x, tile_object.y, tile_object.width, tile_object.height)
+        properties = {"dest": "none", "dir": "none"}
+        properties.update(tile_object.properties)
+        exit_number = len(self.exits)
+        self.exits.append((exit_rect, properties))
+        
+        for cell in self.cells_in_rect(exit_rect):
+            self.exit_grid.setdefault(cell, []).append(exit_number)
+    
+    # The grid cells a rectangle covers.
+    def cells_in_rect(self, rect):
+        
+        first_cell_x = rect.left // OBJECT_GRID_CELL_SIZE
+        first_cell_y = rect.top // OBJECT_GRID_CELL_SIZE
+        last_cell_x = (rect.right - 1) // OBJECT_GRID_CELL_SIZE
+        last_cell_y = (rect.bottom - 1) // OBJECT_GRID_CELL_SIZE
+        for cell_y in range(first_cell_y, last_cell_y + 1):
+            for cell_x in range(first_cell_x, last_cell_x + 1):
+                yield (cell_x, cell_y)
+    
+    # All objects with a name. Empty if there aren't any.
+    def get_objects(self, name):
+        
+        return self.objects_by_name.get(name, [])
+    
+    def get_objects_of_type(self, object_type):
+        
+        return self.objects_by_type.get(object_type, [])
+    
+    # The entrance for a direction string, or None if the map doesn't have one.
+    def get_entrance(self, direction):
+        
+        return self.entrances.get(direction)
+    
+    # The properties of the first exit a rectangle touches, or None.
+    def find_exit(self, rect):
+        
+        first_exit = None
+        for cell in self.cells_in_rect(rect):
+            for exit_number in self.exit_grid.get(cell, ()):
+                if (first_exit is None or exit_number < first_exit) and rect.colliderect(self.exits[exit_number][0]):
+                    first_exit = exit_number
+        if first_exit is None:
+            return None
+        return self.exits[first_exit][1]
+
+# ============================================
+# ==         OBJECT INDEX METHODS           ==
+# ============================================
+
+# Build the object index for a map and save it on the map data.
+#--------------------------------
+def compile_object_index(tmxdata):
+    
+    tmxdata.object_index = Object_Index(tmxdata)
+    return tmxdata.object_index
+
+# Get the object index for a map, building it first if the map doesn't have one yet.
+#--------------------------------
+def get_object_index(tmxdata):
+    
+    object_index = getattr(tmxdata, "object_index", None)
+    if object_index is None:
+        object_index = compile_object_index(tmxdata)
+    return object_index
@@ -0,0 +1,315 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+from pygame.locals import *
+
+#NumPy does math on whole arrays of numbers at once, which is
+#much faster than a Python loop. If you don't have numpy, it can be
+#added from within Thonny under Tools->Manage Packages.
+import numpy
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==          PROJECTILE TYPES              ==
+# ============================================
+# Everything about a kind of projectile that doesn't change while it flies.
+# Sprite sheet, size of one frame, how many frames it animates through,
+# how many updates each frame lasts, how many updates it lives, and how much
+# damage it does. Spawned projectiles are centered TILESIZE/2 up and left of
+# where they're spawned.
+
+class Projectile_Type(object):
+    
+    def __init__(self, name, sheet_filename, frame_size, frame_count, animation_speed, lifespan, power):
+        
+        self.name = name
+        self.sheet_filename = sheet_filename
+        self.frame_size = frame_size
+        self.frame_count = frame_count
+        self.animation_speed = animation_speed
+        self.lifespan = lifespan
+        self.power = power
+        
+        # The animation frames, sliced from the sheet the first time one of these gets spawned.
+        self.frames = None
+
+PROJECTILE_TYPES = [
+    Projectile_Type("small_bullet", "Assets\Graphics\Projectiles\small_bullet.png", (TILESIZE*2,TILESIZE*2), 2, 8, 30, 1),
+]
+
+# ============================================
+# ==          PROJECTILE ENGINE             ==
+# ============================================
+# Every bullet used to be its own Sprite, with its own update() running
+# in Python every frame. That's fine for a few bullets, but weapons
+# like the Multi Shot and Loop Shot want thousands.
+#
+# The engine keeps every live projectile in a set of NumPy arrays instead,
+# one array per value ("structure of arrays"): x, y, velocity, lifespan,
+# animation counter and frame, and type. Live projectiles are always packed
+# into the first self.count slots. Each update moves, animates and ages all
+# of them at once, then packs the survivors back to the front. Drawing is
+# one Surface.blits() call for the lot.
+#
+# The arrays double in size whenever they fill up, so after the first big
+# fight spawning a projectile doesn't allocate anything.
+
+class Projectile_Engine(object):
+    
+    def __init__(self, asset_registry, capacity = PROJECTILE_ENGINE_CAPACITY, projectile_types = PROJECTILE_TYPES):
+        
+        # Where to get sprite sheets from.
+        self.asset_registry = asset_registry
+        self.projectile_types = projectile_types
+        # Type numbers by name, for spawning.
+        self.type_numbers = {}
+        for type_number, projectile_type in enumerate(projectile_types):
+            self.type_numbers[projectile_type.name] = type_number
+        
+        # Per-type values as arrays, so they can be looked up for every projectile at once.
+        self.type_width = numpy.array([projectile_type.frame_size[0] for projectile_type in projectile_types], dtype=numpy.int32)
+        self.type_height = numpy.array([projectile_type.frame_size[1] for projectile_type in projectile_types], dtype=numpy.int32)
+        self.type_frame_count = numpy.array([projectile_type.frame_count for projectile_type in projectile_types], dtype=numpy.int32)
+        self.type_animation_speed = numpy.array([projectile_type.animation_speed for projectile_type in projectile_types], dtype=numpy.int32)
+        self.type_power = numpy.array([projectile_type.power for projectile_type in projectile_types], dtype=numpy.int32)
+        
+        # How many projectiles are alive. They're in slots 0 to count-1.
+        self.count = 0
+        self.allocate(capacity)
+        
+        # Stats
+        self.spawned = 0
+        self.most_alive = 0
+    
+    # Make the arrays, keeping any live projectiles.
+    def allocate(self, capacity):
+        
+        old_arrays = None
+        if self.count > 0:
+            old_arrays = (self.x, self.y, self.previous_x, self.previous_y, self.vector_x, self.vector_y,
+                          self.lifespan, self.animation_counter, self.animation_frame, self.projectile_type)
+        
+        self.capacity = capacity
+        # Position of the top left corner, in map pixels. Floats, so slow
+        # projectiles don't get rounded to a stop.
+        self.x = numpy.zeros(capacity, dtype=numpy.float64)
+        self.y = numpy.zeros(capacity, dtype=numpy.float64)
+        # Where they were before the last update, for drawing between updates.
+        self.previous_x = numpy.zeros(capacity, dtype=numpy.float64)
+        self.previous_y = numpy.zeros(capacity, dtype=numpy.float64)
+        self.vector_x = numpy.zeros(capacity, dtype=numpy.float64)
+        self.vector_y = numpy.zeros(capacity, dtype=numpy.float64)
+        self.lifespan = numpy.zeros(capacity, dtype=numpy.int32)
+        self.animation_counter = numpy.zeros(capacity, dtype=numpy.int32)
+        self.animation_frame = numpy.zeros(capacity, dtype=numpy.int32)
+        self.projectile_type = numpy.zeros(capacity, dtype=numpy.int32)
+        
+        if old_arrays is not None:
+            new_arrays = (self.x, self.y, self.previous_x, self.previous_y, self.vector_x, self.vector_y,
+                          self.lifespan, self.animation_counter, self.animation_frame, self.projectile_type)
+            for old_array, new_array in zip(old_arrays, new_arrays):
+                new_array[:self.count] = old_array[:self.count]
+    
+    # Get a projectile type's frames ready to draw. Sheets come from the asset registry.
+    def load_frames(self, projectile_type):
+        
+        if projectile_type.frames is None:
+            sprite_sheet = self.asset_registry.get_sheet(projectile_type.sheet_filename)
+            width, height = projectile_type.frame_size
+            projectile_type.frames = [sprite_sheet.frame_at((frame*width,0,width,height))
+                                      for frame in range(projectile_type.frame_count)]
+    
+    # Spawn one projectile of a type, by name, centered on (x, y) the same way
+    # the old sprites were, moving by vector every update.
+    def spawn(self, type_name, x, y, vector):
+        
+        self.spawn_many(type_name, [x], [y], [vector[0]], [vector[1]])
+    
+    # Spawn a whole volley at once. xs, ys, vector_xs and vector_ys are lists
+    # (or arrays) of the same length.
+    def spawn_many(self, type_name, xs, ys, vector_xs, vector_ys):
+        
+        type_number = self.type_numbers[type_name]
+        projectile_type = self.projectile_types[type_number]
+        self.load_frames(projectile_type)
+        
+        new_count = len(xs)
+        if self.count + new_count > self.capacity:
+            capacity = self.capacity
+            while self.count + new_count > capacity: capacity *= 2
+            self.allocate(capacity)
+        
+        start = self.count
+        end = start + new_count
+        self.x[start:end] = xs
+        self.x[start:end] -= TILESIZE/2
+        self.y[start:end] = ys
+        self.y[start:end] -= TILESIZE/2
+        self.previous_x[start:end] = self.x[start:end]
+        self.previous_y[start:end] = self.y[start:end]
+        self.vector_x[start:end] = vector_xs
+        self.vector_y[start:end] = vector_ys
+        self.lifespan[start:end] = projectile_type.lifespan
+        self.animation_counter[start:end] = 0
+        self.animation_frame[start:end] = 0
+        self.projectile_type[start:end] = type_number
+        
+        self.count = end
+        self.spawned += new_count
+        self.most_alive = max(self.most_alive, self.count)
+    
+    # Move, animate and age every projectile, then get rid of dead ones.
+    def update(self):
+        
+        count = self.count
+        if count == 0: return
+        live_types = self.projectile_type[:count]
+        
+        # Update position based on vector
+        self.previous_x[:count] = self.x[:count]
+        self.previous_y[:count] = self.y[:count]
+        self.x[:count] += self.vector_x[:count]
+        self.y[:count] += self.vector_y[:count]
+        
+        # Animation works the same as the old sprites: the counter counts up to
+        # the animation speed, then moves on a frame. The frame goes back to the
+        # start whenever the counter is past the number of frames.
+        counter = self.animation_counter[:count]
+        frame = self.animation_frame[:count]
+        counter += 1
+        next_frame = counter > self.type_animation_speed[live_types]
+        counter[next_frame] = 0
+        frame[next_frame] += 1
+        frame[counter > self.type_frame_count[live_types]] = 0
+        frame %= self.type_frame_count[live_types]
+        
+        # Decrement lifespan, and eliminate once dead
+        self.lifespan[:count] -= 1
+        self.remove_dead()
+    
+    # Pack the live projectiles back into the front of the arrays.
+    def remove_dead(self):
+        
+        alive = numpy.flatnonzero(self.lifespan[:self.count] > 0)
+        if len(alive) == self.count: return
+        for values in (self.x, self.y, self.previous_x, self.previous_y, self.vector_x, self.vector_y,
+                       self.lifespan, self.animation_counter, self.animation_frame, self.projectile_type):
+            values[:len(alive)] = values[alive]
+        self.count = len(alive)
+    
+    # Kill projectiles by slot number. They're removed at the next update.
+    def kill(self, slots):
+        
+        self.lifespan[slots] = 0
+    
+    def clear(self):
+        
+        self.count = 0
+    
+    # Slot numbers of every live projectile touching a rect, lowest first.
+    # If slots is given (in order), only those projectiles get checked.
+    def collide_rect(self, rect, slots = None):
+        
+        count = self.count
+        if count == 0: return numpy.zeros(0, dtype=numpy.intp)
+        if slots is None:
+            slots = numpy.arange(count)
+        left = self.x[slots]
+        top = self.y[slots]
+        live_types = self.projectile_type[slots]
+        touching = ((left < rect.right) & (left + self.type_width[live_types] > rect.left) &
+                    (top < rect.bottom) & (top + self.type_height[live_types] > rect.top) &
+                    (self.lifespan[slots] > 0))
+        return slots[touching]
+    
+    # Which live projectiles are in each square cell of a spatial hash, as
+    # {(cell x, cell y): slot numbers, lowest first}. A projectile is in every
+    # cell it overlaps. Every projectile gets binned at once; only the cells
+    # that have something in them cost a Python loop.
+    def get_cell_slots(self, cell_size):
+        
+        count = self.count
+        if count == 0: return {}
+        live_types = self.projectile_type[:count]
+        first_x = numpy.floor(self.x[:count]).astype(numpy.int64) // cell_size
+        first_y = numpy.floor(self.y[:count]).astype(numpy.int64) // cell_size
+        last_x = (numpy.ceil(self.x[:count] + self.type_width[live_types]).astype(numpy.int64) - 1) // cell_size
+        last_y = (numpy.ceil(self.y[:count] + self.type_height[live_types]).astype(numpy.int64) - 1) // cell_size
+        alive = self.lifespan[:count] > 0
+        all_slots = numpy.arange(count)
+        
+        # One (cell, slot) entry for each cell each projectile covers.
+        cells_x = []
+        cells_y = []
+        slots = []
+        for offset_y in range(int((last_y - first_y).max()) + 1):
+            for offset_x in range(int((last_x - first_x).max()) + 1):
+                inside = alive & (first_x + offset_x <= last_x) & (first_y + offset_y <= last_y)
+                cells_x.append(first_x[inside] + offset_x)
+                cells_y.append(first_y[inside] + offset_y)
+                slots.append(all_slots[inside])
+        cells_x = numpy.concatenate(cells_x)
+        cells_y = numpy.concatenate(cells_y)
+        slots = numpy.concatenate(slots)
+        if len(slots) == 0: return {}
+        
+        # Sort by cell, then cut the slots up wherever the cell changes.
+        order = numpy.lexsort((slots, cells_y, cells_x))
+        cells_x = cells_x[order]
+        cells_y = cells_y[order]
+        slots = slots[order]
+        breaks = numpy.flatnonzero((cells_x[1:] != cells_x[:-1]) | (cells_y[1:] != cells_y[:-1])) + 1
+        starts = numpy.concatenate(([0], breaks))
+        cell_slots = {}
+        for cell_x, cell_y, cell_slot_numbers in zip(cells_x[starts].tolist(), cells_y[starts].tolist(), numpy.split(slots, breaks)):
+            cell_slots[(cell_x, cell_y)] = cell_slot_numbers
+        return cell_slots
+    
+    # How much damage the projectile in a slot does.
+    def get_power(self, slot):
+        
+        return int(self.type_power[self.projectile_type[slot]])
+    
+    # Where to draw every projectile, as lists of whole pixels. interpolation
+    # goes from 0 (where they were before the last update) to 1 (where they are now).
+    def get_draw_positions(self, interpolation = 1.0, offset=(0,0)):
+        
+        count = self.count
+        xs = self.x[:count]
+        ys = self.y[:count]
+        if interpolation < 1.0:
+            xs = self.previous_x[:count] + (xs - self.previous_x[:count])*interpolation
+            ys = self.previous_y[:count] + (ys - self.previous_y[:count])*interpolation
+        xs = (numpy.floor(xs).astype(numpy.int32) + offset[0]).tolist()
+        ys = (numpy.floor(ys).astype(numpy.int32) + offset[1]).tolist()
+        return xs, ys
+    
+    # Draw every projectile onto map_image with one blits() call. If map_image
+    # is only part of the map, offset is added to every position to line them up.
+    def draw(self, map_image, offset=(0,0), interpolation = 1.0):
+        
+        count = self.count
+        if count == 0: return
+        xs, ys = self.get_draw_positions(interpolation, offset)
+        types = self.projectile_type[:count].tolist()
+        frames = self.animation_frame[:count].tolist()
+        projectile_types = self.projectile_types
+        map_image.blits([(projectile_types[types[i]].frames[frames[i]], (xs[i], ys[i])) for i in range(count)], False)
+    
+    # The rectangles on the map that draw() is going to draw over.
+    def get_draw_rects(self, interpolation = 1.0):
+        
+        count = self.count
+        xs, ys = self.get_draw_positions(interpolation)
+        widths = self.type_width[self.projectile_type[:count]].tolist()
+        heights = self.type_height[self.projectile_type[:count]].tolist()
+        return [Rect(xs[i], ys[i], widths[i], heights[i]) for i in range(count)]
@@ -0,0 +1,154 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For finding the sound files and keeping track of what's playing.
+import os
+import collections
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+# ============================================
+# ==            SOUND MANAGER               ==
+# ============================================
+# Every Player used to load its own copy of every sound, and Sound.play()
+# just grabbed whatever mixer channel was free. Fire fast enough and every
+# channel is a pellet, with nothing left for jumping.
+#
+# The sound manager loads every sound in SOUND_FOLDER once, at startup,
+# and hands out the same Sound objects to everyone. Each kind of sound
+# (SOUND_CATEGORIES) gets its own group of reserved mixer channels
+# (SOUND_CHANNEL_GROUPS), so one kind can't crowd out the others. No more
+# than SOUND_VOICE_LIMIT copies of one sound play at once; past that, or
+# when a group has no free channel, the copy that started longest ago gets
+# cut off and its channel reused. So the mixer never has more than a fixed
+# number of sounds going, however much gets spammed.
+#
+# Without a mixer (like in headless mode), nothing loads and get_sound
+# gives back None.
+
+class Sound_Manager(object):
+
+    def __init__(self, sound_folder = SOUND_FOLDER, channel_groups = SOUND_CHANNEL_GROUPS, voice_limit = SOUND_VOICE_LIMIT):
+
+        self.sound_folder = sound_folder
+        self.channel_group_sizes = channel_groups
+        self.voice_limit = voice_limit
+
+        # Sounds by file name, like "Jump.wav".
+        self.sounds = {}
+        # Which channel group each sound plays in, by sound.
+        self.sound_categories = {}
+        # The reserved channels for each category.
+        self.channel_groups = {}
+        # The channels each sound is playing on, oldest first, by sound.
+        self.voices = {}
+        # When each channel last started a sound, so we know which is oldest.
+        self.channel_started = {}
+
+        self.started = False
+
+        # Stats
+        self.plays = 0
+        self.steals = 0
+
+    # Set up the channel groups and load every sound. Call once the mixer is
+    # running and before the game loop starts. Returns False if there's no mixer.
+    def start(self):
+
+        if self.started: return True
+        if pygame.mixer.get_init() is None: return False
+
+        # Reserved channels are never picked by a plain Sound.play(), so anything
+        # else that plays sounds gets the SOUND_SPARE_CHANNELS after them.
+        reserved_count = sum(self.channel_group_sizes.values())
+        pygame.mixer.set_num_channels(reserved_count + SOUND_SPARE_CHANNELS)
+        pygame.mixer.set_reserved(reserved_count)
+        next_channel = 0
+        for category, channel_count in self.channel_group_sizes.items():
+            self.channel_groups[category] = [pygame.mixer.Channel(channel_id) for channel_id in range(next_channel, next_channel + channel_count)]
+            next_channel += channel_count
+
+        self.started = True
+        if os.path.isdir(self.sound_folder):
+            for filename in sorted(os.listdir(self.sound_folder)):
+                if os.path.splitext(filename)[1].lower() in (".wav", ".ogg"):
+                    self.load_sound(os.path.join(self.sound_folder, filename))
+        log.info("Loaded %d sounds", len(self.sounds))
+        return True
+
+    def load_sound(self, path):
+
+        name = os.path.basename(path)
+        try:
+            sound = pygame.mixer.Sound(path)
+        except (pygame.error, FileNotFoundError) as error:
+            log.warning("Couldn't load sound %s: %s", path, error)
+            return None
+        self.sounds[name] = sound
+        self.sound_categories[sound] = SOUND_CATEGORIES.get(name, "effects")
+        self.voices[sound] = collections.deque()
+        return sound
+
+    # The shared Sound for a file, or None without a mixer. Sounds outside
+    # SOUND_FOLDER get loaded the first time they're asked for.
+    def get_sound(self, path):
+
+        if not self.start(): return None
+        sound = self.sounds.get(os.path.basename(path))
+        if sound is None:
+            sound = self.load_sound(path)
+        return sound
+
+    # A channel in a group to play on: a free one if there is one,
+    # otherwise whichever started its sound longest ago.
+    def get_channel(self, category):
+
+        channels = self.channel_groups.get(category)
+        if channels is None: channels = self.channel_groups["effects"]
+        oldest_channel = channels[0]
+        for channel in channels:
+            if not channel.get_busy(): return channel
+            if self.channel_started.get(channel, 0) < self.channel_started.get(oldest_channel, 0):
+                oldest_channel = channel
+        self.steals += 1
+        return oldest_channel
+
+    def play(self, sound):
+
+        if sound is None or not self.started: return None
+        self.plays += 1
+
+        # Forget copies that have finished, or whose channel went to another sound.
+        voices = self.voices[sound]
+        for voice in list(voices):
+            if not voice.get_busy() or voice.get_sound() is not sound:
+                voices.remove(voice)
+
+        if len(voices) >= self.voice_limit:
+            channel = voices.popleft()
+            self.steals += 1
+        else:
+            channel = self.get_channel(self.sound_categories[sound])
+
+        channel.play(sound)
+        voices.append(channel)
+        self.channel_started[channel] = self.plays
+        return channel
+
+    # How many sounds are playing right now.
+    def get_playing_count(self):
+
+        return sum(channel.get_busy() for channels in self.channel_groups.values() for channel in channels)
+
+sound_manager = Sound_Manager()
@@ -0,0 +1,203 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+from pygame.locals import *
+
+#Projectile slots come and go as NumPy arrays.
+import numpy
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+# ============================================
+# ==             SPATIAL HASH               ==
+# ============================================
+# Checking every sprite in one group against every sprite in another
+# gets slow fast: 200 bullets and 200 enemies is 40,000 checks a frame.
+# A spatial hash splits the map into square cells (SPATIAL_HASH_CELL_SIZE
+# on a side) and remembers which sprites are in each cell, for each group.
+# To find what a sprite might be touching, we only look at the sprites
+# in the same cells as it. That's the "broadphase". The sprites it finds
+# then get a proper check (the "narrowphase"), which is a rect check
+# unless you ask for something else, like pygame.sprite.collide_mask.
+#
+# Sprites move every frame, so the Sprite Handler rebuilds the hash once
+# per frame after everything has moved.
+#
+# Player bullets aren't sprites; they live in a Projectile_Engine's arrays.
+# add_projectiles puts them in by slot number instead, binned into cells
+# all at once with NumPy. query_projectiles finds the ones touching a
+# rect, and query_pairs works with projectile groups too (always with a
+# rect check, since there's no sprite to give a narrowphase).
+
+class Spatial_Hash(object):
+    
+    def __init__(self, cell_size = SPATIAL_HASH_CELL_SIZE):
+        
+        self.cell_size = cell_size
+        # For each group name, a dictionary of cell -> sprites in that cell.
+        self.groups = {}
+        # For each projectile group name, (projectile engine, dictionary of
+        # cell -> slot numbers in that cell).
+        self.projectile_groups = {}
+        
+        # Stats
+        self.broadphase_checks = 0 # Sprites the cells turned up
+        self.narrowphase_hits = 0 # Of those, how many were actually touching
+    
+    # Throw everything away and put these groups in instead.
+    # groups is a dictionary of group name -> sprites.
+    def rebuild(self, groups):
+        
+        self.groups = {}
+        self.projectile_groups = {}
+        for group_name, sprites in groups.items():
+            self.add_group(group_name, sprites)
+    
+    # Put a group's sprites in the hash, replacing whatever was there for that group.
+    def add_group(self, group_name, sprites):
+        
+        cells = {}
+        for sprite in sprites:
+            for cell in self.cells_in_rect(sprite.rect):
+                cell_sprites = cells.get(cell)
+                if cell_sprites is None:
+                    cells[cell] = [sprite]
+                else:
+                    cell_sprites.append(sprite)
+        self.groups[group_name] = cells
+    
+    # Put a projectile engine's live projectiles in the hash, by slot number.
+    def add_projectiles(self, group_name, projectile_engine):
+        
+        self.projectile_groups[group_name] = (projectile_engine, projectile_engine.get_cell_slots(self.cell_size))
+    
+    # The cells a rectangle covers.
+    def cells_in_rect(self, rect):
+        
+        first_cell_x = rect.left // self.cell_size
+        first_cell_y = rect.top // self.cell_size
+        last_cell_x = (rect.right - 1) // self.cell_size
+        last_cell_y = (rect.bottom - 1) // self.cell_size
+        for cell_y in range(first_cell_y, last_cell_y + 1):
+            for cell_x in range(first_cell_x, last_cell_x + 1):
+                yield (cell_x, cell_y)
+    
+    # Every sprite in a group that touches a sprite (or anything with a rect).
+    # narrowphase is a function like pygame's collide functions; by default
+    # it's a plain rect check.
+    def query(self, sprite, group_name, narrowphase = None):
+        
+        hits = []
+        cells = self.groups.get(group_name)
+        if not cells: return hits
+        
+        seen = set()
+        for cell in self.cells_in_rect(sprite.rect):
+            for other_sprite in cells.get(cell, ()):
+                if other_sprite in seen or other_sprite is sprite: continue
+                seen.add(other_sprite)
+                self.broadphase_checks += 1
+                if self.sprites_touch(sprite, other_sprite, narrowphase):
+                    hits.append(other_sprite)
+        self.narrowphase_hits += len(hits)
+        return hits
+    
+    # Every sprite in a group that touches a rectangle.
+    def query_rect(self, rect, group_name):
+        
+        hits = []
+        cells = self.groups.get(group_name)
+        if not cells: return hits
+        
+        seen = set()
+        for cell in self.cells_in_rect(rect):
+            for other_sprite in cells.get(cell, ()):
+                if other_sprite in seen: continue
+                seen.add(other_sprite)
+                self.broadphase_checks += 1
+                if rect.colliderect(other_sprite.rect):
+                    hits.append(other_sprite)
+        self.narrowphase_hits += len(hits)
+        return hits
+    
+    # Slot numbers of every projectile in a projectile group that touches a
+    # rectangle, lowest first.
+    def query_projectiles(self, rect, group_name):
+        
+        group = self.projectile_groups.get(group_name)
+        if group is None: return numpy.zeros(0, dtype=numpy.intp)
+        projectile_engine, cells = group
+        
+        found = [cells[cell] for cell in self.cells_in_rect(rect) if cell in cells]
+        if len(found) == 0: return numpy.zeros(0, dtype=numpy.intp)
+        # A projectile in several cells turns up several times, so only check it once.
+        slots = found[0]
+        if len(found) > 1: slots = numpy.unique(numpy.concatenate(found))
+        self.broadphase_checks += len(slots)
+        hits = projectile_engine.collide_rect(rect, slots)
+        self.narrowphase_hits += len(hits)
+        return hits
+    
+    # Every sprite in a group that shares a cell with a projectile from a
+    # projectile group. These are the only sprites that can be touching one.
+    def sprites_near_projectiles(self, projectile_group_name, group_name):
+        
+        sprites = []
+        group = self.projectile_groups.get(projectile_group_name)
+        cells = self.groups.get(group_name)
+        if group is None or not cells: return sprites
+        
+        seen = set()
+        for cell in group[1]:
+            for sprite in cells.get(cell, ()):
+                if sprite in seen: continue
+                seen.add(sprite)
+                sprites.append(sprite)
+        return sprites
+    
+    # Every (sprite from group a, sprite from group b) pair that's touching.
+    # Projectiles from a projectile group show up as slot numbers.
+    def query_pairs(self, group_name_a, group_name_b, narrowphase = None):
+        
+        if group_name_a in self.projectile_groups:
+            return [(slot, sprite) for sprite, slot in self.query_projectile_pairs(group_name_a, group_name_b)]
+        if group_name_b in self.projectile_groups:
+            return self.query_projectile_pairs(group_name_b, group_name_a)
+        
+        pairs = []
+        cells_a = self.groups.get(group_name_a)
+        if not cells_a or not self.groups.get(group_name_b): return pairs
+        
+        # A sprite in several cells turns up several times, so only check it once.
+        checked = set()
+        for sprites_a in cells_a.values():
+            for sprite_a in sprites_a:
+                if sprite_a in checked: continue
+                checked.add(sprite_a)
+                for sprite_b in self.query(sprite_a, group_name_b, narrowphase):
+                    pairs.append((sprite_a, sprite_b))
+        return pairs
+    
+    # Every (sprite, projectile slot) pair that's touching, between a sprite
+    # group and a projectile group.
+    def query_projectile_pairs(self, projectile_group_name, group_name):
+        
+        pairs = []
+        for sprite in self.sprites_near_projectiles(projectile_group_name, group_name):
+            for slot in self.query_projectiles(sprite.rect, projectile_group_name).tolist():
+                pairs.append((sprite, slot))
+        return pairs
+    
+    def sprites_touch(self, sprite_a, sprite_b, narrowphase):
+        
+        if narrowphase is None:
+            return sprite_a.rect.colliderect(sprite_b.rect)
+        return narrowphase(sprite_a, sprite_b)
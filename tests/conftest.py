@@ -0,0 +1,44 @@
+# ======================================
+# ==          TEST SETUP              ==
+# ======================================
+# Runs the tests headless, the same way headless.py runs the game: no
+# window and no sound card. Run them from the game's folder with
+#
+#   python -m pytest -q
+
+#SDL reads these when pygame starts up, so they have to be set before
+#anything starts pygame.
+import os
+import sys
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+#The game loads everything by paths from its own folder.
+GAME_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, GAME_FOLDER)
+os.chdir(GAME_FOLDER)
+
+import shutil
+import pytest
+
+from headless import start_headless_pygame
+
+# Sprite sheets and tiles can only be converted once there's a "screen".
+# Tilesets don't get saved next to the game's maps while testing.
+@pytest.fixture(scope="session", autouse=True)
+def headless_pygame():
+
+    start_headless_pygame()
+    from tileset_cache import tileset_cache
+    tileset_cache.persist = False
+
+# A copy of the maps (and the tileset image they use) in a temporary
+# folder, so compiling maps and saving tilesets doesn't touch the game's.
+# Returns the path of the starting map in the copy.
+@pytest.fixture
+def map_copy(tmp_path):
+
+    from constants import STARTING_MAP
+    shutil.copytree("Maps", tmp_path / "Maps", ignore=shutil.ignore_patterns("*.tilecache", "*.mapc"))
+    shutil.copytree(os.path.join("Assets", "Graphics", "Tilesets"), tmp_path / "Assets" / "Graphics" / "Tilesets")
+    return str(tmp_path / STARTING_MAP)
@@ -0,0 +1,116 @@
+# ============================================
+# ==           COLLISION TESTS              ==
+# ============================================
+# sweep_hitbox against small hand-drawn grids. In the pictures, "." is
+# empty, "#" is solid, "=" is a platform and "^" is small spikes.
+
+from constants import *
+from collision import Collision_Grid
+from collision import Hitbox
+from collision import sweep_hitbox
+
+GRID_FLAGS = {".": 0, "#": TILE_SOLID, "=": TILE_PLATFORM, "^": TILE_SOLID | TILE_SPIKE_SMALL}
+
+# Build a collision grid straight from a picture, without a map.
+def make_grid(rows):
+
+    grid = Collision_Grid.__new__(Collision_Grid)
+    grid.width = len(rows[0])
+    grid.height = len(rows)
+    grid.cells = bytearray(GRID_FLAGS[tile] for row in rows for tile in row)
+    return grid
+
+# A one-tile body with its hitbox filling its rect.
+def make_hitbox():
+
+    return Hitbox(0, 0, TILESIZE, TILESIZE)
+
+def test_free_movement_is_rounded_like_a_rect():
+
+    grid = make_grid(["....",
+                      "....",
+                      "...."])
+    result = sweep_hitbox(grid, make_hitbox(), 0, 0, [2.5, 1.4])
+    assert (result.x, result.y) == (3, 1)
+    assert not (result.blocked_x or result.blocked_y or result.on_ground)
+
+def test_wall_stops_at_its_edge():
+
+    grid = make_grid(["..#.",
+                      "...."])
+    result = sweep_hitbox(grid, make_hitbox(), 10, 0, [40, 0])
+    assert result.x == TILESIZE
+    assert result.blocked_x
+
+    result = sweep_hitbox(grid, make_hitbox(), TILESIZE*3, 0, [-40, 0])
+    assert result.x == TILESIZE*3
+    assert result.blocked_x
+
+# Fast bodies check every tile they cross, so they can't skip a thin wall.
+def test_fast_body_cannot_tunnel_through_a_wall():
+
+    grid = make_grid([".....#......."])
+    result = sweep_hitbox(grid, make_hitbox(), 0, 0, [TILESIZE*10, 0])
+    assert result.x == TILESIZE*4
+    assert result.blocked_x
+
+def test_landing_reports_the_ground_flags():
+
+    grid = make_grid(["....",
+                      "....",
+                      ".^^."])
+    result = sweep_hitbox(grid, make_hitbox(), TILESIZE, 5, [0, TILESIZE*3])
+    assert result.y == TILESIZE
+    assert result.blocked_y and result.on_ground
+    assert result.ground_tile_flags == TILE_SOLID | TILE_SPIKE_SMALL
+
+def test_platforms_only_count_from_above():
+
+    grid = make_grid(["....",
+                      "....",
+                      ".==.",
+                      "...."])
+    # Jumping up through it.
+    result = sweep_hitbox(grid, make_hitbox(), TILESIZE, TILESIZE*3, [0, -TILESIZE*3])
+    assert result.y == 0
+    assert not result.blocked_y
+    # Falling onto it.
+    result = sweep_hitbox(grid, make_hitbox(), TILESIZE, 0, [0, TILESIZE*3])
+    assert result.y == TILESIZE
+    assert result.on_ground
+    assert result.ground_tile_flags == TILE_PLATFORM
+
+def test_ceiling_stops_a_jump():
+
+    grid = make_grid(["####",
+                      "....",
+                      "...."])
+    result = sweep_hitbox(grid, make_hitbox(), 0, TILESIZE*2, [0, -50])
+    assert result.y == TILESIZE
+    assert result.blocked_y
+    assert not result.on_ground
+
+# Standing still with feet on a tile row still counts as on the ground,
+# but only landing reports the tiles, so resting on spikes doesn't hurt.
+def test_standing_still_on_the_ground():
+
+    grid = make_grid(["....",
+                      "^^^^"])
+    result = sweep_hitbox(grid, make_hitbox(), 0, 0, [0, 0])
+    assert result.on_ground
+    assert result.ground_tile_flags == 0
+
+def test_off_the_map_is_solid():
+
+    grid = make_grid(["...."])
+    result = sweep_hitbox(grid, make_hitbox(), 0, 0, [-20, 0])
+    assert result.x == 0
+    assert result.blocked_x
+
+# The hitbox, not the rect, is what bumps into things.
+def test_hitbox_offset():
+
+    grid = make_grid(["...#"])
+    hitbox = Hitbox(8, 0, 16, TILESIZE)
+    result = sweep_hitbox(grid, hitbox, 0, 0, [100, 0])
+    assert result.x + hitbox.offset_x + hitbox.width == TILESIZE*3
@@ -0,0 +1,35 @@
+# ============================================
+# ==            GAME LOG TESTS              ==
+# ============================================
+
+import logging
+
+from game_log import Rate_Limit_Filter
+
+# A log message from one line of code, at a given time.
+def make_record(created, lineno = 10, message = "enemy %s spawned", args = ("grunt",)):
+
+    record = logging.LogRecord("game", logging.INFO, "game_objects.py", lineno, message, args, None)
+    record.created = created
+    return record
+
+def test_limit_is_per_second():
+
+    rate_filter = Rate_Limit_Filter(rate_limit = 3)
+    passed = [rate_filter.filter(make_record(100.0 + index/10)) for index in range(5)]
+    assert passed == [True, True, True, False, False]
+
+    # Next second, the next message gets through and says what was dropped.
+    record = make_record(101.0)
+    assert rate_filter.filter(record)
+    assert record.getMessage() == "enemy grunt spawned (2 more like this dropped)"
+    record = make_record(101.1)
+    assert rate_filter.filter(record)
+    assert record.getMessage() == "enemy grunt spawned"
+
+def test_each_line_has_its_own_limit():
+
+    rate_filter = Rate_Limit_Filter(rate_limit = 1)
+    assert rate_filter.filter(make_record(100.0, lineno = 10))
+    assert not rate_filter.filter(make_record(100.0, lineno = 10))
+    assert rate_filter.filter(make_record(100.0, lineno = 20))
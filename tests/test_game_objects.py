@@ -0,0 +1,102 @@
+# ============================================
+# ==          GAME OBJECT TESTS             ==
+# ============================================
+
+import pytest
+
+from constants import *
+import game_objects
+from game_objects import Sprite_Pool
+from game_objects import Effect
+from game_objects import Asset_Registry
+
+# ------------------------------------
+# Sprite pools
+# ------------------------------------
+
+def make_pool(preallocate = 0):
+
+    return Sprite_Pool(Effect, "pellet_burst", preallocate, 0, 0, RIGHT)
+
+def test_preallocated_sprites_get_reused():
+
+    pool = make_pool(2)
+    assert (pool.created, pool.in_use, len(pool.free_list)) == (2, 0, 2)
+
+    first = pool.acquire(10, 20, LEFT)
+    second = pool.acquire(30, 40, LEFT)
+    third = pool.acquire(50, 60, LEFT)
+    assert (pool.created, pool.reused, pool.in_use, pool.high_water_mark) == (3, 2, 3, 3)
+    assert len(pool.free_list) == 0
+    assert not (first.in_pool or second.in_pool or third.in_pool)
+    assert third.pool is pool
+
+def test_killed_sprites_go_back_on_the_free_list():
+
+    pool = make_pool()
+    effect = pool.acquire(10, 20, LEFT)
+    effect.kill()
+    assert (pool.in_use, len(pool.free_list)) == (0, 1)
+    assert effect.in_pool
+
+    # The same sprite comes back out, reset.
+    again = pool.acquire(30, 40, RIGHT)
+    assert again is effect
+    assert (pool.created, pool.reused, pool.in_use, pool.high_water_mark) == (1, 1, 1, 1)
+    assert not again.in_pool
+
+def test_killing_twice_is_harmless():
+
+    pool = make_pool()
+    effect = pool.acquire(10, 20, LEFT)
+    effect.kill()
+    effect.kill()
+    assert (pool.in_use, len(pool.free_list)) == (0, 1)
+    # Two owners must never get the same sprite.
+    assert pool.acquire(0, 0, LEFT) is not pool.acquire(0, 0, LEFT)
+
+def test_releasing_twice_is_caught():
+
+    pool = make_pool()
+    effect = pool.acquire(10, 20, LEFT)
+    pool.release(effect)
+    with pytest.raises(AssertionError):
+        pool.release(effect)
+
+# A sprite without a pool gives its sheet back once, however often it's killed.
+def test_unpooled_sprite_releases_its_sheet_once():
+
+    registry = game_objects.asset_registry
+    effect = Effect("pellet_burst", 0, 0, RIGHT)
+    filename = effect.my_sprite_sheet.filename
+    users = registry.users[filename]
+    effect.kill()
+    effect.kill()
+    assert registry.users[filename] == users - 1
+
+# ------------------------------------
+# Asset registry
+# ------------------------------------
+
+# The running total always matches the sheets, however they got their bytes.
+def test_registry_total_matches_its_sheets():
+
+    registry = Asset_Registry()
+    sheet = registry.get_sheet("Assets/Graphics/Effects/pellet_burst.png")
+    sheet.cache_strip((0, 0, TILESIZE*2, TILESIZE*2), 4)
+    registry.get_sheet("Assets/Graphics/Projectiles/small_bullet.png")
+    assert registry.memory_used() == sum(sheet.memory_used() for sheet in registry.sheets.values())
+    assert registry.memory_used() > 0
+
+def test_registry_evicts_idle_sheets_over_the_cap():
+
+    # Sheets from the atlas only count their frames, so cut one out of each.
+    registry = Asset_Registry(memory_cap = 0)
+    registry.get_sheet("Assets/Graphics/Effects/pellet_burst.png").frame_at((0, 0, TILESIZE*2, TILESIZE*2))
+    registry.get_sheet("Assets/Graphics/Projectiles/small_bullet.png").frame_at((0, 0, TILESIZE*2, TILESIZE*2))
+    # Sheets that are being used stay, even over the cap.
+    assert len(registry.sheets) == 2
+    registry.release_sheet("Assets/Graphics/Effects/pellet_burst.png")
+    assert list(registry.sheets) == ["Assets/Graphics/Projectiles/small_bullet.png"]
+    assert registry.evictions == 1
+    assert registry.memory_used() == registry.sheets["Assets/Graphics/Projectiles/small_bullet.png"].memory_used()
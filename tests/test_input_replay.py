@@ -0,0 +1,90 @@
+# ============================================
+# ==          INPUT REPLAY TESTS            ==
+# ============================================
+
+from constants import *
+import input_replay
+from input_replay import Input_Recorder
+from input_replay import load_replay
+from input_replay import pack_keys
+from input_replay import unpack_keys
+from input_replay import get_state_checksum
+from input_replay import REPLAY_KEY_COUNT
+
+from headless import Headless_Game
+from headless import Random_Input
+from headless import run_replay
+
+def test_keys_pack_and_unpack():
+
+    for key_bits in range(2**REPLAY_KEY_COUNT):
+        assert pack_keys(unpack_keys(key_bits)) == key_bits
+
+# Held keys are saved as runs, and come back out the same update for update.
+def test_runs_round_trip(tmp_path):
+
+    keys_by_frame = Random_Input(seed=3, change_chance=0.2)
+    recorded = [list(keys_by_frame(frame)) for frame in range(500)]
+    # One long hold, so a run has to be split at 0xFFFF updates.
+    recorded += [unpack_keys(1 << JUMP)] * 70000
+
+    recorder = Input_Recorder(STARTING_MAP, seed=7)
+    for keys in recorded:
+        recorder.record(keys)
+    assert all(held <= 0xFFFF for key_bits, held in recorder.runs)
+    changes = 1 + sum(1 for frame in range(1, len(recorded)) if recorded[frame] != recorded[frame-1])
+    assert len(recorder.runs) == changes + 1
+
+    replay = load_replay(recorder.save(str(tmp_path / "run.replay")))
+    assert (replay.seed, replay.start_map, replay.frames) == (7, STARTING_MAP, len(recorded))
+    for frame, keys in enumerate(recorded):
+        assert replay.get_keys(frame) == keys
+    # Past the end, nothing is held. Going backwards starts over.
+    assert replay.get_keys(len(recorded)) == [False]*REPLAY_KEY_COUNT
+    assert replay.get_keys(0) == recorded[0]
+
+def test_checkpoints_round_trip(tmp_path):
+
+    recorder = Input_Recorder(STARTING_MAP, seed=1, checkpoint_interval=10)
+    game = Headless_Game(STARTING_MAP)
+    game.run(35, Random_Input(seed=1), recorder)
+    recorder.checkpoint(game.sprite_handler, game.current_map, True)
+    assert [frame for frame, checksum in recorder.checkpoints] == [0, 10, 20, 30, 35]
+
+    replay = load_replay(recorder.save(str(tmp_path / "run.replay")))
+    for frame, checksum in recorder.checkpoints:
+        assert replay.get_checksum(frame) == checksum
+    assert replay.get_checksum(11) is None
+    assert replay.get_checksum(35) == get_state_checksum(game.sprite_handler, game.current_map)
+
+# The checksum notices when the player moves.
+def test_checksum_follows_the_state():
+
+    game = Headless_Game(STARTING_MAP)
+    checksum = get_state_checksum(game.sprite_handler, game.current_map)
+    assert get_state_checksum(game.sprite_handler, game.current_map) == checksum
+    game.sprite_handler.get_player(game.control_state).rect.x += 1
+    assert get_state_checksum(game.sprite_handler, game.current_map) != checksum
+
+def test_other_versions_are_refused(tmp_path):
+
+    recorder = Input_Recorder(STARTING_MAP, seed=1)
+    recorder.record([False]*REPLAY_KEY_COUNT)
+    filename = recorder.save(str(tmp_path / "run.replay"))
+    with open(filename, "r+b") as replay_file:
+        replay_file.write(input_replay.REPLAY_PREAMBLE.pack(input_replay.REPLAY_MAGIC, REPLAY_VERSION + 1, 0))
+    assert load_replay(filename) is None
+
+# Playing a recording back does exactly what the recording did.
+def test_replay_matches_the_recording(tmp_path):
+
+    recorder = Input_Recorder(STARTING_MAP, seed = 5, checkpoint_interval = 30)
+    game = Headless_Game(STARTING_MAP)
+    game.run(600, Random_Input(seed = 5), recorder)
+    recorder.checkpoint(game.sprite_handler, game.current_map, True)
+    filename = recorder.save(str(tmp_path / "run.replay"))
+
+    replayed_game, seconds, mismatches = run_replay(filename)
+    assert mismatches == []
+    assert replayed_game.frame == 600
+    assert (replayed_game.current_map, replayed_game.map_transitions) == (game.current_map, game.map_transitions)
@@ -0,0 +1,45 @@
+# ============================================
+# ==           MAP COMPILER TESTS           ==
+# ============================================
+# A compiled map, and a TMX loaded by our own loader, have to come out the
+# same as the map pytmx loads.
+
+import pygame
+from pytmx.util_pygame import load_pygame
+
+from constants import *
+from collision import compile_collision_grid
+from map_compiler import compile_map
+from map_compiler import load_compiled_map
+from map_compiler import load_tmx_map
+from map_renderer import Map_Renderer
+
+# The same map, loaded by pytmx, by our TMX loader, and from a compiled map.
+def load_every_way(map_name):
+
+    compile_map(map_name)
+    return [load_pygame(map_name, pixelalpha=True), load_tmx_map(map_name), load_compiled_map(map_name)]
+
+def test_loaders_build_identical_collision_grids(map_copy):
+
+    grids = [compile_collision_grid(tmxdata) for tmxdata in load_every_way(map_copy)]
+    for grid in grids[1:]:
+        assert (grid.width, grid.height) == (grids[0].width, grids[0].height)
+        assert grid.cells == grids[0].cells
+
+def test_loaders_draw_identical_maps(map_copy):
+
+    renderers = [Map_Renderer(tmxdata) for tmxdata in load_every_way(map_copy)]
+    view_rect = pygame.Rect(0, 0, renderers[0].tmxdata.width*TILESIZE, renderers[0].tmxdata.height*TILESIZE)
+    views = [pygame.image.tobytes(map_renderer.draw_view(view_rect), "RGBA") for map_renderer in renderers]
+    assert views[1] == views[0]
+    assert views[2] == views[0]
+
+# A compiled map that's older than its TMX gets ignored.
+def test_out_of_date_compiled_map_is_ignored(map_copy):
+
+    compile_map(map_copy)
+    assert load_compiled_map(map_copy) is not None
+    with open(map_copy, "a") as map_file:
+        map_file.write("\n")
+    assert load_compiled_map(map_copy) is None
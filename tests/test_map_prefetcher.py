@@ -0,0 +1,109 @@
+# ============================================
+# ==          MAP PREFETCHER TESTS          ==
+# ============================================
+
+import time
+import threading
+
+import pygame
+
+from constants import *
+from map_prefetcher import Map_Prefetcher
+from tileset_cache import tileset_cache
+
+# Wait for the worker thread to finish everything it's been asked for.
+def wait_for_worker(prefetcher):
+
+    with prefetcher.lock:
+        while len(prefetcher.loading) > 0:
+            prefetcher.lock.wait(1)
+
+# Ask the worker for a map, the same way prefetch_exits does.
+def request_map(prefetcher, map_name, entrance_direction):
+
+    with prefetcher.lock:
+        prefetcher.loading.add(map_name)
+    prefetcher.requests.put((map_name, entrance_direction))
+
+def test_least_recently_used_map_gets_evicted():
+
+    prefetcher = Map_Prefetcher(max_maps = 2)
+    prefetcher.remember_map("a", "map a")
+    prefetcher.remember_map("b", "map b")
+    assert prefetcher.get_map("a") == "map a"
+    prefetcher.remember_map("c", "map c")
+    assert list(prefetcher.maps) == ["a", "c"]
+    assert prefetcher.evictions == 1
+    assert (prefetcher.hits, prefetcher.misses) == (1, 0)
+
+def test_misses_load_the_map_and_keep_it(map_copy):
+
+    prefetcher = Map_Prefetcher()
+    tmxdata, map_renderer = prefetcher.get_map(map_copy)
+    assert (prefetcher.hits, prefetcher.misses) == (0, 1)
+    assert prefetcher.get_map(map_copy)[0] is tmxdata
+    assert (prefetcher.hits, prefetcher.misses) == (1, 1)
+
+    prefetcher.forget_map(map_copy)
+    assert prefetcher.get_map(map_copy)[0] is not tmxdata
+    assert (prefetcher.hits, prefetcher.misses) == (1, 2)
+
+# The worker never converts anything; update() does, on the main thread,
+# and then draws the chunks around the entrance.
+def test_worker_maps_get_finished_on_the_main_thread(map_copy):
+
+    threads = []
+    convert_tileset_image = tileset_cache.convert_tileset_image
+    def spy(image, tileset_info):
+        threads.append(threading.current_thread())
+        return convert_tileset_image(image, tileset_info)
+
+    tileset_cache.clear()
+    tileset_cache.convert_tileset_image = spy
+    try:
+        prefetcher = Map_Prefetcher()
+        request_map(prefetcher, map_copy, "LEFT")
+        wait_for_worker(prefetcher)
+        assert list(prefetcher.finishing) == [map_copy]
+        assert threads == []
+
+        for frame in range(1000):
+            prefetcher.update()
+            if len(prefetcher.finishing) == 0: break
+        assert list(prefetcher.maps) == [map_copy]
+        assert threads == [threading.main_thread()]
+
+        tmxdata, map_renderer = prefetcher.get_map(map_copy)
+        assert (prefetcher.hits, prefetcher.misses) == (1, 0)
+        assert map_renderer.get_chunks_drawn() > 0
+        assert tmxdata.images[1].get_parent().get_flags() & pygame.SRCALPHA
+    finally:
+        del tileset_cache.convert_tileset_image
+
+# Asking for a map update() hasn't finished yet converts it right away.
+def test_unfinished_map_is_converted_when_asked_for(map_copy):
+
+    tileset_cache.clear()
+    prefetcher = Map_Prefetcher()
+    request_map(prefetcher, map_copy, "LEFT")
+    tmxdata, map_renderer = prefetcher.get_map(map_copy)
+    assert (prefetcher.hits, prefetcher.misses) == (1, 0)
+    assert len(prefetcher.finishing) == 0
+    assert tmxdata.images[1].get_parent().get_flags() & pygame.SRCALPHA
+
+# A map that can't be finished gets dropped, and loads normally when it's needed.
+def test_map_that_fails_to_finish_loads_when_asked_for(map_copy):
+
+    def broken_steps():
+        raise ValueError("broken tileset")
+        yield True
+
+    prefetcher = Map_Prefetcher()
+    with prefetcher.lock:
+        prefetcher.finishing[map_copy] = (None, broken_steps())
+    prefetcher.update()
+    assert len(prefetcher.finishing) == 0
+    assert len(prefetcher.maps) == 0
+
+    tmxdata, map_renderer = prefetcher.get_map(map_copy)
+    assert (prefetcher.hits, prefetcher.misses) == (0, 1)
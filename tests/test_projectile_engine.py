@@ -0,0 +1,115 @@
+# ============================================
+# ==        PROJECTILE ENGINE TESTS         ==
+# ============================================
+
+import pygame
+import numpy
+
+from constants import *
+from game_objects import asset_registry
+from projectile_engine import Projectile_Engine
+from spatial_hash import Spatial_Hash
+
+def make_engine(capacity = 8):
+
+    return Projectile_Engine(asset_registry, capacity)
+
+# Spawn count projectiles in a row, each one TILESIZE further right.
+def spawn_row(engine, count):
+
+    xs = [TILESIZE*index for index in range(count)]
+    engine.spawn_many("small_bullet", xs, [0]*count, [1]*count, [0]*count)
+
+def test_remove_dead_packs_survivors_in_order():
+
+    engine = make_engine()
+    spawn_row(engine, 6)
+    engine.kill([0, 2, 3])
+    engine.remove_dead()
+    assert engine.count == 3
+    expected_x = numpy.array([TILESIZE*1, TILESIZE*4, TILESIZE*5]) - TILESIZE/2
+    assert list(engine.x[:3]) == list(expected_x)
+    assert list(engine.previous_x[:3]) == list(expected_x)
+    assert all(engine.lifespan[:3] > 0)
+
+def test_remove_dead_with_nothing_dead():
+
+    engine = make_engine()
+    spawn_row(engine, 4)
+    engine.remove_dead()
+    assert engine.count == 4
+
+def test_everything_dies_of_old_age():
+
+    engine = make_engine()
+    spawn_row(engine, 3)
+    lifespan = int(engine.lifespan[0])
+    for update in range(lifespan - 1):
+        engine.update()
+    assert engine.count == 3
+    engine.update()
+    assert engine.count == 0
+
+# Growing the arrays keeps everything that's already flying.
+def test_growing_keeps_live_projectiles():
+
+    engine = make_engine(capacity = 2)
+    spawn_row(engine, 2)
+    engine.update()
+    spawn_row(engine, 5)
+    assert engine.capacity >= 7
+    assert engine.count == 7
+    assert list(engine.x[:2]) == [1 - TILESIZE/2, TILESIZE + 1 - TILESIZE/2]
+    assert engine.spawned == 7
+    assert engine.most_alive == 7
+
+def test_collide_rect_ignores_dead_projectiles():
+
+    engine = make_engine()
+    spawn_row(engine, 3)
+    target = pygame.Rect(0, 0, TILESIZE, TILESIZE)
+    assert list(engine.collide_rect(target)) == [0, 1]
+    engine.kill([0])
+    assert list(engine.collide_rect(target)) == [1]
+
+# Each projectile is in every cell it overlaps, and dead ones aren't anywhere.
+def test_cell_slots_cover_every_overlapped_cell():
+
+    engine = make_engine()
+    spawn_row(engine, 4)
+    engine.kill([3])
+    cells = engine.get_cell_slots(TILESIZE*2)
+    cells = {cell: list(slots) for cell, slots in cells.items()}
+    assert cells == {
+        (-1, -1): [0], (-1, 0): [0],
+        (0, -1): [0, 1, 2], (0, 0): [0, 1, 2],
+        (1, -1): [1, 2], (1, 0): [1, 2],
+    }
+
+# A sprite that only needs a rect, for the spatial hash.
+class Target(pygame.sprite.Sprite):
+
+    def __init__(self, x, y):
+
+        pygame.sprite.Sprite.__init__(self)
+        self.rect = pygame.Rect(x, y, TILESIZE, TILESIZE)
+
+def test_spatial_hash_finds_projectiles_near_sprites():
+
+    engine = make_engine()
+    spawn_row(engine, 4)
+    near = Target(0, 0)
+    far = Target(TILESIZE*20, TILESIZE*20)
+    spatial_hash = Spatial_Hash(TILESIZE*2)
+    spatial_hash.rebuild({"targets": [near, far]})
+    spatial_hash.add_projectiles("projectiles", engine)
+
+    assert spatial_hash.sprites_near_projectiles("projectiles", "targets") == [near]
+    assert list(spatial_hash.query_projectiles(near.rect, "projectiles")) == [0, 1]
+    assert len(spatial_hash.query_projectiles(far.rect, "projectiles")) == 0
+    assert spatial_hash.query_pairs("targets", "projectiles") == [(near, 0), (near, 1)]
+    assert spatial_hash.query_pairs("projectiles", "targets") == [(0, near), (1, near)]
+
+    # Rebuilding forgets the projectiles until they're added again.
+    spatial_hash.rebuild({"targets": [near, far]})
+    assert len(spatial_hash.query_projectiles(near.rect, "projectiles")) == 0
@@ -0,0 +1,42 @@
+# ============================================
+# ==          TEXTURE ATLAS TESTS           ==
+# ============================================
+
+import os
+import pygame
+import pytest
+
+from constants import *
+from atlas_packer import pack_atlas
+from texture_atlas import texture_atlas
+from game_objects import Sprite_Sheet
+from game_objects import Atlas_Sprite_Sheet
+
+def get_pixels(surface):
+
+    return pygame.image.tobytes(surface, "RGBA")
+
+# Every frame cut from the atlas has exactly the pixels it has on its own sheet.
+def test_atlas_frames_match_their_sheets():
+
+    if not texture_atlas.load():
+        pytest.skip("the texture atlas hasn't been built")
+    for filename, asset in texture_atlas.assets.items():
+        assert texture_atlas.has_asset(filename), filename
+        sheet = Sprite_Sheet(filename)
+        atlas_sheet = Atlas_Sprite_Sheet(filename, texture_atlas)
+        frame_width, frame_height = asset["frame_size"]
+        for row in range(len(asset["animations"])):
+            for column in range(len(asset["animations"][row])):
+                rect = (column*frame_width, row*frame_height, frame_width, frame_height)
+                assert get_pixels(atlas_sheet.image_at(rect)) == get_pixels(sheet.image_at(rect)), (filename, rect)
+
+# Repacking into fewer pages deletes the pages that aren't used any more.
+def test_packing_deletes_leftover_pages(tmp_path):
+
+    stale_page = tmp_path / "atlas_7.png"
+    stale_page.write_bytes(b"")
+    manifest = pack_atlas(["Assets/Graphics/Projectiles/small_bullet.png"], str(tmp_path / "atlas.json"))
+    page_files = sorted(page["file"] for page in manifest["pages"])
+    assert page_files == ["atlas_0.png"]
+    assert sorted(os.listdir(tmp_path)) == ["atlas.json"] + page_files
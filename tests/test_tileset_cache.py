@@ -0,0 +1,35 @@
+# ============================================
+# ==          TILESET CACHE TESTS           ==
+# ============================================
+
+import os
+
+from constants import *
+from tileset_cache import Tileset_Cache
+
+def get_tsx_path(map_name):
+
+    return os.path.join(os.path.dirname(os.path.dirname(map_name)), "TSXdata", "Mars.tsx")
+
+# A tileset read back from its saved file is the same as one parsed from the TSX.
+def test_saved_tilesets_match_the_tsx(map_copy):
+
+    tsx_path = get_tsx_path(map_copy)
+    parsed = Tileset_Cache(persist = True).get_tileset(tsx_path)
+    loaded_cache = Tileset_Cache(persist = True)
+    loaded = loaded_cache.get_tileset(tsx_path)
+    assert (loaded_cache.loads, loaded_cache.disk_loads) == (0, 1)
+    assert loaded.get_info() == parsed.get_info()
+    assert loaded.tile_flags == parsed.tile_flags
+    assert loaded.tile_properties == parsed.tile_properties
+
+# Asking again gives back the same tileset, and its images get cut up once.
+def test_tilesets_are_shared(map_copy):
+
+    tileset_cache = Tileset_Cache(persist = False)
+    tileset = tileset_cache.get_tileset(get_tsx_path(map_copy))
+    assert tileset_cache.get_tileset(get_tsx_path(map_copy)) is tileset
+    assert (tileset_cache.hits, tileset_cache.loads) == (1, 1)
+    images = tileset_cache.get_tileset_images(tileset)
+    assert tileset_cache.get_tileset_images(tileset) is images
+    assert tileset_cache.image_loads == 1
@@ -0,0 +1,153 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For reading the manifest.
+import os
+import json
+
+#Import global methods.
+import methods
+from methods import local_path
+
+#A sheet that changed since the atlas was built has a different checksum.
+from map_compiler import get_file_checksum
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+# ============================================
+# ==            TEXTURE ATLAS               ==
+# ============================================
+# The pages and manifest built by atlas_packer.py. Every sprite sheet that's
+# in the atlas comes from here instead of from its own PNG: the pages get
+# loaded once, and the asset registry hands out Atlas_Sprite_Sheets that
+# cut their frames from them. Every frame gets run through convert_alpha
+# as it's cut out, the same as before.
+#
+# If the atlas hasn't been built, or a sheet has changed since it was, that
+# sheet just loads from its own PNG like before.
+
+class Texture_Atlas(object):
+
+    def __init__(self, manifest_path = ATLAS_MANIFEST):
+
+        self.manifest_path = manifest_path
+        # Sheets by path, straight from the manifest. None if there's no atlas.
+        self.assets = None
+        self.pages = []
+        self.loaded = False
+        # Whether each sheet we've been asked about is in the atlas and up to date, by path.
+        self.current = {}
+
+    # Load the manifest and the pages. Happens the first time anyone asks
+    # for a sheet, or call it once the display is set up to do it then.
+    # Returns False if there's no atlas to use.
+    def load(self):
+
+        if self.loaded: return self.assets is not None
+        self.loaded = True
+
+        if not os.path.exists(self.manifest_path):
+            log.info("No texture atlas at %s, loading sprite sheets one at a time. Run atlas_packer.py to build it.", self.manifest_path)
+            return False
+        try:
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest["version"] != ATLAS_VERSION:
+                log.warning("Texture atlas is from a different version. Run atlas_packer.py again.")
+                return False
+            atlas_folder = os.path.dirname(self.manifest_path)
+            for page_info in manifest["pages"]:
+                page = pygame.image.load(os.path.join(atlas_folder, page_info["file"]))
+                # 8 bit pages are kept as they are, like the sheets they came from.
+                # They're small, and frames get converted as they're cut out.
+                if page_info["colorkey"] is not None:
+                    page.set_colorkey(page_info["colorkey"])
+                elif pygame.display.get_surface() is not None:
+                    page = page.convert_alpha()
+                self.pages.append(page)
+        except (pygame.error, OSError, ValueError, KeyError) as error:
+            log.warning("Couldn't load texture atlas %s: %s", self.manifest_path, error)
+            self.pages = []
+            return False
+
+        self.assets = manifest["assets"]
+        log.info("Loaded texture atlas: %d sheets on %d pages", len(self.assets), len(self.pages))
+        return True
+
+    # Whether a sheet can come from the atlas. It has to be in it, and not
+    # have changed since the atlas was built.
+    def has_asset(self, filename):
+
+        if not self.load(): return False
+        path = local_path(filename)
+        current = self.current.get(path)
+        if current is None:
+            asset = self.assets.get(path)
+            current = asset is not None
+            if current and os.path.exists(path) and not self.source_matches(path, asset):
+                log.warning("%s has changed since the texture atlas was built. Run atlas_packer.py again.", path)
+                current = False
+            self.current[path] = current
+        return current
+
+    # Whether a sheet's PNG is still the one the atlas was built from. A
+    # different size means it isn't; otherwise it gets checksummed. The
+    # modified time only saves the checksum on the machine that ran the
+    # packer: git doesn't keep modified times, so on a fresh checkout it never
+    # matches and every sheet gets checksummed the first time it's used.
+    def source_matches(self, path, asset):
+        
+        file_stats = os.stat(path)
+        if file_stats.st_size != asset.get("bytes", file_stats.st_size): return False
+        if file_stats.st_mtime == asset.get("modified"): return True
+        return get_file_checksum(path) == asset["checksum"]
+    
+    # The size of a sheet, as it was before it got packed.
+    def get_size(self, filename):
+
+        return tuple(self.assets[local_path(filename)]["size"])
+
+    # Where one frame of a sheet is: (page, rect on the page, where the rect goes
+    # inside the frame). Animations are the rows of the sheet. None if the frame is empty.
+    def get_frame(self, filename, animation, frame):
+
+        packed_frame = self.assets[local_path(filename)]["animations"][animation][frame]
+        if packed_frame is None: return None
+        page, x, y, width, height, offset_x, offset_y = packed_frame
+        return self.pages[page], pygame.Rect(x, y, width, height), (offset_x, offset_y)
+
+    # Every frame of a sheet, as (rect on the sheet, page, rect on the page).
+    def get_cells(self, filename):
+
+        asset = self.assets[local_path(filename)]
+        frame_width, frame_height = asset["frame_size"]
+        cells = []
+        for row, frames in enumerate(asset["animations"]):
+            for column, packed_frame in enumerate(frames):
+                if packed_frame is None: continue
+                page, x, y, width, height, offset_x, offset_y = packed_frame
+                sheet_rect = pygame.Rect(column*frame_width + offset_x, row*frame_height + offset_y, width, height)
+                cells.append((sheet_rect, self.pages[page], pygame.Rect(x, y, width, height)))
+        return cells
+
+    # How many bytes the pages take up.
+    def memory_used(self):
+
+        total = 0
+        for page in self.pages:
+            total += page.get_width() * page.get_height() * page.get_bytesize()
+        return total
+
+# The one atlas everybody shares.
+texture_atlas = Texture_Atlas()
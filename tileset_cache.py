@@ -0,0 +1,354 @@
+# ======================================
+# ==          I M P O R T S           ==
+# ======================================
+# Tell main where to find the libraries
+# and other game code. It will search in
+# this directory and in Thonny's directory.
+
+#Import Pygame
+import pygame
+
+#For reading TSX files and the saved tile property tables.
+import os
+import sys
+import json
+import array
+import struct
+import threading
+import xml.etree.ElementTree as ElementTree
+
+#Import functions that let us read and write
+#to .tmx files, which are what Tiled Map Editor
+#creates. We borrow pytmx's property parsing so
+#our properties come out exactly like its do.
+import pytmx
+from pytmx.pytmx import parse_properties
+
+#This file contains CONSTANTS.
+import constants
+from constants import *
+
+from game_log import log
+
+#Collision flags for each tile come from the same place the collision grid gets them.
+from collision import tile_flags_from_properties
+
+# ============================================
+# ==            CACHED TILESET              ==
+# ============================================
+# Every Mars room uses the same tileset, Mars.tsx, which is about
+# 5,500 lines of XML, and the same 480x1152 tile image. Loading a
+# map used to parse and decode both of them all over again.
+# A cached tileset is everything we need from a TSX: its size, its
+# tile properties (the same dictionaries pytmx makes), the TILE_
+# collision flags for every tile packed one byte each, and the tile
+# images, cut out of the tileset image the first time they're needed.
+
+class Cached_Tileset(object):
+    
+    def __init__(self, path, modified_time):
+        
+        # Where the TSX is and when it was last changed. If it changes, the cache reloads it.
+        self.path = path
+        self.modified_time = modified_time
+        
+        self.name = None
+        self.tilewidth = 0
+        self.tileheight = 0
+        self.tilecount = 0
+        self.columns = 0
+        self.margin = 0
+        self.spacing = 0
+        # The tileset image. The path is from the TSX's folder.
+        self.image_source = None
+        self.trans = None
+        
+        # By tile id (gid - firstgid). None for tiles with no properties.
+        self.tile_properties = []
+        # By tile id. One byte of TILE_ flags per tile.
+        self.tile_flags = bytearray()
+        
+        # Tile images by tile id. Only loaded once a map actually needs them.
+        self.images = None
+    
+    # The settings from the <tileset> tag, for saving and loading.
+    def get_info(self):
+        
+        return {"name": self.name, "tilewidth": self.tilewidth, "tileheight": self.tileheight,
+                "tilecount": self.tilecount, "columns": self.columns,
+                "margin": self.margin, "spacing": self.spacing,
+                "image": self.image_source, "trans": self.trans}
+    
+    def set_info(self, info):
+        
+        self.name = info["name"]
+        self.tilewidth = info["tilewidth"]
+        self.tileheight = info["tileheight"]
+        self.tilecount = info["tilecount"]
+        self.columns = info["columns"]
+        self.margin = info["margin"]
+        self.spacing = info["spacing"]
+        self.image_source = info["image"]
+        self.trans = info["trans"]
+    
+    # Where the tileset image is, from the game's folder.
+    def get_image_path(self):
+        
+        return os.path.normpath(os.path.join(os.path.dirname(self.path), self.image_source))
+    
+    # Read everything we need out of the TSX.
+    def parse_tsx(self):
+        
+        root = ElementTree.parse(self.path).getroot()
+        self.name = root.get("name")
+        self.tilewidth = int(root.get("tilewidth"))
+        self.tileheight = int(root.get("tileheight"))
+        self.tilecount = int(root.get("tilecount"))
+        self.columns = int(root.get("columns"))
+        self.margin = int(root.get("margin", 0))
+        self.spacing = int(root.get("spacing", 0))
+        image_node = root.find("image")
+        self.image_source = image_node.get("source")
+        self.trans = image_node.get("trans")
+        
+        # Properties look the same as pytmx's, so code that asks for them
+        # can't tell which loader the map came from.
+        self.tile_properties = [None] * self.tilecount
+        for tile_node in root.iter("tile"):
+            tile_id = int(tile_node.get("id"))
+            properties = {"id": tile_id}
+            properties.update(parse_properties(tile_node))
+            properties["width"] = self.tilewidth
+            properties["height"] = self.tileheight
+            properties["frames"] = []
+            self.tile_properties[tile_id] = properties
+        
+        self.pack_tile_flags()
+    
+    # Pack every tile's collision properties into a byte.
+    def pack_tile_flags(self):
+        
+        self.tile_flags = bytearray(self.tilecount)
+        for tile_id in range(self.tilecount):
+            self.tile_flags[tile_id] = tile_flags_from_properties(self.tile_properties[tile_id])
+    
+    def memory_used(self):
+        
+        if self.images is None: return 0
+        return self.tilecount * self.tilewidth * self.tileheight * 4
+
+# ============================================
+# ==            TILESET CACHE               ==
+# ============================================
+# Keeps every tileset that's been loaded, by TSX path. A map that
+# uses a tileset we already have just gets the same one. The TSX's
+# modified time is checked each time, so editing a tileset in Tiled
+# while the game runs still works.
+#
+# The slow part of loading a TSX is parsing its XML, so the tile
+# properties and packed flags can also be saved next to the TSX (as a
+# TILESET_CACHE_EXTENSION file) and read back in on the next run
+# instead. That file looks like this (little-endian):
+#
+#     "CTGT"        magic
+#     uint16        format version (TILESET_CACHE_VERSION)
+#     uint32        length of the header
+#     header        JSON: the TSX's modified time and size, the tileset
+#                   settings, and each different property dictionary once
+#     uint8         TILE_ flags, one per tile
+#     uint16        which property dictionary each tile has, one per tile (0 = none)
+#
+# Maps get loaded on the map prefetcher's thread too, so everything
+# here happens while holding the cache's lock. Only the main thread
+# may convert a Surface for the display, so a tileset image loaded on
+# the prefetcher's thread gets cut up as it is, and converted the next
+# time the main thread asks for it (see convert_map_images in map_compiler.py).
+
+TILESET_CACHE_MAGIC = b"CTGT"
+# The magic, version and header length at the top of every saved tileset.
+TILESET_CACHE_PREAMBLE = struct.Struct("<4sHI")
+
+class Tileset_Cache(object):
+    
+    def __init__(self, persist = PERSIST_TILESET_CACHE):
+        
+        # Whether to save parsed tilesets to disk for next time.
+        self.persist = persist
+        # Cached tilesets by TSX path.
+        self.tilesets = {}
+        # Tile images by tileset image path, as (modified time, tile geometry, images, converted).
+        # Kept separately so compiled maps, which don't know about TSX files, share them too.
+        self.tile_images = {}
+        self.lock = threading.RLock()
+        
+        # Stats
+        self.hits = 0 # Already had the tileset
+        self.loads = 0 # Had to read the TSX
+        self.disk_loads = 0 # Got it from the saved file instead of the TSX
+        self.image_loads = 0 # Had to decode a tileset image
+    
+    # Get a tileset by its TSX path, loading it only if we don't have an up to date copy.
+    def get_tileset(self, tsx_path):
+        
+        tsx_path = os.path.normpath(tsx_path)
+        modified_time = os.path.getmtime(tsx_path)
+        with self.lock:
+            tileset = self.tilesets.get(tsx_path)
+            if tileset is not None and tileset.modified_time == modified_time:
+                self.hits += 1
+                return tileset
+            
+            tileset = Cached_Tileset(tsx_path, modified_time)
+            if not (self.persist and self.load_saved_tileset(tileset)):
+                tileset.parse_tsx()
+                self.loads += 1
+                if self.persist: self.save_tileset(tileset)
+            self.tilesets[tsx_path] = tileset
+            return tileset
+    
+    # Get a tileset's tile images, by tile id.
+    def get_tileset_images(self, tileset):
+        
+        with self.lock:
+            if tileset.images is None:
+                tileset.images = self.get_tile_images(tileset.get_image_path(), tileset.get_info())
+            return tileset.images
+    
+    # Cut a tileset image into tiles, or reuse the tiles if we've already done it.
+    # tileset_info needs tilewidth, tileheight, tilecount, columns, margin, spacing and trans.
+    def get_tile_images(self, image_path, tileset_info):
+        
+        image_path = os.path.normpath(image_path)
+        modified_time = os.path.getmtime(image_path)
+        geometry = tuple(tileset_info[key] for key in ("tilewidth", "tileheight", "tilecount", "columns", "margin", "spacing", "trans"))
+        # We can only convert once there's a screen, and only on the main thread.
+        can_convert = pygame.display.get_surface() is not None and threading.current_thread() is threading.main_thread()
+        with self.lock:
+            cached = self.tile_images.get(image_path)
+            if cached is not None and cached[0] == modified_time and cached[1] == geometry:
+                images = cached[2]
+                # Loaded on the prefetcher's thread. Convert it now, in place, so
+                # every tileset and map sharing this list gets the converted tiles.
+                if can_convert and not cached[3] and len(images) > 0:
+                    images[:] = self.cut_tile_images(self.convert_tileset_image(images[0].get_parent(), tileset_info), tileset_info)
+                    self.tile_images[image_path] = (modified_time, geometry, images, True)
+                return images
+            
+            image = pygame.image.load(image_path)
+            self.image_loads += 1
+            if can_convert:
+                image = self.convert_tileset_image(image, tileset_info)
+            images = self.cut_tile_images(image, tileset_info)
+            self.tile_images[image_path] = (modified_time, geometry, images, can_convert)
+            return images
+    
+    # Convert a tileset image for the screen, the same as pytmx's pixelalpha=True.
+    # Main thread only.
+    def convert_tileset_image(self, image, tileset_info):
+        
+        if tileset_info["trans"] is not None:
+            image = image.convert()
+            image.set_colorkey(pygame.Color("#" + tileset_info["trans"].lstrip("#")))
+        else:
+            image = image.convert_alpha()
+        return image
+    
+    # Cut a tileset image into tiles, by tile id.
+    def cut_tile_images(self, image, tileset_info):
+        
+        margin = tileset_info["margin"]
+        spacing = tileset_info["spacing"]
+        tile_width = tileset_info["tilewidth"]
+        tile_height = tileset_info["tileheight"]
+        images = []
+        for tile_id in range(tileset_info["tilecount"]):
+            column = tile_id % tileset_info["columns"]
+            row = tile_id // tileset_info["columns"]
+            images.append(image.subsurface(pygame.Rect(margin + column * (tile_width + spacing),
+                                                       margin + row * (tile_height + spacing),
+                                                       tile_width, tile_height)))
+        return images
+    
+    # Throw everything away, so the next map loads its tilesets fresh.
+    def clear(self):
+        
+        with self.lock:
+            self.tilesets.clear()
+            self.tile_images.clear()
+    
+    # ------------------------------------
+    # Saving parsed tilesets to disk
+    # ------------------------------------
+    
+    def get_saved_tileset_path(self, tileset):
+        
+        return tileset.path + TILESET_CACHE_EXTENSION
+    
+    # Save a tileset's settings, properties and flags. If we can't (the folder
+    # is read-only, say), that's fine; we'll just parse the TSX next time too.
+    def save_tileset(self, tileset):
+        
+        # Most tiles share the same few property dictionaries, so save each
+        # different one once. "id" is different for every tile, so leave it out.
+        property_table = []
+        property_table_index = {}
+        property_index = array.array("H", [0]) * tileset.tilecount
+        for tile_id in range(tileset.tilecount):
+            properties = tileset.tile_properties[tile_id]
+            if properties is None: continue
+            properties = dict(properties)
+            del properties["id"]
+            key = json.dumps(properties, sort_keys=True, default=str)
+            if key not in property_table_index:
+                property_table.append(properties)
+                property_table_index[key] = len(property_table)
+            property_index[tile_id] = property_table_index[key]
+        if sys.byteorder == "big": property_index.byteswap()
+        
+        header = {"modified_time": tileset.modified_time, "size": os.path.getsize(tileset.path),
+                  "tileset": tileset.get_info(), "property_table": property_table}
+        header_bytes = json.dumps(header, separators=(",", ":"), default=str).encode("utf-8")
+        try:
+            with open(self.get_saved_tileset_path(tileset), "wb") as saved_file:
+                saved_file.write(TILESET_CACHE_PREAMBLE.pack(TILESET_CACHE_MAGIC, TILESET_CACHE_VERSION, len(header_bytes)))
+                saved_file.write(header_bytes)
+                saved_file.write(tileset.tile_flags)
+                saved_file.write(property_index.tobytes())
+        except OSError as error:
+            log.warning("Couldn't save tileset cache for %s: %s", tileset.path, error)
+    
+    # Fill in a tileset from its saved file. Returns False if there's no
+    # saved file, or it's out of date, so the TSX needs parsing.
+    def load_saved_tileset(self, tileset):
+        
+        saved_path = self.get_saved_tileset_path(tileset)
+        if not os.path.exists(saved_path): return False
+        with open(saved_path, "rb") as saved_file:
+            saved_data = saved_file.read()
+        
+        magic, version, header_length = TILESET_CACHE_PREAMBLE.unpack_from(saved_data, 0)
+        if magic != TILESET_CACHE_MAGIC or version != TILESET_CACHE_VERSION: return False
+        data_start = TILESET_CACHE_PREAMBLE.size + header_length
+        header = json.loads(saved_data[TILESET_CACHE_PREAMBLE.size : data_start].decode("utf-8"))
+        if header["modified_time"] != tileset.modified_time or header["size"] != os.path.getsize(tileset.path):
+            return False
+        
+        tileset.set_info(header["tileset"])
+        tilecount = tileset.tilecount
+        tileset.tile_flags = bytearray(saved_data[data_start : data_start + tilecount])
+        property_index = array.array("H")
+        property_index.frombytes(saved_data[data_start + tilecount : data_start + tilecount * 3])
+        if sys.byteorder == "big": property_index.byteswap()
+        
+        property_table = header["property_table"]
+        tileset.tile_properties = [None] * tilecount
+        for tile_id in range(tilecount):
+            if property_index[tile_id] != 0:
+                properties = {"id": tile_id}
+                properties.update(property_table[property_index[tile_id] - 1])
+                tileset.tile_properties[tile_id] = properties
+        self.disk_loads += 1
+        return True
+
+# The one tileset cache everything shares.
+tileset_cache = Tileset_Cache()